@@ -0,0 +1,124 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+# Always the benchmark settings, whatever DJANGO_SETTINGS_MODULE the shell exports: the
+# harness migrates and writes to (and the load test flushes) the database it runs against
+def setup_django():
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    import django
+    django.setup()
+
+
+# Stop before touching a database that is not the benchmark one (BENCH_DB_PATH / BENCH_DB_NAME)
+def require_bench_database():
+    from django.conf import settings
+    from django.db import connection
+
+    from visitor_management_system.settings import DATABASES as APP_DATABASES
+
+    name = str(connection.settings_dict['NAME'])
+    if settings.SETTINGS_MODULE != 'benchmarks.settings' or name == str(APP_DATABASES['default']['NAME']):
+        raise SystemExit(f"Refusing to write to the {connection.vendor} database {name!r}: "
+                         "benchmarks only run against the database set in benchmarks/settings.py.")
+
+
+# Linear interpolation between the closest ranks, like numpy's default
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(values, scale=1.0, digits=3):
+    values = sorted(value * scale for value in values)
+    if not values:
+        return None
+    return {
+        'p50': round(percentile(values, 50), digits),
+        'p95': round(percentile(values, 95), digits),
+        'p99': round(percentile(values, 99), digits),
+        'mean': round(sum(values) / len(values), digits),
+        'min': round(values[0], digits),
+        'max': round(values[-1], digits),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# Where the numbers came from, stored next to them so runs can be told apart
+def environment():
+    import django
+    from django.db import connection
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def write_results(results, output, prefix):
+    path = Path(output) if output else RESULTS_DIR / f"{prefix}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+    return path
+
+
+def load_results(path):
+    return json.loads(Path(path).read_text())
+
+
+def _lookup(entry, metric):
+    for key in metric:
+        if not isinstance(entry, dict):
+            return None
+        entry = entry.get(key)
+    return entry if isinstance(entry, (int, float)) else None
+
+
+# Compare results['results'] entries against a baseline. `metrics` are key paths into each
+# entry; a change worse than `threshold` (0.25 = 25%) in the wrong direction is a regression.
+# Returns rows of (name, metric, baseline, current, change, regressed).
+def compare(current, baseline, metrics, threshold, higher_is_better=()):
+    rows = []
+    for name, entry in current['results'].items():
+        base_entry = baseline.get('results', {}).get(name)
+        if base_entry is None:
+            continue
+        for metric in metrics:
+            base, value = _lookup(base_entry, metric), _lookup(entry, metric)
+            if base is None or value is None or base == 0:
+                continue
+            change = (value - base) / base
+            worse = -change if metric in higher_is_better else change
+            rows.append((name, '.'.join(metric), base, value, change, worse > threshold))
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"\nCompared with baseline (regression threshold {threshold:.0%}):")
+    for name, metric, base, value, change, regressed in rows:
+        flag = 'REGRESSION' if regressed else ''
+        print(f"  {name:<32} {metric:<28} {base:>12.3f} -> {value:>12.3f} {change:>+8.1%} {flag}")
+    return sum(1 for row in rows if row[-1])
@@ -0,0 +1,250 @@
+"""End-to-end load test for the main API flows.
+
+Seeds a local database (see benchmarks/settings.py), then drives the real URL routes
+through Django's test client from several threads and reports latency percentiles,
+throughput and queries per request (from X-Query-Count) per scenario.
+
+    python -m benchmarks.loadtest --concurrency 8 --requests 500
+    python -m benchmarks.loadtest --scenarios scan,checkin --output scan.json
+    python -m benchmarks.loadtest --compare benchmarks/results/main.json
+
+Exits with status 1 when --compare finds a regression beyond --threshold.
+"""
+import argparse
+import itertools
+import sys
+import threading
+import time
+from collections import Counter
+
+from benchmarks.common import (
+    compare, environment, load_results, print_comparison, require_bench_database, setup_django, summarize,
+    write_results
+)
+
+PASSWORD = 'bench-password'
+HOST_EMAIL = 'bench-host@example.com'
+
+
+# name -> (function(client, index, data) -> response, accepted status codes)
+SCENARIOS = {}
+
+
+def scenario(name, expected=(200,)):
+    def register(fn):
+        SCENARIOS[name] = (fn, expected)
+        return fn
+    return register
+
+
+@scenario('login')
+def login(client, i, data):
+    return client.post('/emp/login/', {'email': HOST_EMAIL, 'password': PASSWORD}, content_type='application/json')
+
+
+@scenario('visitors-list')
+def visitors_list(client, i, data):
+    return client.get('/visit/visitors/')
+
+
+@scenario('visitor-create', expected=(201,))
+def visitor_create(client, i, data):
+    return client.post('/visit/visitors/', {
+        'visitor_name': f'Load Visitor {i}', 'visitor_email': f'load-create-{i}@example.com',
+        'visitor_mobile': f'6{i:09d}', 'registered_by': data['host_id'],
+    }, content_type='application/json')
+
+
+# Every other request is a returning visitor, the rest are first visits. Returning visitors
+# come from the half of the seed that scans do not use, since a check-in reissues the code.
+@scenario('checkin', expected=(200, 201))
+def checkin(client, i, data):
+    if i % 2:
+        email, mobile = data['returning'][i % len(data['returning'])]
+    else:
+        email, mobile = f'load-checkin-{i}@example.com', f'5{i:09d}'
+    return client.post('/visit/checkin/', {
+        'visitor_name': f'Checkin Visitor {i}', 'visitor_email': email, 'visitor_mobile': mobile,
+        'purpose': 'Meeting', 'registered_by': data['host_id'],
+    }, content_type='application/json')
+
+
+@scenario('scan')
+def scan(client, i, data):
+    code = data['visit_codes'][i % len(data['visit_codes'])]
+    return client.post('/visit/scan/', {'qr_code_scan': code, 'direction': 'in'}, content_type='application/json')
+
+
+@scenario('turnstiles-list')
+def turnstiles_list(client, i, data):
+    return client.get('/visit/turnstiles/')
+
+
+@scenario('turnstile-logs-list')
+def turnstile_logs_list(client, i, data):
+    return client.get('/visit/turnstile-logs/')
+
+
+@scenario('turnstile-log-create', expected=(201,))
+def turnstile_log_create(client, i, data):
+    return client.post('/visit/turnstile-logs/', {
+        'turnstile': data['turnstile_ids'][i % len(data['turnstile_ids'])],
+        'qr_code_scan': data['visit_codes'][i % len(data['visit_codes'])], 'status': 'success',
+    }, content_type='application/json')
+
+
+# Fresh schema and a known data set: one host employee (the only password hash), visitors
+# with fixed visit codes, and closed turnstile entries with their logs
+def seed(visitor_count, turnstile_count):
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from employee.models import User
+    from employee.views import get_tokens_for_user
+    from visitor.models import Turnstile, TurnstileLog, Visitor
+
+    require_bench_database()
+    call_command('migrate', verbosity=0, interactive=False)
+    call_command('flush', verbosity=0, interactive=False)
+
+    host = User.objects.create_user('Bench Host', HOST_EMAIL, '9000000000', PASSWORD)
+    visitors = [
+        Visitor(visitor_name=f'Seed Visitor {i}', visitor_email=f'seed-{i}@example.com', visitor_mobile=f'8{i:09d}',
+                purpose='Meeting', registered_by=host, visit_code=f's{i:07d}', qr_status=Visitor.QR_READY)
+        for i in range(visitor_count)
+    ]
+    Visitor.objects.bulk_create(visitors, batch_size=1000)
+    visitor_ids = list(Visitor.objects.order_by('pk').values_list('pk', flat=True))
+
+    now = timezone.now()
+    Turnstile.objects.bulk_create([
+        Turnstile(visitor_id=visitor_ids[i % len(visitor_ids)], entry_time=now, exit_time=now)
+        for i in range(turnstile_count)
+    ], batch_size=1000)
+    turnstile_ids = list(Turnstile.objects.order_by('pk').values_list('pk', flat=True))
+    TurnstileLog.objects.bulk_create([
+        TurnstileLog(turnstile_id=turnstile_id, qr_code_scan=f's{i % visitor_count:07d}', status='success')
+        for i, turnstile_id in enumerate(turnstile_ids)
+    ], batch_size=1000)
+
+    half = max(len(visitors) // 2, 1)
+    return {
+        'host_id': host.pk,
+        'token': get_tokens_for_user(host)['access'],
+        'visit_codes': [visitor.visit_code for visitor in visitors[:half]],
+        'returning': [(visitor.visitor_email, visitor.visitor_mobile) for visitor in visitors[half:] or visitors],
+        'turnstile_ids': turnstile_ids,
+    }
+
+
+def make_client(data):
+    from django.test import Client
+
+    # Server errors are counted, not raised
+    return Client(raise_request_exception=False, HTTP_AUTHORIZATION=f"Bearer {data['token']}")
+
+
+def run_scenario(name, data, requests, concurrency, warmup):
+    from django.db import connections
+
+    fn, expected = SCENARIOS[name]
+    counter = itertools.count()
+    client = make_client(data)
+    for _ in range(warmup):
+        fn(client, next(counter), data)
+
+    samples, lock = [], threading.Lock()
+    end = warmup + requests
+
+    def worker():
+        client = make_client(data)
+        local = []
+        try:
+            while True:
+                i = next(counter)
+                if i >= end:
+                    break
+                start = time.perf_counter()
+                response = fn(client, i, data)
+                local.append((time.perf_counter() - start, response.status_code, response.get('X-Query-Count')))
+        finally:
+            connections.close_all()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, name=f'load-{name}-{n}') for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    queries = [int(count) for _, _, count in samples if count is not None]
+    statuses = Counter(status for _, status, _ in samples)
+    return {
+        'requests': len(samples),
+        'concurrency': concurrency,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+        'errors': sum(count for status, count in statuses.items() if status not in expected),
+        'status_counts': {str(status): count for status, count in sorted(statuses.items())},
+        'latency_ms': summarize([elapsed for elapsed, _, _ in samples], scale=1000),
+        'queries_per_request': summarize(queries, digits=2),
+    }
+
+
+def print_result(name, result):
+    latency, queries = result['latency_ms'], result['queries_per_request'] or {}
+    print(f"{name:<22} {result['requests']:>6} req  {result['throughput_rps']:>8.1f} req/s  "
+          f"p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  p99 {latency['p99']:>8.2f} ms  "
+          f"queries {queries.get('mean', '-'):>5}  errors {result['errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario.")
+    parser.add_argument('--concurrency', type=int, default=4, help="Client threads per scenario.")
+    parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests sent first.")
+    parser.add_argument('--visitors', type=int, default=2000, help="Visitors seeded before the run.")
+    parser.add_argument('--turnstiles', type=int, default=2000, help="Turnstile entries (and logs) seeded.")
+    parser.add_argument('--output', help="Result file (default benchmarks/results/loadtest-<time>.json).")
+    parser.add_argument('--compare', metavar='BASELINE', help="Earlier result file to compare against.")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Relative change counted as a regression (default 0.25).")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    setup_django()
+    data = seed(args.visitors, args.turnstiles)
+    results = {
+        'kind': 'loadtest',
+        'environment': environment(),
+        'config': {key: getattr(args, key) for key in ('requests', 'concurrency', 'warmup', 'visitors', 'turnstiles')},
+        'results': {},
+    }
+    for name in names:
+        results['results'][name] = run_scenario(name, data, args.requests, args.concurrency, args.warmup)
+        print_result(name, results['results'][name])
+
+    path = write_results(results, args.output, 'loadtest')
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        rows = compare(results, load_results(args.compare), threshold=args.threshold, metrics=[
+            ('latency_ms', 'p50'), ('latency_ms', 'p95'), ('latency_ms', 'p99'),
+            ('queries_per_request', 'mean'), ('throughput_rps',),
+        ], higher_is_better=[('throughput_rps',)])
+        if print_comparison(rows, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
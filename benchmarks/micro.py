@@ -0,0 +1,191 @@
+"""Micro-benchmarks for QR rendering and serializer throughput.
+
+QR cases sweep one parameter at a time around the badge defaults (box_size 10, error
+correction L, the legacy payload, PNG): box_size, error-correction level, payload length
+and output format, plus a full Visitor.generate_qr_code() call (render, storage write and
+row update). Serializer cases time `.data` for VisitorSerializer, TurnstileLogSerializer
+and UserRoleSerializer over 1 to 10k in-memory rows and report the per-row cost.
+
+    python -m benchmarks.micro                      # run, compare with the stored baseline
+    python -m benchmarks.micro --only qr.           # cases whose name starts with "qr."
+    python -m benchmarks.micro --update-baseline    # store this run as the new baseline
+
+The baseline in benchmarks/baselines/micro.json was recorded on one machine; refresh it
+on yours before reading much into the comparison. Exits with status 1 on a regression.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.common import (
+    compare, environment, load_results, print_comparison, require_bench_database, setup_django, summarize,
+    write_results
+)
+
+BASELINE = Path(__file__).resolve().parent / 'baselines' / 'micro.json'
+ROW_COUNTS = (1, 10, 100, 1000, 10000)
+
+
+# Time `fn` call by call until `min_time` seconds and `min_runs` calls have passed
+def measure(fn, min_time, min_runs, max_runs=10000):
+    fn()
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def legacy_payload():
+    return "ID: 123456, Name: Priya Sharma, Mobile: 9876543210, Visit Code: 1a2b3c4d"
+
+
+# Payload of exactly `length` characters in the legacy format's character mix
+def payload_of(length):
+    base = legacy_payload()
+    return (base * (length // len(base) + 1))[:length]
+
+
+def qr_cases():
+    import qrcode
+
+    from visitor.qr import render_qr, render_qr_png
+    from visitor.tokens import make_visit_token
+
+    legacy = legacy_payload()
+    cases = {}
+    for box_size in (4, 10, 20, 40):
+        cases[f'qr.box_size={box_size}'] = lambda box_size=box_size: render_qr_png(legacy, box_size=box_size)
+
+    levels = {'L': qrcode.constants.ERROR_CORRECT_L, 'M': qrcode.constants.ERROR_CORRECT_M,
+              'Q': qrcode.constants.ERROR_CORRECT_Q, 'H': qrcode.constants.ERROR_CORRECT_H}
+    for name, level in levels.items():
+        cases[f'qr.error_correction={name}'] = lambda level=level: render_qr_png(legacy, error_correction=level)
+
+    signed = make_visit_token(123456, '1a2b3c4d', 0, 86400)
+    cases[f'qr.payload=signed({len(signed)})'] = lambda: render_qr_png(signed)
+    cases[f'qr.payload=legacy({len(legacy)})'] = lambda: render_qr_png(legacy)
+    for length in (32, 128, 256, 512):
+        payload = payload_of(length)
+        cases[f'qr.payload_length={length}'] = lambda payload=payload: render_qr_png(payload)
+
+    cases['qr.format=png(render_qr_png)'] = lambda: render_qr_png(legacy)
+    cases['qr.format=png(render_qr)'] = lambda: render_qr(legacy, fmt='png')
+    cases['qr.format=svg(render_qr)'] = lambda: render_qr(legacy, fmt='svg')
+    return cases
+
+
+# Visitor.generate_qr_code() end to end, against the benchmark database and media directory
+def generate_qr_code_case():
+    from django.core.management import call_command
+
+    from visitor.models import Visitor
+
+    require_bench_database()
+    call_command('migrate', verbosity=0, interactive=False)
+    visitor = Visitor.objects.filter(visitor_email='micro-bench@example.com').first()
+    if visitor is None:
+        visitor = Visitor(visitor_name='Priya Sharma', visitor_email='micro-bench@example.com',
+                          visitor_mobile='9876543210', purpose='Meeting', visit_code='1a2b3c4d')
+        Visitor.objects.bulk_create([visitor])
+        visitor = Visitor.objects.get(visitor_email='micro-bench@example.com')
+    return {'qr.generate_qr_code': visitor.generate_qr_code}
+
+
+# Unsaved instances with every serialized field filled in; nothing here touches the database
+def serializer_rows(count):
+    from django.utils import timezone
+
+    from employee.models import UserRole
+    from visitor.models import TurnstileLog, Visitor
+
+    now = timezone.now()
+    visitors = [
+        Visitor(visitor_id=i, visitor_name=f'Visitor {i}', visitor_email=f'visitor{i}@example.com',
+                visitor_mobile=f'9{i:09d}', registered_by_id=1, employee_name='Host Employee', purpose='Meeting',
+                visit_code=f'{i:08x}', qr_code=f'qr_codes/qr_code_{i}.png', qr_status=Visitor.QR_READY,
+                created_at=now, updated_at=now)
+        for i in range(1, count + 1)
+    ]
+    logs = [TurnstileLog(id=i, turnstile_id=i, qr_code_scan=f'{i:08x}', status='success', scanned_at=now)
+            for i in range(1, count + 1)]
+    user_roles = [UserRole(id=i, user_id=i, role_id=1) for i in range(1, count + 1)]
+    return visitors, logs, user_roles
+
+
+def serializer_cases():
+    from employee.serializers import UserRoleSerializer
+    from visitor.serializers import TurnstileLogSerializer, VisitorSerializer
+
+    cases = {}
+    for count in ROW_COUNTS:
+        visitors, logs, user_roles = serializer_rows(count)
+        for serializer_class, rows in ((VisitorSerializer, visitors), (TurnstileLogSerializer, logs),
+                                       (UserRoleSerializer, user_roles)):
+            name = f'serializer.{serializer_class.__name__}.rows={count}'
+            cases[name] = (lambda serializer_class=serializer_class, rows=rows: serializer_class(rows, many=True).data,
+                           count)
+    return cases
+
+
+def run(cases, min_time, min_runs, only):
+    results = {}
+    for name, case in cases.items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        fn, rows = case if isinstance(case, tuple) else (case, None)
+        samples = measure(fn, min_time, min_runs)
+        result = {'runs': len(samples), 'per_call_us': summarize(samples, scale=1e6, digits=1)}
+        if rows:
+            per_row = result['per_call_us']['p50'] / rows
+            result['rows'] = rows
+            result['per_row_us'] = round(per_row, 3)
+            result['rows_per_second'] = round(1e6 / per_row) if per_row else None
+        results[name] = result
+        extra = f"  {result['per_row_us']:>9.3f} us/row" if rows else ''
+        print(f"{name:<52} p50 {result['per_call_us']['p50']:>12.1f} us  "
+              f"min {result['per_call_us']['min']:>12.1f} us  runs {len(samples):>5}{extra}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', action='append', default=[], metavar='PREFIX',
+                        help="Run only cases whose name starts with PREFIX (repeatable).")
+    parser.add_argument('--min-time', type=float, default=0.3, help="Seconds spent timing each case.")
+    parser.add_argument('--min-runs', type=int, default=5, help="Calls timed per case at the least.")
+    parser.add_argument('--output', help="Result file (default benchmarks/results/micro-<time>.json).")
+    parser.add_argument('--compare', default=str(BASELINE), metavar='BASELINE',
+                        help="Result file to compare against (default: the stored baseline).")
+    parser.add_argument('--no-compare', action='store_true', help="Skip the comparison.")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Relative slowdown counted as a regression (default 0.25).")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Write this run to benchmarks/baselines/micro.json.")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    cases = {**qr_cases(), **generate_qr_code_case(), **serializer_cases()}
+    results = {
+        'kind': 'micro',
+        'environment': environment(),
+        'config': {'min_time': args.min_time, 'min_runs': args.min_runs},
+        'results': run(cases, args.min_time, args.min_runs, args.only),
+    }
+
+    path = write_results(results, BASELINE if args.update_baseline else args.output, 'micro')
+    print(f"\nResults written to {path}")
+
+    if not args.no_compare and not args.update_baseline and Path(args.compare).exists():
+        rows = compare(results, load_results(args.compare), threshold=args.threshold,
+                       metrics=[('per_call_us', 'p50'), ('per_row_us',)])
+        if print_comparison(rows, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# Settings for the benchmark harness (python -m benchmarks.loadtest / benchmarks.micro).
+# Same application settings as production, pointed at a local database: SQLite by default,
+# or a MySQL stand-in with BENCH_DB_ENGINE=mysql and the BENCH_DB_* variables below.
+import os
+import tempfile
+
+from visitor_management_system.settings import *  # noqa: F401,F403
+from visitor_management_system.settings import BASE_DIR
+
+if os.getenv('BENCH_DB_ENGINE') == 'mysql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.getenv('BENCH_DB_NAME', 'vms_bench'),
+            'USER': os.getenv('BENCH_DB_USER', 'root'),
+            'PASSWORD': os.getenv('BENCH_DB_PASSWORD', ''),
+            'HOST': os.getenv('BENCH_DB_HOST', '127.0.0.1'),
+            'PORT': os.getenv('BENCH_DB_PORT', '3306'),
+            'OPTIONS': {'sql_mode': 'traditional'},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('BENCH_DB_PATH', str(BASE_DIR / 'benchmarks' / 'bench.sqlite3')),
+            'OPTIONS': {
+                # WAL and IMMEDIATE transactions let concurrent workers queue for the write
+                # lock instead of failing with "database is locked"
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 30,
+            },
+        }
+    }
+
+# X-Query-Count is only sent with DEBUG on; the harness reads it for queries per request
+DEBUG = True
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+# Keep the runs offline and free of side work that is not being measured
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+EMPLOYEE_EMAIL_OUTBOX = {'WORKER': 'command'}
+VISITOR_ARRIVAL_NOTIFICATIONS = {'ENABLED': False}
+SEARCH_LOAD_IN_BACKGROUND = False
+
+_MEDIA_DIR = tempfile.mkdtemp(prefix='vms-bench-media-')
+MEDIA_ROOT = _MEDIA_DIR
+VISITOR_ARCHIVE_DIR = os.path.join(_MEDIA_DIR, 'archive')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    # Budget and N+1 warnings are part of the report, not console noise
+    'loggers': {
+        'visitor_management_system.middleware': {'handlers': ['console'], 'level': 'ERROR', 'propagate': False},
+        'django.request': {'handlers': ['console'], 'level': 'ERROR', 'propagate': False},
+    },
+}
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .permissions import user_has_module_perms, user_has_perm
+
+# Claims copied from the user row into every token issued by get_tokens_for_user
+USER_CLAIMS = ('is_active', 'is_admin', 'is_staff', 'is_superuser')
+
+# Changes whenever the password hash changes, so a password change or reset
+# signs out every token issued before it
+PASSWORD_CLAIM = 'pwd'
+
+
+def password_fingerprint(password_hash):
+    return salted_hmac('employee.authentication', password_hash or '').hexdigest()[:16]
+
+
+def add_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    token[PASSWORD_CLAIM] = password_fingerprint(user.password)
+    return token
+
+
+def _state_key(user_id):
+    return f'employee:user-state:{user_id}'
+
+
+_local = {}    # user_id -> (state, monotonic expiry)
+_local_lock = threading.Lock()
+
+
+# (is_active, password fingerprint, is_admin, is_staff, is_superuser) for the user, or None
+# if the row is gone. Each process reuses its own copy for EMPLOYEE_AUTH_STATE_LOCAL_TTL
+# seconds, so most requests touch neither the shared cache nor the database; behind it the
+# shared cache keeps the state for EMPLOYEE_AUTH_STATE_TTL seconds. Signals drop both on
+# save/delete (other processes' copies expire within the local TTL).
+def get_user_state(user_id):
+    with _local_lock:
+        entry = _local.get(user_id)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0] or None
+
+    key = _state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        from .models import User
+
+        row = (User.objects.filter(pk=user_id)
+               .values_list('is_active', 'password', 'is_admin', 'is_staff', 'is_superuser').first())
+        state = (row[0], password_fingerprint(row[1]), *row[2:]) if row else ()
+        cache.set(key, state, getattr(settings, 'EMPLOYEE_AUTH_STATE_TTL', 60))
+    with _local_lock:
+        _local[user_id] = (state, time.monotonic() + getattr(settings, 'EMPLOYEE_AUTH_STATE_LOCAL_TTL', 5))
+    return state or None
+
+
+def forget_user_state(user_id):
+    with _local_lock:
+        _local.pop(user_id, None)
+    cache.delete(_state_key(user_id))
+
+
+# Request user built from the token claims. The role flags come from the current user
+# state, not the token, so a demotion applies without waiting for the token to expire.
+# Views that need the profile fields or want to write to the row load the User explicitly.
+class ClaimsUser(TokenUser):
+    def __init__(self, token, state=None):
+        super().__init__(token)
+        if state is not None:
+            self.state = state
+
+    # Looked up here only when the class is built without a state (TOKEN_USER_CLASS callers)
+    @cached_property
+    def state(self):
+        return get_user_state(self.id) or ()
+
+    def _flag(self, index):
+        return len(self.state) > index and bool(self.state[index])
+
+    @cached_property
+    def is_admin(self):
+        return self._flag(2)
+
+    @cached_property
+    def is_staff(self):
+        return self._flag(3)
+
+    @cached_property
+    def is_superuser(self):
+        return self._flag(4)
+
+    def has_perm(self, perm, obj=None):
+        return user_has_perm(self, perm)
+
+    def has_module_perms(self, app_label):
+        return user_has_module_perms(self, app_label)
+
+
+# JWT authentication that does not load the user row per request.
+# Tokens issued before the claims existed fall back to the stock database lookup.
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if PASSWORD_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        state = get_user_state(user_id)
+        if state is None:
+            raise AuthenticationFailed("User not found", code='user_not_found')
+
+        is_active, fingerprint = state[:2]
+        if not is_active:
+            raise AuthenticationFailed("User is inactive", code='user_inactive')
+        if fingerprint != validated_token[PASSWORD_CLAIM]:
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+
+        return ClaimsUser(validated_token, state)
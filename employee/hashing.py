@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class HashingPoolSaturated(Exception):
+    pass
+
+
+# Bounded pool for password hashing. PBKDF2 runs in OpenSSL with the GIL released,
+# so hashes run in parallel without tying up request workers. Once WORKERS + MAX_PENDING
+# hashes are in flight new submissions fail straight away instead of queueing.
+class HashingPool:
+    def __init__(self, workers, max_pending):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated("Password hashing pool is saturated.")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = getattr(settings, 'EMPLOYEE_HASHING_POOL', {})
+                _pool = HashingPool(config.get('WORKERS', 4), config.get('MAX_PENDING', 32))
+    return _pool
+
+
+# Returns (valid, upgraded_hash). upgraded_hash is set when the stored hash uses
+# outdated parameters; the caller saves it, as User.check_password() would.
+def _verify(raw_password, encoded):
+    upgraded = []
+    valid = hashers.check_password(raw_password, encoded, setter=lambda raw: upgraded.append(hashers.make_password(raw)))
+    return valid, (upgraded[0] if upgraded else None)
+
+
+def verify_password(raw_password, encoded):
+    return get_hashing_pool().submit(_verify, raw_password, encoded).result()
+
+
+def make_password(raw_password):
+    return get_hashing_pool().submit(hashers.make_password, raw_password).result()
+
+
+async def averify_password(raw_password, encoded):
+    return await asyncio.wrap_future(get_hashing_pool().submit(_verify, raw_password, encoded))
+
+
+async def amake_password(raw_password):
+    return await asyncio.wrap_future(get_hashing_pool().submit(hashers.make_password, raw_password))
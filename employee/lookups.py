@@ -0,0 +1,84 @@
+import threading
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .versioning import VersionCounter
+
+
+# In-process copy of a small lookup table (Department, Role, Designation).
+# The table is loaded with one query and reused until the model's shared version
+# counter moves, which save/delete signals bump on commit.
+class LookupCache:
+    def __init__(self, model):
+        self.model = model
+        self.counter = VersionCounter(f'employee:lookup-version:{model._meta.label_lower}', 'EMPLOYEE_LOOKUP_VERSION_TTL')
+        self._lock = threading.Lock()
+        self._version = None
+        self._rows = ()
+        self._by_pk = {}
+
+    # (version, rows ordered newest first, {pk: row}); rows are shared, treat them as read-only
+    def snapshot(self):
+        version = self.counter.current()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    # Pagination order, so the cached list matches what the list endpoint would query
+                    rows = tuple(self.model.objects.order_by('-pk'))
+                    self._rows, self._by_pk = rows, {row.pk: row for row in rows}
+                    self._version = version
+        return version, self._rows, self._by_pk
+
+    # Row by primary key. A miss is checked against the table: the row may have been added
+    # by another process whose version bump this one has not picked up yet.
+    def get(self, pk):
+        return self.get_many([pk]).get(pk)
+
+    # {pk: row} for the given keys that exist, with one query for any the cache does not know
+    def get_many(self, pks):
+        by_pk = self.snapshot()[2]
+        found = {pk: by_pk[pk] for pk in pks if pk in by_pk}
+        missing = {pk for pk in pks if pk not in found}
+        if missing:
+            fetched = self.model.objects.in_bulk(missing)
+            if fetched:
+                # The copy is behind the table; reload it on the next snapshot()
+                with self._lock:
+                    self._version = None
+                found.update(fetched)
+        return found
+
+    def etag(self, version):
+        return f'"{self.model._meta.model_name}-{version}"'
+
+    def invalidate(self):
+        transaction.on_commit(self.counter.bump)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def lookup_cache(model):
+    cache = _caches.get(model)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.setdefault(model, LookupCache(model))
+    return cache
+
+
+# PrimaryKeyRelatedField that validates ids against the lookup cache, querying only for ids
+# the cache does not know. `queryset` is still required and names the model.
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = lookup_cache(self.get_queryset().model).get(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from employee.outbox import outbox_config, send_due
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox emails. Runs as a worker unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Send whatever is due and exit.")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Messages sent per connection (defaults to EMPLOYEE_EMAIL_OUTBOX['BATCH_SIZE']).")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            sent = send_due(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails"))
+            return
+
+        interval = outbox_config()['POLL_INTERVAL']
+        self.stdout.write(f"Sending outbox emails every {interval}s, Ctrl-C to stop")
+        try:
+            while True:
+                close_old_connections()
+                sent = send_due(options['batch_size'])
+                if sent:
+                    self.stdout.write(f"Sent {sent} emails")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
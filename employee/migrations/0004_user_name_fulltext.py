@@ -0,0 +1,33 @@
+from django.db import migrations
+
+INDEX_NAME = 'employee_user_name_ft'
+
+
+# MySQL only: an ngram FULLTEXT index for host search over User.name.
+# Other databases use the in-process index in visitor_management_system/search.py.
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    table = apps.get_model('employee', 'User')._meta.db_table
+    schema_editor.execute(
+        f'CREATE FULLTEXT INDEX {schema_editor.quote_name(INDEX_NAME)} '
+        f'ON {schema_editor.quote_name(table)} ({schema_editor.quote_name("name")}) WITH PARSER ngram'
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    table = apps.get_model('employee', 'User')._meta.db_table
+    schema_editor.execute(f'DROP INDEX {schema_editor.quote_name(INDEX_NAME)} ON {schema_editor.quote_name(table)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0003_alter_user_mobile_userdepartment_userdesignation_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,18 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+# Table for the DatabaseCache backend (settings.CACHES); does nothing for other backends
+def create_cache_table(apps, schema_editor):
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0005_outboxemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser
 from django.core.validators import RegexValidator
+from django.utils.timezone import now
 
 
 # UserManager to manage User creation
@@ -61,11 +62,14 @@ class User(AbstractBaseUser):
     def __str__(self):
         return self.email
 
+    # Admins get everything; other users what their roles grant through ROLE_PERMISSIONS
     def has_perm(self, perm, obj=None):
-        return self.is_admin or self.is_superuser
+        from .permissions import user_has_perm
+        return user_has_perm(self, perm)
 
     def has_module_perms(self, app_label):
-        return self.is_admin or self.is_superuser
+        from .permissions import user_has_module_perms
+        return user_has_module_perms(self, app_label)
 
 
 # Department model
@@ -138,3 +142,32 @@ class UserDesignation(models.Model):
 
     def __str__(self):
         return f"{self.user.name} - {self.designation.designation_name}"
+
+
+# Outgoing email, written on the request and sent by the outbox worker (see employee/outbox.py)
+class OutboxEmail(models.Model):
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    id = models.AutoField(primary_key=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, null=True, blank=True)
+    to = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "what is due" query
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,176 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_config():
+    config = getattr(settings, 'EMPLOYEE_EMAIL_OUTBOX', {})
+    return {
+        'WORKER': config.get('WORKER', 'thread'),
+        'BATCH_SIZE': config.get('BATCH_SIZE', 50),
+        'MAX_ATTEMPTS': config.get('MAX_ATTEMPTS', 5),
+        'BACKOFF_SECONDS': config.get('BACKOFF_SECONDS', 30),
+        'MAX_BACKOFF_SECONDS': config.get('MAX_BACKOFF_SECONDS', 3600),
+        'LEASE_SECONDS': config.get('LEASE_SECONDS', 300),
+        'POLL_INTERVAL': config.get('POLL_INTERVAL', 5),
+    }
+
+
+# Store the message and wake the worker once the surrounding transaction commits.
+# Nothing is sent on the calling thread unless WORKER is 'local'.
+def enqueue(subject, body, to, from_email=None):
+    from .models import OutboxEmail
+
+    email = OutboxEmail.objects.create(subject=subject, body=body, to=list(to), from_email=from_email)
+    transaction.on_commit(wake_worker)
+    return email
+
+
+def wake_worker():
+    mode = outbox_config()['WORKER']
+    if mode == 'thread':
+        get_worker().wake()
+    elif mode == 'local':
+        send_due()
+    # 'command': sending is left to `manage.py run_outbox`
+
+
+# Due messages, leased to this worker for LEASE_SECONDS. The lease (and the attempt it
+# counts) stops other workers from picking them up; if this one dies they become due again.
+def claim_batch(limit):
+    from .models import OutboxEmail
+
+    config = outbox_config()
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        OutboxEmail.objects.filter(pk__in=ids).update(
+            attempts=F('attempts') + 1, next_attempt_at=now + timedelta(seconds=config['LEASE_SECONDS'])
+        )
+    return list(OutboxEmail.objects.filter(pk__in=ids).order_by('id'))
+
+
+# Send a claimed batch over one backend connection and record the outcome of each message.
+# Messages go through send_messages() one at a time on the open connection so a failure is
+# pinned to its own row; the SMTP backend only connects once for the whole batch.
+def send_batch(emails):
+    from .models import OutboxEmail
+
+    if not emails:
+        return 0
+    connection = get_connection()
+    sent, failed = [], []
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Could not open the email connection: %s", exc)
+        failed = [(email, exc) for email in emails]
+    else:
+        try:
+            for email in emails:
+                message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+                try:
+                    connection.send_messages([message])
+                    sent.append(email.id)
+                except Exception as exc:
+                    failed.append((email, exc))
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                logger.exception("Closing the email connection failed")
+
+    if sent:
+        OutboxEmail.objects.filter(pk__in=sent).update(status=OutboxEmail.SENT, sent_at=timezone.now(), last_error='')
+    for email, exc in failed:
+        _record_failure(email, exc)
+    return len(sent)
+
+
+# Retry with exponential backoff until MAX_ATTEMPTS, then give up on the message
+def _record_failure(email, exc):
+    from .models import OutboxEmail
+
+    config = outbox_config()
+    error = f"{type(exc).__name__}: {exc}"
+    if email.attempts >= config['MAX_ATTEMPTS']:
+        logger.error("Giving up on outbox email %s after %d attempts: %s", email.id, email.attempts, error)
+        OutboxEmail.objects.filter(pk=email.id).update(status=OutboxEmail.FAILED, last_error=error)
+        return
+    delay = min(config['BACKOFF_SECONDS'] * 2 ** (email.attempts - 1), config['MAX_BACKOFF_SECONDS'])
+    logger.warning("Outbox email %s failed (attempt %d), retrying in %ds: %s", email.id, email.attempts, delay, error)
+    OutboxEmail.objects.filter(pk=email.id).update(
+        next_attempt_at=timezone.now() + timedelta(seconds=delay), last_error=error
+    )
+
+
+# Send everything that is due, batch by batch. Returns the number of messages sent.
+def send_due(batch_size=None):
+    batch_size = batch_size or outbox_config()['BATCH_SIZE']
+    total = 0
+    while True:
+        emails = claim_batch(batch_size)
+        total += send_batch(emails)
+        if len(emails) < batch_size:
+            return total
+
+
+# Background sender for web processes. Woken when a message is enqueued, and polls every
+# POLL_INTERVAL seconds for retries and for messages enqueued by other processes.
+class OutboxWorker:
+    def __init__(self, poll_interval=5):
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def wake(self):
+        self._ensure_started()
+        self._wake.set()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                send_due()
+            except Exception:
+                logger.exception("Sending the email outbox failed")
+            finally:
+                close_old_connections()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = OutboxWorker(outbox_config()['POLL_INTERVAL'])
+    return _worker
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+from .versioning import VersionCounter
+
+VERSION_KEY = 'employee:perm-version'
+
+# Effective access for one user: role names from UserRole and the permissions they grant
+ResolvedPermissions = namedtuple('ResolvedPermissions', ['roles', 'perms'])
+
+NO_PERMISSIONS = ResolvedPermissions(frozenset(), frozenset())
+
+
+def role_checks_enabled():
+    return getattr(settings, 'ROLE_PERMISSIONS', None) is not None
+
+
+# Shared version of every cached permission set, kept in the shared cache (settings.CACHES).
+# UserRole/Role signals bump it, which orphans the old entries in the shared cache at once
+# and in other processes' local copies within EMPLOYEE_PERMISSION_VERSION_TTL. Local
+# entries also expire after EMPLOYEE_PERMISSION_LOCAL_TTL, so a bump that never arrives
+# (a lost cache entry, a change made outside the signals) cannot keep access alive.
+_clock = VersionCounter(VERSION_KEY, 'EMPLOYEE_PERMISSION_VERSION_TTL')
+_local = {}    # user_id -> (ResolvedPermissions, monotonic expiry)
+_local_version = None
+_local_lock = threading.Lock()
+
+
+def bump_permission_version():
+    _clock.bump()
+
+
+# Bump once the surrounding transaction commits, so no request can cache
+# the old assignments under the new version
+def permissions_changed():
+    transaction.on_commit(bump_permission_version)
+
+
+def _compute(user_id):
+    from .models import UserRole
+
+    roles = frozenset(UserRole.objects.filter(user_id=user_id).values_list('role__role_name', flat=True))
+    role_perms = settings.ROLE_PERMISSIONS or {}
+    perms = frozenset(perm for role in roles for perm in role_perms.get(role, ()))
+    return ResolvedPermissions(roles, perms)
+
+
+# Roles and permissions for the user, from the per-process cache, then the shared cache,
+# then one query. Returns NO_PERMISSIONS when ROLE_PERMISSIONS is not configured.
+def resolve_permissions(user_id):
+    global _local_version
+    if not role_checks_enabled() or user_id is None:
+        return NO_PERMISSIONS
+
+    version = _clock.current()
+    with _local_lock:
+        if _local_version != version:
+            _local.clear()
+            _local_version = version
+        entry = _local.get(user_id)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+
+    key = f'employee:perms:{version}:{user_id}'
+    resolved = cache.get(key)
+    if resolved is None:
+        resolved = _compute(user_id)
+        cache.set(key, tuple(resolved), getattr(settings, 'EMPLOYEE_PERMISSION_CACHE_TTL', 3600))
+    else:
+        resolved = ResolvedPermissions(*resolved)
+
+    with _local_lock:
+        if _local_version == version:
+            _local[user_id] = (resolved, time.monotonic() + getattr(settings, 'EMPLOYEE_PERMISSION_LOCAL_TTL', 30))
+    return resolved
+
+
+# Grants may be exact ('visitor.add_visitor'), per app ('visitor.*') or everything ('*')
+def _granted(perms, perm):
+    return '*' in perms or perm in perms or f"{perm.split('.', 1)[0]}.*" in perms
+
+
+def user_has_perm(user, perm):
+    if not user.is_active:
+        return False
+    if user.is_admin or user.is_superuser:
+        return True
+    return _granted(resolve_permissions(user.pk).perms, perm)
+
+
+def user_has_module_perms(user, app_label):
+    if not user.is_active:
+        return False
+    if user.is_admin or user.is_superuser:
+        return True
+    perms = resolve_permissions(user.pk).perms
+    return '*' in perms or any(perm.split('.', 1)[0] == app_label for perm in perms)
+
+
+# DRF permission backed by the resolver. Views name what they need in `required_perms`
+# (a permission, a list, or a dict keyed by action / HTTP method like `query_budget`);
+# otherwise writes need the model's add/change/delete permission and reads nothing.
+# Grants everything while ROLE_PERMISSIONS is None.
+class RolePermission(BasePermission):
+    perms_map = {
+        'POST': ['%(app_label)s.add_%(model_name)s'],
+        'PUT': ['%(app_label)s.change_%(model_name)s'],
+        'PATCH': ['%(app_label)s.change_%(model_name)s'],
+        'DELETE': ['%(app_label)s.delete_%(model_name)s'],
+    }
+
+    def has_permission(self, request, view):
+        if not role_checks_enabled():
+            return True
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        return all(user.has_perm(perm) for perm in self.get_required_perms(request, view))
+
+    def get_required_perms(self, request, view):
+        perms = getattr(view, 'required_perms', None)
+        if isinstance(perms, dict):
+            perms = perms.get(getattr(view, 'action', None), perms.get(request.method.lower()))
+        if perms is not None:
+            return [perms] if isinstance(perms, str) else perms
+
+        queryset = getattr(view, 'queryset', None)
+        if queryset is None or request.method in SAFE_METHODS:
+            return []
+        meta = queryset.model._meta
+        return [template % {'app_label': meta.app_label, 'model_name': meta.model_name}
+                for template in self.perms_map.get(request.method, [])]
@@ -0,0 +1,10 @@
+from visitor_management_system.search import SearchEngine
+
+# Host lookup by partial employee name; inactive accounts are left out
+host_search = SearchEngine(
+    'employee.User',
+    fields=('name',),
+    fulltext_index='employee_user_name_ft',
+    filters={'is_active': True},
+    updated_field='updated_at',
+)
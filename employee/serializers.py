@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from employee.models import User
 from .models import Department, Role, Designation
@@ -6,6 +8,9 @@ from django.utils.encoding import smart_str, force_bytes, DjangoUnicodeDecodeErr
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from employee.utils import Util
+from employee import hashing
+from employee.permissions import permissions_changed
+from employee.lookups import CachedPrimaryKeyRelatedField, lookup_cache
 
 
 ### User Registration Serializer ###
@@ -25,7 +30,17 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password2', None)  # Remove password2
-        return User.objects.create_user(**validated_data)
+        password = validated_data.pop('password')
+        # Async views hash on the pool themselves and pass the result in as encoded_password
+        encoded = validated_data.pop('encoded_password', None) or hashing.make_password(password)
+        user = User(
+            name=validated_data['name'],
+            email=User.objects.normalize_email(validated_data['email']),
+            mobile=validated_data['mobile'],
+            password=encoded,
+        )
+        user.save()
+        return user
 
 
 ### User Login Serializer ###
@@ -52,7 +67,7 @@ class UserChangePasswordSerializer(serializers.Serializer):
         return attrs
 
     def update(self, instance, validated_data):
-        instance.set_password(validated_data['password'])
+        instance.password = validated_data.get('encoded_password') or hashing.make_password(validated_data['password'])
         instance.save()
         return instance
 
@@ -62,19 +77,26 @@ class SendPasswordResetEmailSerializer(serializers.Serializer):
     email = serializers.EmailField(max_length=255)
 
     def validate(self, attrs):
-        email = attrs.get("email")
-        if not User.objects.filter(email=email).exists():
+        user = User.objects.filter(email=attrs.get("email")).first()
+        if user is None:
             raise serializers.ValidationError({"error": "This email is not registered."})
+        attrs['user'] = user
+        return attrs
 
-        user = User.objects.get(email=email)
+    # The token and link are made here rather than in validate(), and the email only
+    # queued, so the request does not wait on SMTP
+    def create(self, validated_data):
+        user = validated_data['user']
         uid = urlsafe_base64_encode(force_bytes(user.pk))  # Using `pk` instead of `id`
         token = PasswordResetTokenGenerator().make_token(user)
         reset_link = f'http://localhost:3000/api/reset/{uid}/{token}'
 
-        # For debugging purposes
-        print("Password Reset Link:", reset_link)
-
-        return attrs
+        Util.send_email({
+            'email_subject': 'Reset Your Password',
+            'body': f'Click the following link to reset your password: {reset_link}',
+            'to_email': user.email,
+        })
+        return user
 
 
 ### User Password Reset Serializer ###
@@ -129,7 +151,7 @@ class DesignationSerializer(serializers.ModelSerializer):
 ### UserRole Serializer
 class UserRoleSerializer(serializers.ModelSerializer):
     emp_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), source='user')
-    role_id = serializers.PrimaryKeyRelatedField(queryset=Role.objects.all(), source='role')
+    role_id = CachedPrimaryKeyRelatedField(queryset=Role.objects.all(), source='role')
 
     class Meta:
         model = UserRole
@@ -139,7 +161,7 @@ class UserRoleSerializer(serializers.ModelSerializer):
 ### UserDepartment Serializer
 class UserDepartmentSerializer(serializers.ModelSerializer):
     emp_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), source='user')
-    dept_id = serializers.PrimaryKeyRelatedField(queryset=Department.objects.all(), source='department')
+    dept_id = CachedPrimaryKeyRelatedField(queryset=Department.objects.all(), source='department')
 
     class Meta:
         model = UserDepartment
@@ -149,9 +171,181 @@ class UserDepartmentSerializer(serializers.ModelSerializer):
 ### UserDesignation Serializer
 class UserDesignationSerializer(serializers.ModelSerializer):
     emp_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), source='user')
-    desgn_id = serializers.PrimaryKeyRelatedField(queryset=Designation.objects.all(), source='designation')
+    desgn_id = CachedPrimaryKeyRelatedField(queryset=Designation.objects.all(), source='designation')
 
     class Meta:
         model = UserDesignation
         fields = ['id', 'emp_id', 'desgn_id']
 
+
+### Bulk Link Assignment Serializers ###
+# Validates a list of {"emp_id": .., "<target>_id": ..} pairs with one in_bulk query for the
+# users (targets come from the lookup cache, ids it does not know are checked in the table) and writes them set-wise. 'add' inserts the
+# missing pairs; 'replace' makes each listed user's links exactly the listed set, in one
+# transaction.
+class BulkLinkSerializer(serializers.Serializer):
+    link_model = None
+    target_model = None
+    target_field = None    # FK on link_model, e.g. 'role'
+    target_param = None    # Key used in the payload, e.g. 'role_id'
+
+    mode = serializers.ChoiceField(choices=['add', 'replace'], default='add')
+    links = serializers.ListField(child=serializers.DictField())
+    # Replace mode only: users whose links are replaced even though `links` names none of
+    # their targets, so {"mode": "replace", "emp_ids": [5], "links": []} clears user 5
+    emp_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+
+    def validate_links(self, links):
+        max_links = getattr(settings, 'EMPLOYEE_BULK_MAX_LINKS', 5000)
+        if len(links) > max_links:
+            raise serializers.ValidationError(f'A single request is limited to {max_links} links.')
+
+        row_errors = {}
+        pairs = []
+        for index, item in enumerate(links):
+            row = {}
+            for param in ('emp_id', self.target_param):
+                if _as_pk(item.get(param)) is None:
+                    row[param] = ['A valid integer is required.']
+            if row:
+                row_errors[index] = row
+            else:
+                pairs.append((index, _as_pk(item['emp_id']), _as_pk(item[self.target_param])))
+
+        users = User.objects.only('id').in_bulk({user_id for _, user_id, _ in pairs})
+        targets = lookup_cache(self.target_model).get_many({target_id for _, _, target_id in pairs})
+        for index, user_id, target_id in pairs:
+            row = {}
+            if user_id not in users:
+                row['emp_id'] = [f'Invalid pk "{user_id}" - object does not exist.']
+            if target_id not in targets:
+                row[self.target_param] = [f'Invalid pk "{target_id}" - object does not exist.']
+            if row:
+                row_errors[index] = row
+
+        if row_errors:
+            # Same {index: errors} shape ListField uses for invalid items
+            raise serializers.ValidationError(dict(sorted(row_errors.items())))
+        return list(dict.fromkeys((user_id, target_id) for _, user_id, target_id in pairs))
+
+    def validate(self, attrs):
+        if attrs['mode'] == 'add':
+            if attrs['emp_ids']:
+                raise serializers.ValidationError({'emp_ids': ['Only used in replace mode.']})
+            if not attrs['links']:
+                raise serializers.ValidationError({'links': ['This list may not be empty.']})
+        elif not attrs['links'] and not attrs['emp_ids']:
+            raise serializers.ValidationError({'links': ['Give links or emp_ids to replace.']})
+        return attrs
+
+    def create(self, validated_data):
+        model = self.link_model
+        target_fk = f'{self.target_field}_id'
+        pairs = validated_data['links']
+        replace = validated_data['mode'] == 'replace'
+
+        with transaction.atomic():
+            current = model.objects.filter(user_id__in={user_id for user_id, _ in pairs} | set(validated_data['emp_ids']))
+            if replace:
+                current = current.select_for_update()
+            else:
+                current = current.filter(**{f'{target_fk}__in': {target_id for _, target_id in pairs}})
+            existing = {(user_id, target_id): link_id for link_id, user_id, target_id in current.values_list('id', 'user_id', target_fk)}
+
+            wanted = set(pairs)
+            to_add = [pair for pair in pairs if pair not in existing]
+            to_remove = [link_id for pair, link_id in existing.items() if pair not in wanted] if replace else []
+            if to_remove:
+                model.objects.filter(id__in=to_remove).delete()
+            created = self._insert(to_add)
+            if created or to_remove:
+                self.links_changed()
+
+        return {
+            'mode': validated_data['mode'],
+            'created': created,
+            'removed': len(to_remove),
+            'unchanged': len(pairs) - created,
+        }
+
+    # Insert the pairs and return how many rows were written. A pair inserted concurrently since
+    # `existing` was read fails the batch; the batch is then retried row by row, skipping those.
+    def _insert(self, pairs):
+        model = self.link_model
+        target_fk = f'{self.target_field}_id'
+        rows = [model(user_id=user_id, **{target_fk: target_id}) for user_id, target_id in pairs]
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(rows, batch_size=500)
+            return len(rows)
+        except IntegrityError:
+            created = 0
+            for row in rows:
+                try:
+                    with transaction.atomic():
+                        row.pk = None
+                        row.save(force_insert=True)
+                    created += 1
+                except IntegrityError:
+                    pass
+            return created
+
+    # bulk_create sends no signals; subclasses invalidate whatever depends on the links
+    def links_changed(self):
+        pass
+
+
+def _as_pk(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+class BulkUserRoleSerializer(BulkLinkSerializer):
+    link_model = UserRole
+    target_model = Role
+    target_field = 'role'
+    target_param = 'role_id'
+
+    def links_changed(self):
+        permissions_changed()
+
+
+class BulkUserDepartmentSerializer(BulkLinkSerializer):
+    link_model = UserDepartment
+    target_model = Department
+    target_field = 'department'
+    target_param = 'dept_id'
+
+
+class BulkUserDesignationSerializer(BulkLinkSerializer):
+    link_model = UserDesignation
+    target_model = Designation
+    target_field = 'designation'
+    target_param = 'desgn_id'
+
+
+### Employee Directory Serializer ###
+# Expects the queryset from EmployeeDirectoryView, which prefetches the link tables
+# together with their lookup rows so nesting costs no extra queries per user.
+class EmployeeDirectorySerializer(serializers.ModelSerializer):
+    roles = serializers.SerializerMethodField()
+    departments = serializers.SerializerMethodField()
+    designations = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'name', 'email', 'mobile', 'roles', 'departments', 'designations']
+
+    def get_roles(self, obj):
+        return RoleSerializer([link.role for link in obj.userrole_set.all()], many=True).data
+
+    def get_departments(self, obj):
+        return DepartmentSerializer([link.department for link in obj.userdepartment_set.all()], many=True).data
+
+    def get_designations(self, obj):
+        return DesignationSerializer([link.designation for link in obj.userdesignation_set.all()], many=True).data
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_user_state
+from .lookups import lookup_cache
+from .models import Department, Designation, Role, User, UserRole
+from .permissions import permissions_changed
+from .search import host_search
+
+
+# Deactivation, password changes and deletes take effect on the next request
+# instead of waiting for the cached auth state to expire
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_auth_state(sender, instance, **kwargs):
+    forget_user_state(instance.pk)
+
+
+# Keep host search in step with User writes made in this process
+@receiver(post_save, sender=User)
+def index_host(sender, instance, **kwargs):
+    host_search.update(instance)
+
+
+@receiver(post_delete, sender=User)
+def unindex_host(sender, instance, **kwargs):
+    host_search.discard(instance.pk)
+
+
+# Role assignments and role renames change resolved permission sets
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_permissions(sender, **kwargs):
+    permissions_changed()
+
+
+# Lookup tables are served from memory until their version moves
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Designation)
+@receiver(post_delete, sender=Designation)
+def invalidate_lookup(sender, **kwargs):
+    lookup_cache(sender).invalidate()
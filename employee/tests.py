@@ -1,3 +1,240 @@
-from django.test import TestCase
+import logging
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+
+from django.core import mail
+from django.core.handlers.asgi import ASGIHandler
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import AsyncClient, override_settings
+from django.urls import path
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+
+from visitor_management_system.testing import QueryBudgetTestCase, VMSTestCase
+from . import outbox
+from .models import OutboxEmail, Department, Designation, Role, User, UserDepartment, UserDesignation, UserRole
+from .views import AsyncUserChangePasswordView, AsyncUserLoginView, AsyncUserRegistrationView
+
+# The async auth views are only routed under EMPLOYEE_ASYNC_AUTH_VIEWS; this urlconf serves them
+urlpatterns = [
+    path('emp/register/', AsyncUserRegistrationView.as_view()),
+    path('emp/login/', AsyncUserLoginView.as_view()),
+    path('emp/changepassword/', AsyncUserChangePasswordView.as_view()),
+]
+
+
+# Every budgeted employee endpoint, once, from cold caches (see QueryBudgetTestCase)
+class EmployeeQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('Asha Rao', 'asha@example.com', '9000000001', 'old-password')
+        self.other = User.objects.create_user('Ben Das', 'ben@example.com', '9000000002', 'password')
+        self.authenticate(self.user)
+
+    def test_registration_and_login(self):
+        self.call('post', '/emp/register/', {
+            'name': 'Chitra Iyer', 'email': 'chitra@example.com', 'mobile': '9000000003',
+            'password': 'password', 'password2': 'password',
+        }, expected=201)
+        self.call('post', '/emp/login/', {'email': 'asha@example.com', 'password': 'old-password'})
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_async_auth_views(self):
+        self.call('post', '/emp/register/', {
+            'name': 'Chitra Iyer', 'email': 'chitra@example.com', 'mobile': '9000000003',
+            'password': 'password', 'password2': 'password',
+        }, expected=201)
+        self.call('post', '/emp/login/', {'email': 'asha@example.com', 'password': 'old-password'})
+        self.call('post', '/emp/changepassword/', {'password': 'new-password', 'password2': 'new-password'})
+
+    def test_profile_and_password(self):
+        self.call('get', '/emp/profile/')
+        self.call('post', '/emp/changepassword/', {'password': 'new-password', 'password2': 'new-password'})
+
+    # Within EMPLOYEE_AUTH_STATE_LOCAL_TTL the user state comes from the process, not the cache table
+    def test_auth_state_reused(self):
+        self.call('get', '/emp/profile/')
+        recorder = self.client.get('/emp/profile/').wsgi_request._query_recorder
+        self.assertEqual((recorder.count, recorder.cache_count), (1, 0))
+
+    def test_deactivation_drops_local_state(self):
+        self.call('get', '/emp/profile/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/emp/profile/').status_code, 401)
+
+    def test_password_reset(self):
+        self.call('post', '/emp/send-password-reset-email/', {'email': 'asha@example.com'})
+        uid = urlsafe_base64_encode(force_bytes(self.user.id))
+        token = PasswordResetTokenGenerator().make_token(self.user)
+        self.call('post', f'/emp/reset-password/{uid}/{token}/', {'password': 'reset-pass', 'password2': 'reset-pass'})
+
+    def test_directory_and_host_search(self):
+        role = Role.objects.create(role_name='Reception')
+        department = Department.objects.create(department_name='Operations')
+        designation = Designation.objects.create(designation_name='Associate')
+        for user in (self.user, self.other):
+            UserRole.objects.create(user=user, role=role)
+            UserDepartment.objects.create(user=user, department=department)
+            UserDesignation.objects.create(user=user, designation=designation)
+        self.call('get', '/emp/directory/')
+        self.call('get', f'/emp/directory/?role={role.pk}&department={department.pk}')
+        self.call('get', '/emp/hosts/search/?q=asha')
+
+    # RolePermission views are measured with role checks on, which costs a query when cold
+    @override_settings(ROLE_PERMISSIONS={'HR': ['employee.*']})
+    def test_lookup_tables(self):
+        UserRole.objects.create(user=self.user, role=Role.objects.create(role_name='HR'))
+        for path, model, field in (('departments', Department, 'department_name'), ('roles', Role, 'role_name'),
+                                   ('designations', Designation, 'designation_name')):
+            row = model.objects.create(**{field: 'First'})
+            self.call('get', f'/emp/{path}/')
+            self.call('get', f'/emp/{path}/{row.pk}/')
+            self.call('post', f'/emp/{path}/', {field: 'Second'}, expected=201)
+            self.call('put', f'/emp/{path}/{row.pk}/', {field: 'Renamed'})
+            self.call('patch', f'/emp/{path}/{row.pk}/', {field: 'Renamed again'})
+
+    @override_settings(ROLE_PERMISSIONS={'HR': ['employee.*']})
+    def test_user_links(self):
+        UserRole.objects.create(user=self.user, role=Role.objects.create(role_name='HR'))
+        for path, model, field, param in (
+                ('user-roles', Role, 'role_name', 'role_id'),
+                ('user-departments', Department, 'department_name', 'dept_id'),
+                ('user-designations', Designation, 'designation_name', 'desgn_id')):
+            first, second = model.objects.create(**{field: 'First'}), model.objects.create(**{field: 'Second'})
+            link = self.call('post', f'/emp/{path}/', {'emp_id': self.user.pk, param: first.pk}, expected=201).json()
+            self.call('get', f'/emp/{path}/')
+            self.call('get', f"/emp/{path}/{link['id']}/")
+            self.call('put', f"/emp/{path}/{link['id']}/", {'emp_id': self.user.pk, param: second.pk})
+            self.call('patch', f"/emp/{path}/{link['id']}/", {param: first.pk})
+            self.call('post', f'/emp/{path}/bulk/', {'links': [
+                {'emp_id': self.user.pk, param: second.pk}, {'emp_id': self.other.pk, param: first.pk},
+            ]})
+            self.call('post', f'/emp/{path}/bulk/', {'mode': 'replace', 'emp_ids': [self.other.pk], 'links': [
+                {'emp_id': self.other.pk, param: second.pk},
+            ]})
+
+
+# Under ASGI the middleware chain must stay async, or every request (the async views
+# included) is handed to a worker thread through async_to_sync
+@override_settings(ROOT_URLCONF=__name__)
+class AsgiTests(VMSTestCase):
+    def test_no_middleware_adapted(self):
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug("Middleware loaded.")
+        self.assertEqual([line for line in logs.output if 'adapted' in line], [])
+
+    async def test_async_view_queries_are_counted(self):
+        await sync_to_async(User.objects.create_user)('Asha Rao', 'asha@example.com', '9000000001', 'password')
+        response = await AsyncClient().post('/emp/login/', {'email': 'asha@example.com', 'password': 'password'},
+                                            content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.asgi_request._query_recorder.count, 1)
+
+
+# Refuses recipients at fail.example.com, delivers the rest to mail.outbox
+class FlakyBackend(EmailBackend):
+    def send_messages(self, messages):
+        for message in messages:
+            if any(address.endswith('@fail.example.com') for address in message.to):
+                raise ConnectionError('Recipient refused')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND=f'{__name__}.FlakyBackend',
+                   EMPLOYEE_EMAIL_OUTBOX={'WORKER': 'command', 'MAX_ATTEMPTS': 3, 'BACKOFF_SECONDS': 30})
+class OutboxTests(VMSTestCase):
+    def make_due(self):
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+
+    def test_sent_by_the_worker_not_the_request(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            email = outbox.enqueue('Hello', 'Body', ['asha@example.com'])
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(outbox.send_due(), 1)
+        self.assertEqual([message.to for message in mail.outbox], [['asha@example.com']])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.SENT, 1))
+        self.assertIsNotNone(email.sent_at)
+
+    def test_failure_is_isolated_and_retried_with_backoff(self):
+        with self.assertLogs('employee.outbox', 'WARNING'):
+            bad = outbox.enqueue('Hello', 'Body', ['ben@fail.example.com'])
+            good = outbox.enqueue('Hello', 'Body', ['asha@example.com'])
+            self.assertEqual(outbox.send_due(), 1)
+            good.refresh_from_db()
+            bad.refresh_from_db()
+            self.assertEqual(good.status, OutboxEmail.SENT)
+            self.assertEqual((bad.status, bad.attempts, bad.last_error),
+                             (OutboxEmail.PENDING, 1, 'ConnectionError: Recipient refused'))
+            self.assertAlmostEqual((bad.next_attempt_at - timezone.now()).total_seconds(), 30, delta=5)
+            # Not due again until the backoff has passed
+            self.assertEqual(outbox.send_due(), 0)
+            bad.refresh_from_db()
+            self.assertEqual(bad.attempts, 1)
+
+        self.make_due()
+        outbox.send_due()
+        bad.refresh_from_db()
+        self.assertEqual(bad.attempts, 2)
+        self.assertAlmostEqual((bad.next_attempt_at - timezone.now()).total_seconds(), 60, delta=5)
+
+    def test_gives_up_after_max_attempts(self):
+        with self.assertLogs('employee.outbox', 'WARNING'):
+            email = outbox.enqueue('Hello', 'Body', ['ben@fail.example.com'])
+            for _ in range(3):
+                self.make_due()
+                outbox.send_due()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboxEmail.FAILED, 3))
+            self.make_due()
+            self.assertEqual(outbox.claim_batch(10), [])
+
+    # A worker that died mid-batch leaves its lease behind; the messages come back once it runs out
+    def test_expired_lease_is_claimed_again(self):
+        email = outbox.enqueue('Hello', 'Body', ['asha@example.com'])
+        self.assertEqual(outbox.claim_batch(10), [email])
+        self.assertEqual(outbox.claim_batch(10), [])
+        OutboxEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.send_due(), 1)
+
+
+@override_settings(ROLE_PERMISSIONS={'HR': ['employee.add_userrole'], 'Admin': ['employee.add_userrole',
+                                                                                'employee.delete_userrole']})
+class BulkLinkTests(VMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('Asha Rao', 'asha@example.com', '9000000001', 'password')
+        self.other = User.objects.create_user('Ben Das', 'ben@example.com', '9000000002', 'password')
+        self.hr, self.admin = Role.objects.create(role_name='HR'), Role.objects.create(role_name='Admin')
+        self.guest = Role.objects.create(role_name='Guest')
+        UserRole.objects.create(user=self.user, role=self.hr)
+        UserRole.objects.create(user=self.other, role=self.guest)
+        self.authenticate(self.user)
+
+    def bulk(self, data):
+        return self.client.post('/emp/user-roles/bulk/', data, content_type='application/json')
+
+    def roles(self, user):
+        return set(UserRole.objects.filter(user=user).values_list('role__role_name', flat=True))
+
+    def test_add_needs_only_the_add_permission(self):
+        response = self.bulk([{'emp_id': self.other.pk, 'role_id': self.hr.pk}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.roles(self.other), {'Guest', 'HR'})
+
+    def test_replace_needs_the_delete_permission(self):
+        response = self.bulk({'mode': 'replace', 'emp_ids': [self.other.pk], 'links': []})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.roles(self.other), {'Guest'})
+
+    def test_replace_clears_the_listed_users(self):
+        UserRole.objects.create(user=self.user, role=self.admin)
+        response = self.bulk({'mode': 'replace', 'emp_ids': [self.other.pk], 'links': []})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.roles(self.other), set())
+        self.assertEqual(self.roles(self.user), {'HR', 'Admin'})
@@ -1,12 +1,21 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from employee.views import (
     UserRegistrationView, UserLoginView, UserProfileView,
     UserChangePasswordView, SendPasswordResetEmailView, UserPasswordResetView,
     DepartmentViewSet, RoleViewSet, DesignationViewSet,
-    UserRoleViewSet, UserDepartmentViewSet, UserDesignationViewSet
+    UserRoleViewSet, UserDepartmentViewSet, UserDesignationViewSet,
+    EmployeeDirectoryView, HostSearchView,
+    AsyncUserRegistrationView, AsyncUserLoginView, AsyncUserChangePasswordView
 )
 
+# Under ASGI the views that hash passwords are served by their async variants
+if settings.EMPLOYEE_ASYNC_AUTH_VIEWS:
+    UserRegistrationView = AsyncUserRegistrationView
+    UserLoginView = AsyncUserLoginView
+    UserChangePasswordView = AsyncUserChangePasswordView
+
 # Create a router for ViewSets
 router = DefaultRouter()
 router.register(r'departments', DepartmentViewSet, basename='department')
@@ -23,6 +32,8 @@ urlpatterns = [
     path('changepassword/', UserChangePasswordView.as_view(), name="changepassword"),
     path('send-password-reset-email/', SendPasswordResetEmailView.as_view(), name="send-password-reset-email"),
     path('reset-password/<uid>/<token>/', UserPasswordResetView.as_view(), name="reset-password"),
+    path('directory/', EmployeeDirectoryView.as_view(), name="directory"),
+    path('hosts/search/', HostSearchView.as_view(), name="host-search"),
 
     # Include router-generated URLs
     path('', include(router.urls)),
@@ -1,13 +1,14 @@
-from django.core.mail import EmailMessage
 import os
 
+from employee import outbox
+
 class Util:
+    # Queues the message in the email outbox; the outbox worker sends it after the request
     @staticmethod
     def send_email(data):
-        email = EmailMessage(
+        return outbox.enqueue(
             subject=data['email_subject'],
             body=data['body'],
+            to=[data['to_email']],
             from_email=os.environ.get("EMAIL_FROM"),
-            to=[data['to_email']]
         )
-        email.send()
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Counter in the shared cache (settings.CACHES) that process-local caches compare against.
+# Each process re-reads it at most every `ttl_setting` seconds, so a bump reaches the other
+# processes within that time; the bumping process sees it immediately.
+class VersionCounter:
+    def __init__(self, key, ttl_setting, default_ttl=5):
+        self.key = key
+        self.ttl_setting = ttl_setting
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._version = None
+        self._read_at = 0.0
+
+    def current(self):
+        ttl = getattr(settings, self.ttl_setting, self.default_ttl)
+        now = time.monotonic()
+        if self._version is None or now - self._read_at > ttl:
+            version = cache.get(self.key)
+            if version is None:
+                # Start from the clock so a cache flush never brings back an old version
+                cache.add(self.key, int(time.time() * 1000), None)
+                version = cache.get(self.key)
+            with self._lock:
+                self._version, self._read_at = version, now
+        return self._version
+
+    def bump(self):
+        try:
+            version = cache.incr(self.key)
+        except ValueError:
+            version = int(time.time() * 1000)
+            cache.set(self.key, version, None)
+        with self._lock:
+            self._version, self._read_at = version, time.monotonic()
+        return version
+
+    # Drop the local copy, so the next current() reads the shared cache again
+    def forget(self):
+        with self._lock:
+            self._version, self._read_at = None, 0.0
@@ -1,10 +1,27 @@
+from asgiref.sync import sync_to_async
 from rest_framework.response import Response
-from rest_framework import status, viewsets
+from rest_framework import generics, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotAuthenticated, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from employee.authentication import ClaimsJWTAuthentication, add_user_claims
+from employee.lookups import lookup_cache
+from employee.search import host_search
+from visitor_management_system.search import parse_search_params
+from employee.permissions import RolePermission, role_checks_enabled
+from employee.hashing import HashingPoolSaturated, amake_password, averify_password, verify_password
+
 from employee.serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer, 
     UserChangePasswordSerializer, SendPasswordResetEmailSerializer, 
@@ -12,7 +29,9 @@ from employee.serializers import (
     DesignationSerializer,
     UserRoleSerializer, 
     UserDesignationSerializer,
-    UserDepartmentSerializer
+    UserDepartmentSerializer,
+    EmployeeDirectorySerializer,
+    BulkUserRoleSerializer, BulkUserDepartmentSerializer, BulkUserDesignationSerializer
 )
 from .models import (
     User, Department, Role, Designation,
@@ -21,19 +40,39 @@ from .models import (
 
 # Generate Token Manually
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    refresh = add_user_claims(RefreshToken.for_user(user), user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
     }
 
 
+# request.user only carries token claims under ClaimsJWTAuthentication; load the row when fields are needed
+def get_request_user(request):
+    user = request.user
+    return user if isinstance(user, User) else User.objects.get(pk=user.pk)
+
+
+# Returned when the password hashing pool is full, instead of queueing the request
+HASHING_BUSY = {"error": "Server is busy, please retry shortly."}
+HASHING_RETRY_AFTER = '1'
+
+
+def hashing_busy_response():
+    return Response(HASHING_BUSY, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': HASHING_RETRY_AFTER})
+
+
 ### User Registration ###
 class UserRegistrationView(APIView):
+    query_budget = 9
+
     def post(self, request, *args, **kwargs):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except HashingPoolSaturated:
+                return hashing_busy_response()
             token = get_tokens_for_user(user)
             return Response({'data': serializer.data, 'message': 'Registration Successful.'}, 
                             status=status.HTTP_201_CREATED)
@@ -42,18 +81,27 @@ class UserRegistrationView(APIView):
 
 ### User Login ###
 class UserLoginView(APIView):
+    query_budget = 6
+
     def post(self, request, *args, **kwargs):
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
             email = serializer.validated_data.get('email')
             password = serializer.validated_data.get('password')
 
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                return Response({"error": "Invalid email or password."}, status=status.HTTP_404_NOT_FOUND)
+
             try:
-                user = User.objects.get(email=email)
-                if not user.check_password(password):
-                    raise ValueError("Invalid password")
-            except User.DoesNotExist:
+                valid, upgraded = verify_password(password, user.password)
+            except HashingPoolSaturated:
+                return hashing_busy_response()
+            if not valid:
                 return Response({"error": "Invalid email or password."}, status=status.HTTP_404_NOT_FOUND)
+            if upgraded:
+                user.password = upgraded
+                user.save(update_fields=['password'])
 
             token = get_tokens_for_user(user)
             return Response({'token': token, 'message': 'Login Successful.'}, status=status.HTTP_200_OK)
@@ -62,35 +110,126 @@ class UserLoginView(APIView):
 ### User Profile ###
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 6
 
     def get(self, request, *args, **kwargs):
-        serializer = UserProfileSerializer(request.user)
+        serializer = UserProfileSerializer(get_request_user(request))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 ### Change Password ###
 class UserChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = 8
 
     def post(self, request, *args, **kwargs):
-        user = request.user
+        user = get_request_user(request)
         serializer = UserChangePasswordSerializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
-            serializer.update(user, serializer.validated_data)
+            try:
+                serializer.update(user, serializer.validated_data)
+            except HashingPoolSaturated:
+                return hashing_busy_response()
             return Response({"message": "Password updated successfully"}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+### Async views (served by the ASGI app, see asgi.py) ###
+# Plain Django views, since DRF's APIView cannot be awaited. They take the same bodies, run
+# the same serializers and return the same payloads as the sync views above; hashing is
+# awaited on the pool so the event loop keeps serving other requests meanwhile.
+class AsyncAuthView(View):
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except HashingPoolSaturated:
+            response = JsonResponse(HASHING_BUSY, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = HASHING_RETRY_AFTER
+            return response
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+            return JsonResponse(detail, status=exc.status_code, safe=False)
+
+    def parse(self, request):
+        return Request(request, parsers=[parser() for parser in self.parser_classes]).data
+
+    async def authenticate(self, request):
+        result = await sync_to_async(ClaimsJWTAuthentication().authenticate)(request)
+        if result is None:
+            raise NotAuthenticated()
+        return result[0]
+
+
+class AsyncUserRegistrationView(AsyncAuthView):
+    query_budget = 4
+
+    async def post(self, request, *args, **kwargs):
+        serializer = UserRegistrationSerializer(data=self.parse(request))
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        encoded = await amake_password(serializer.validated_data['password'])
+        await sync_to_async(serializer.save)(encoded_password=encoded)
+        return JsonResponse({'data': serializer.data, 'message': 'Registration Successful.'},
+                            status=status.HTTP_201_CREATED)
+
+
+class AsyncUserLoginView(AsyncAuthView):
+    query_budget = 1
+
+    async def post(self, request, *args, **kwargs):
+        serializer = UserLoginSerializer(data=self.parse(request))
+        serializer.is_valid(raise_exception=True)
+        email = serializer.validated_data.get('email')
+        password = serializer.validated_data.get('password')
+
+        user = await User.objects.filter(email=email).afirst()
+        if user is None:
+            return JsonResponse({"error": "Invalid email or password."}, status=status.HTTP_404_NOT_FOUND)
+
+        valid, upgraded = await averify_password(password, user.password)
+        if not valid:
+            return JsonResponse({"error": "Invalid email or password."}, status=status.HTTP_404_NOT_FOUND)
+        if upgraded:
+            user.password = upgraded
+            await user.asave(update_fields=['password'])
+
+        token = get_tokens_for_user(user)
+        return JsonResponse({'token': token, 'message': 'Login Successful.'}, status=status.HTTP_200_OK)
+
+
+class AsyncUserChangePasswordView(AsyncAuthView):
+    query_budget = 8
+
+    async def post(self, request, *args, **kwargs):
+        token_user = await self.authenticate(request)
+        serializer = UserChangePasswordSerializer(data=self.parse(request))
+        serializer.is_valid(raise_exception=True)
+        encoded = await amake_password(serializer.validated_data['password'])
+        user = await User.objects.aget(pk=token_user.pk)
+        await sync_to_async(serializer.update)(user, {**serializer.validated_data, 'encoded_password': encoded})
+        return JsonResponse({"message": "Password updated successfully"}, status=status.HTTP_200_OK)
+
+
 ### Send Password Reset Email ###
 class SendPasswordResetEmailView(APIView):
+    query_budget = 7
+
     def post(self, request, *args, **kwargs):
         serializer = SendPasswordResetEmailSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        serializer.save()
         return Response({"message": "Password reset mail sent successfully"}, status=status.HTTP_200_OK)
 
 
 ### Password Reset ###
 class UserPasswordResetView(APIView):
+    query_budget = 8
+
     def post(self, request, *args, **kwargs):
         uid = kwargs.get('uid')
         token = kwargs.get('token')
@@ -101,31 +240,108 @@ class UserPasswordResetView(APIView):
         return Response({'message': "Password reset successful."}, status=status.HTTP_200_OK)
 
 
+### Cached lookup tables ###
+# List/retrieve for Department, Role and Designation are served from the in-process lookup
+# cache. The ETag is the table's version, so clients revalidating with If-None-Match get a
+# 304 until something in the table changes.
+class CachedLookupMixin:
+    def list(self, request, *args, **kwargs):
+        cache = lookup_cache(self.queryset.model)
+        version, rows, _ = cache.snapshot()
+        headers = {'ETag': cache.etag(version), 'Cache-Control': 'private, no-cache'}
+        if self.not_modified(request, headers['ETag']):
+            return HttpResponseNotModified(headers=headers)
+
+        paginator = self.paginator
+        if paginator is None:
+            return Response(self.get_serializer(rows, many=True).data, headers=headers)
+        if paginator.cursor_query_param not in request.query_params and len(rows) <= paginator.get_page_size(request):
+            # The whole table fits on the first page: same body the paginator would produce
+            return Response({'next': None, 'previous': None, 'results': self.get_serializer(rows, many=True).data},
+                            headers=headers)
+
+        response = super().list(request, *args, **kwargs)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        cache = lookup_cache(self.queryset.model)
+        version = cache.snapshot()[0]
+        value = str(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        instance = cache.get(int(value)) if value.isdigit() else None
+        if instance is None:
+            raise Http404
+        self.check_object_permissions(request, instance)
+
+        headers = {'ETag': cache.etag(version), 'Cache-Control': 'private, no-cache'}
+        if self.not_modified(request, headers['ETag']):
+            return HttpResponseNotModified(headers=headers)
+        return Response(self.get_serializer(instance).data, headers=headers)
+
+    def not_modified(self, request, etag):
+        if_none_match = request.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags or f'W/{etag}' in etags
+
+
 ### Department ViewSet ###
-class DepartmentViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+class DepartmentViewSet(CachedLookupMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, RolePermission]
+    query_budget = {'list': 11, 'retrieve': 11, 'create': 17, 'update': 18, 'partial_update': 18}
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
 
 
 ### Role ViewSet ###
-class RoleViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+class RoleViewSet(CachedLookupMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, RolePermission]
+    query_budget = {'list': 11, 'retrieve': 11, 'create': 17, 'update': 18, 'partial_update': 18}
     queryset = Role.objects.all()
     serializer_class = RoleSerializer
 
 
 ### Designation ViewSet ###
-class DesignationViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+class DesignationViewSet(CachedLookupMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, RolePermission]
+    query_budget = {'list': 11, 'retrieve': 11, 'create': 17, 'update': 18, 'partial_update': 18}
     queryset = Designation.objects.all()
     serializer_class = DesignationSerializer
 
+### Bulk link assignment ###
+# POST <links>/bulk/ with {"mode": "add" | "replace", "links": [{"emp_id": .., "<target>_id": ..}, ...]}
+# or just the list (mode 'add'). Replace mode also takes "emp_ids" for users whose links are
+# all removed. Every id is checked before anything is written. The action needs the add
+# permission like any POST; replace mode deletes links, so it needs the delete permission too.
+class BulkLinkMixin:
+    bulk_serializer_class = None
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        data = request.data
+        if isinstance(data, list):
+            data = {'links': data}
+        if isinstance(data, dict) and data.get('mode') == 'replace' and role_checks_enabled():
+            meta = self.queryset.model._meta
+            if not request.user.has_perm(f'{meta.app_label}.delete_{meta.model_name}'):
+                return Response(
+                    {"error": "Replacing links needs permission to delete them."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        serializer = self.bulk_serializer_class(data=data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save(), status=status.HTTP_200_OK)
+
+
 ### UserRole ViewSet
-class UserRoleViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+class UserRoleViewSet(BulkLinkMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, RolePermission]
+    query_budget = {'list': 6, 'retrieve': 6, 'create': 24, 'update': 27, 'partial_update': 26, 'bulk': 26}
     queryset = UserRole.objects.all()
     serializer_class = UserRoleSerializer
+    bulk_serializer_class = BulkUserRoleSerializer
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -170,10 +386,12 @@ class UserRoleViewSet(viewsets.ModelViewSet):
         )
 
 ### UserDepartment ViewSet
-class UserDepartmentViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+class UserDepartmentViewSet(BulkLinkMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, RolePermission]
+    query_budget = {'list': 6, 'retrieve': 6, 'create': 24, 'update': 27, 'partial_update': 26, 'bulk': 25}
     queryset = UserDepartment.objects.all()
     serializer_class = UserDepartmentSerializer
+    bulk_serializer_class = BulkUserDepartmentSerializer
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -218,10 +436,12 @@ class UserDepartmentViewSet(viewsets.ModelViewSet):
         )
 
 ### UserDesignation ViewSet : need update
-class UserDesignationViewSet(viewsets.ModelViewSet):
-    permission_classes = [IsAuthenticated]
+class UserDesignationViewSet(BulkLinkMixin, viewsets.ModelViewSet):
+    permission_classes = [IsAuthenticated, RolePermission]
+    query_budget = {'list': 6, 'retrieve': 6, 'create': 24, 'update': 27, 'partial_update': 26, 'bulk': 25}
     queryset = UserDesignation.objects.all()
     serializer_class = UserDesignationSerializer
+    bulk_serializer_class = BulkUserDesignationSerializer
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -265,3 +485,48 @@ class UserDesignationViewSet(viewsets.ModelViewSet):
             status=status.HTTP_204_NO_CONTENT
         )
 
+
+### Employee Directory ###
+# Paginated employees with their roles, departments and designations embedded.
+# One query for the page plus one per relation, whatever the page size.
+# Filter with ?department=<dept_id>, ?role=<role_id> and/or ?designation=<desgn_id>.
+class EmployeeDirectoryView(generics.ListAPIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 9
+    serializer_class = EmployeeDirectorySerializer
+    filters = {
+        'department': 'userdepartment__department_id',
+        'role': 'userrole__role_id',
+        'designation': 'userdesignation__designation_id',
+    }
+
+    def get_queryset(self):
+        queryset = User.objects.filter(is_active=True).prefetch_related(
+            Prefetch('userrole_set', queryset=UserRole.objects.select_related('role')),
+            Prefetch('userdepartment_set', queryset=UserDepartment.objects.select_related('department')),
+            Prefetch('userdesignation_set', queryset=UserDesignation.objects.select_related('designation')),
+        )
+        for param, lookup in self.filters.items():
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            if not value.isdigit():
+                raise ValidationError({"error": f"{param} must be an id."})
+            # Each link table is unique on (user, target), so the join cannot duplicate users
+            queryset = queryset.filter(**{lookup: int(value)})
+        return queryset
+
+
+### Host Search ###
+# Ranked lookup of active employees by partial name: /emp/hosts/search/?q=<text>&limit=<n>
+class HostSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 7
+
+    def get(self, request, *args, **kwargs):
+        query, limit = parse_search_params(request)
+        ids = host_search.search(query, limit)
+        users = User.objects.in_bulk(ids)
+        ranked = [users[user_id] for user_id in ids if user_id in users]
+        serializer = UserProfileSerializer(ranked, many=True)
+        return Response({'count': len(ranked), 'results': serializer.data}, status=status.HTTP_200_OK)
@@ -0,0 +1,66 @@
+import struct
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import Max
+
+from .models import RevokedVisitCode, Visitor
+
+# Binary snapshot of valid visit codes for gate controllers:
+#   b'VMSA' | format (u8) | version (u64, ms since epoch) | count (u32) | entry size (u8)
+#   followed by `count` entries of `entry size` bytes: ASCII visit codes, NUL padded, sorted
+# so a controller can binary-search the buffer without unpacking it.
+SNAPSHOT_MAGIC = b'VMSA'
+SNAPSHOT_FORMAT = 1
+ENTRY_SIZE = 8
+_HEADER = struct.Struct('>4sBQIB')
+
+
+def _to_version(value):
+    return int(value.timestamp() * 1000) if value else 0
+
+
+def _from_version(version):
+    return datetime.fromtimestamp(version / 1000, tz=timezone.utc)
+
+
+# Version of the allowlist: the latest visitor write or revocation, in milliseconds
+def current_version():
+    latest_update = Visitor.objects.aggregate(latest=Max('updated_at'))['latest']
+    latest_revocation = RevokedVisitCode.objects.aggregate(latest=Max('revoked_at'))['latest']
+    return max(_to_version(latest_update), _to_version(latest_revocation))
+
+
+def build_snapshot():
+    version = current_version()
+    codes = sorted(
+        code.encode('ascii').ljust(ENTRY_SIZE, b'\0')
+        for code in Visitor.objects.exclude(visit_code=None).values_list('visit_code', flat=True).iterator(chunk_size=10000)
+    )
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, version, len(codes), ENTRY_SIZE)
+    return version, header + b''.join(codes)
+
+
+def parse_snapshot(data):
+    magic, fmt, version, count, entry_size = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT:
+        raise ValueError("Not an allowlist snapshot.")
+    body = data[_HEADER.size:]
+    codes = [body[i:i + entry_size].rstrip(b'\0').decode('ascii') for i in range(0, count * entry_size, entry_size)]
+    return version, codes
+
+
+# Codes added or revoked since `since`. Reads back a small overlap window so writes that
+# committed late with an older timestamp are not missed; applying a delta is idempotent.
+def build_delta(since):
+    version = current_version()
+    overlap = getattr(settings, 'VISITOR_ALLOWLIST_OVERLAP', timedelta(seconds=5))
+    start = _from_version(since) - overlap
+
+    added = list(
+        Visitor.objects.filter(updated_at__gte=start).exclude(visit_code=None)
+        .values_list('visit_code', flat=True)
+    )
+    revoked = set(RevokedVisitCode.objects.filter(revoked_at__gte=start).values_list('visit_code', flat=True))
+    revoked.difference_update(added)
+    return {'since': since, 'version': version, 'added': sorted(added), 'revoked': sorted(revoked)}
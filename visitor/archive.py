@@ -0,0 +1,168 @@
+import gzip
+import json
+import os
+from collections import Counter, defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from . import occupancy
+from .models import Turnstile, TurnstileLog
+
+# Turnstile history older than the retention horizon is moved, together with its logs, into
+# monthly gzip NDJSON files (turnstiles-YYYY-MM.ndjson.gz, one turnstile entry per line).
+# Logs with no entry (denied scans) go to scanlogs-YYYY-MM.ndjson.gz by scanned_at.
+# Each batch is appended to its files before the rows are deleted, so a crash can at worst
+# leave a batch duplicated in the archive, never lost. Readers skip the duplicates.
+TURNSTILES = 'turnstiles'
+SCAN_LOGS = 'scanlogs'
+
+
+def archive_dir():
+    return str(getattr(settings, 'VISITOR_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive')))
+
+
+def _month_path(kind, year, month):
+    return os.path.join(archive_dir(), f'{kind}-{year:04d}-{month:02d}.ndjson.gz')
+
+
+# Append records to their monthly files, keyed by the datetime `month_of(record)` returns
+def _write(kind, records, month_of):
+    by_month = defaultdict(list)
+    for record in records:
+        moment = month_of(record)
+        by_month[(moment.year, moment.month)].append(record)
+
+    os.makedirs(archive_dir(), exist_ok=True)
+    for (year, month), month_records in by_month.items():
+        # Appending adds a new gzip member; readers see one continuous stream
+        with gzip.open(_month_path(kind, year, month), 'at', encoding='utf-8') as f:
+            for record in month_records:
+                f.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _archive_batch(ids):
+    turnstiles = list(
+        Turnstile.objects.filter(id__in=ids)
+        .values('id', 'visitor_id', 'visitor__visitor_name', 'visitor__registered_by', 'entry_time', 'exit_time')
+    )
+    logs = defaultdict(list)
+    for log in TurnstileLog.objects.filter(turnstile_id__in=ids).values(
+            'id', 'turnstile_id', 'qr_code_scan', 'status', 'scanned_at').order_by('id'):
+        logs[log.pop('turnstile_id')].append(log)
+
+    _write(TURNSTILES, [
+        {
+            'id': row['id'],
+            'visitor_id': row['visitor_id'],
+            'visitor_name': row['visitor__visitor_name'],
+            'entry_time': row['entry_time'],
+            'exit_time': row['exit_time'],
+            'logs': logs.get(row['id'], []),
+        }
+        for row in turnstiles
+    ], lambda record: record['entry_time'])
+
+    # Entries never scanned out are still counted as inside; take them off per host at once
+    # rather than through the per-row delete signal
+    still_open = Counter(row['visitor__registered_by'] for row in turnstiles if row['exit_time'] is None)
+    with transaction.atomic():
+        log_count, _ = TurnstileLog.objects.filter(turnstile_id__in=ids).delete()
+        with occupancy.untracked():
+            turnstile_count, _ = Turnstile.objects.filter(id__in=ids).delete()
+        for host_id, count in still_open.items():
+            occupancy.adjust(host_id, -count)
+    return turnstile_count, log_count
+
+
+# Move turnstile entries (and their logs) with entry_time before `cutoff` into the archive,
+# `batch_size` entries per transaction. Yields (turnstiles, logs) archived per batch.
+def archive_turnstiles(cutoff, batch_size=1000):
+    last_id = 0
+    while True:
+        ids = list(
+            Turnstile.objects.filter(entry_time__lt=cutoff, id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield _archive_batch(ids)
+
+
+# Move logs with no turnstile entry (denied scans) scanned before `cutoff` into the archive,
+# `batch_size` per transaction. Yields the number of logs archived per batch.
+def archive_scan_logs(cutoff, batch_size=1000):
+    last_id = 0
+    while True:
+        rows = list(
+            TurnstileLog.objects.filter(turnstile__isnull=True, scanned_at__lt=cutoff, id__gt=last_id)
+            .order_by('id').values('id', 'qr_code_scan', 'status', 'scanned_at')[:batch_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1]['id']
+        _write(SCAN_LOGS, rows, lambda record: record['scanned_at'])
+        count, _ = TurnstileLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        yield count
+
+
+def _months(start, end):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+# Records of one kind from the monthly files overlapping start..end (all files when neither
+# is given). A record written twice (a batch re-archived after a crash) is yielded once;
+# both copies are in the same monthly file.
+def _read(kind, start=None, end=None):
+    if start is not None or end is not None:
+        paths = [_month_path(kind, year, month)
+                 for year, month in _months(start or date(1970, 1, 1), end or date.today())]
+    else:
+        directory = archive_dir()
+        paths = sorted(
+            os.path.join(directory, name) for name in (os.listdir(directory) if os.path.isdir(directory) else [])
+            if name.startswith(f'{kind}-') and name.endswith('.ndjson.gz')
+        )
+
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record['id'] in seen:
+                    continue
+                seen.add(record['id'])
+                yield record
+
+
+def _in_range(value, start, end):
+    day = parse_datetime(value).date()
+    return (start is None or day >= start) and (end is None or day <= end)
+
+
+# Read archived turnstile entries, optionally for one visitor and/or an entry_time date range.
+# Only the monthly files overlapping the range are opened.
+def iter_archive(visitor_id=None, start=None, end=None):
+    for record in _read(TURNSTILES, start, end):
+        if visitor_id is not None and record['visitor_id'] != visitor_id:
+            continue
+        if _in_range(record['entry_time'], start, end):
+            yield record
+
+
+# Read archived logs without a turnstile entry, optionally for a scanned_at date range
+def iter_scan_logs(start=None, end=None):
+    for record in _read(SCAN_LOGS, start, end):
+        if _in_range(record['scanned_at'], start, end):
+            yield record
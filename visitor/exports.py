@@ -0,0 +1,135 @@
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.timezone import get_current_timezone, make_aware
+
+from .models import TurnstileLog, Visitor
+
+# Streaming exports for compliance. Rows are read in keyset-ordered chunks (WHERE pk > last
+# ORDER BY pk LIMIT n) rather than one big cursor, because the MySQL driver buffers a whole
+# result set client-side; memory stays flat whatever the date range.
+
+EXPORTS = {
+    'turnstile-logs': {
+        'model': TurnstileLog,
+        'date_field': 'scanned_at',
+        'columns': [
+            ('log_id', 'id'),
+            ('scanned_at', 'scanned_at'),
+            ('status', 'status'),
+            ('qr_code_scan', 'qr_code_scan'),
+            ('turnstile_id', 'turnstile_id'),
+            ('entry_time', 'turnstile__entry_time'),
+            ('exit_time', 'turnstile__exit_time'),
+            ('visitor_id', 'turnstile__visitor_id'),
+            ('visitor_name', 'turnstile__visitor__visitor_name'),
+            ('visitor_email', 'turnstile__visitor__visitor_email'),
+            ('visitor_mobile', 'turnstile__visitor__visitor_mobile'),
+        ],
+    },
+    'visitors': {
+        'model': Visitor,
+        'date_field': 'created_at',
+        'columns': [
+            ('visitor_id', 'visitor_id'),
+            ('visitor_name', 'visitor_name'),
+            ('visitor_email', 'visitor_email'),
+            ('visitor_mobile', 'visitor_mobile'),
+            ('registered_by', 'registered_by_id'),
+            ('employee_name', 'employee_name'),
+            ('purpose', 'purpose'),
+            ('visit_code', 'visit_code'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+        ],
+    },
+}
+
+OUTPUT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _day_start(day):
+    return make_aware(datetime.combine(day, time.min), get_current_timezone())
+
+
+def export_columns(kind):
+    return [name for name, _ in EXPORTS[kind]['columns']]
+
+
+# Rows of the export as tuples, `start`/`end` being inclusive dates on the export's date field
+def iter_rows(kind, start=None, end=None, chunk_size=2000):
+    spec = EXPORTS[kind]
+    model, date_field = spec['model'], spec['date_field']
+    pk_name = model._meta.pk.name
+    lookups = [lookup for _, lookup in spec['columns']]
+
+    queryset = model.objects.all()
+    if start is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': _day_start(start)})
+    if end is not None:
+        queryset = queryset.filter(**{f'{date_field}__lt': _day_start(end + timedelta(days=1))})
+
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(**{f'{pk_name}__gt': last_pk})
+        rows = list(chunk.order_by(pk_name).values_list(pk_name, *lookups)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        for row in rows:
+            yield row[1:]
+        if len(rows) < chunk_size:
+            return
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+# Encoded chunks of the export: the header goes out first, then one chunk per `rows_per_chunk` rows
+def render(kind, rows, output='csv', rows_per_chunk=500):
+    columns = export_columns(kind)
+    if output == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns).encode()
+        encode = lambda row: writer.writerow([_format_value(value) for value in row])
+    else:
+        encode = lambda row: json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+    buffer = []
+    for row in rows:
+        buffer.append(encode(row))
+        if len(buffer) >= rows_per_chunk:
+            yield ''.join(buffer).encode()
+            buffer = []
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+# Gzip a stream of chunks incrementally; each chunk is sync-flushed so bytes reach the client
+# as soon as they are produced.
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(kind, start=None, end=None, output='csv', compress=False):
+    chunks = render(kind, iter_rows(kind, start, end), output)
+    return gzip_chunks(chunks) if compress else chunks
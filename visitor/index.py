@@ -0,0 +1,152 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from employee.versioning import VersionCounter
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'visitor:visit-code-version'
+
+
+# Warm in-process map of visit_code -> (visitor_id, registered_by_id) for the scan path.
+# Kept current by the Visitor save/delete signals in this process. Every revocation
+# (reissued or deleted code) bumps a version in the shared cache; a process that sees a new
+# version drops the codes revoked since its last check before answering from the map. The
+# full reload after the TTL runs in one background thread while the old map keeps serving.
+class VisitCodeIndex:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._codes = None
+        self._code_by_visitor = {}
+        self._loaded_at = 0.0
+        self._loading = False
+        self._version = None
+        self._revoked_since = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._clock = VersionCounter(VERSION_KEY, 'VISITOR_SCAN_INDEX_VERSION_TTL')
+
+    def lookup(self, visit_code):
+        codes = self._codes if self._ensure_fresh() else None
+        entry = codes.get(visit_code) if codes is not None else None
+        if entry is None:
+            # Possibly created by another process since the last load
+            entry = self._fetch(visit_code)
+        return entry
+
+    # Starts a background reload when the map is missing or past the TTL, and applies
+    # revocations when the shared version moved. True when the map can answer lookups.
+    def _ensure_fresh(self):
+        with self._lock:
+            reload = not self._loading and (self._codes is None or time.monotonic() - self._loaded_at > self.ttl)
+            if reload:
+                self._loading = True
+        if reload:
+            if getattr(settings, 'VISITOR_SCAN_INDEX_LOAD_IN_BACKGROUND', True):
+                threading.Thread(target=self._load_in_worker, name='visit-code-index', daemon=True).start()
+            else:
+                self._load_once()
+        if self._codes is None:
+            return False
+
+        version = self._clock.current()
+        if self._version == version:
+            return True
+        # One thread applies the revocations; the others query the table meanwhile
+        if not self._sync_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._version != version:
+                self._drop_revoked(version)
+        finally:
+            self._sync_lock.release()
+        return True
+
+    # Drop codes revoked since the last check, with some overlap for in-flight transactions
+    def _drop_revoked(self, version):
+        from .models import RevokedVisitCode
+
+        started = timezone.now()
+        revoked = list(RevokedVisitCode.objects.filter(revoked_at__gte=self._revoked_since - timedelta(seconds=5))
+                       .values_list('visit_code', 'visitor_id'))
+        with self._lock:
+            codes = self._codes if self._codes is not None else {}
+            for visit_code, visitor_id in revoked:
+                if codes.get(visit_code, (None,))[0] == visitor_id:
+                    del codes[visit_code]
+                    self._code_by_visitor.pop(visitor_id, None)
+            self._version, self._revoked_since = version, started
+
+    def load(self):
+        from .models import Visitor
+
+        # Taken before the rows: revocations during the load are applied by the next check
+        version, started = self._clock.current(), timezone.now()
+        codes, by_visitor = {}, {}
+        rows = Visitor.objects.exclude(visit_code=None).values_list('visit_code', 'visitor_id', 'registered_by_id')
+        for visit_code, visitor_id, registered_by_id in rows.iterator(chunk_size=5000):
+            codes[visit_code] = (visitor_id, registered_by_id)
+            by_visitor[visitor_id] = visit_code
+        with self._lock:
+            self._codes, self._code_by_visitor = codes, by_visitor
+            self._loaded_at = time.monotonic()
+            self._version, self._revoked_since = version, started
+        return codes
+
+    def _load_once(self):
+        try:
+            self.load()
+        finally:
+            self._loading = False
+
+    def _load_in_worker(self):
+        close_old_connections()
+        try:
+            self._load_once()
+        except Exception:
+            logger.exception("Loading the visit code index failed")
+        finally:
+            close_old_connections()
+
+    def _fetch(self, visit_code):
+        from .models import Visitor
+
+        row = Visitor.objects.filter(visit_code=visit_code).values_list('visitor_id', 'registered_by_id').first()
+        if row is not None:
+            self._put(visit_code, *row)
+        return row
+
+    def update(self, visitor):
+        self.discard(visitor.visitor_id)
+        if visitor.visit_code:
+            self._put(visitor.visit_code, visitor.visitor_id, visitor.registered_by_id)
+
+    def discard(self, visitor_id):
+        with self._lock:
+            visit_code = self._code_by_visitor.pop(visitor_id, None)
+            if visit_code is not None and self._codes is not None:
+                self._codes.pop(visit_code, None)
+
+    # A code stopped being valid: other processes drop their maps once the transaction commits
+    def revoked(self):
+        transaction.on_commit(self._clock.bump)
+
+    def clear(self):
+        with self._lock:
+            self._codes = None
+            self._code_by_visitor = {}
+
+    def _put(self, visit_code, visitor_id, registered_by_id):
+        with self._lock:
+            if self._codes is not None:
+                self._codes[visit_code] = (visitor_id, registered_by_id)
+            self._code_by_visitor[visitor_id] = visit_code
+
+
+visit_code_index = VisitCodeIndex(ttl=getattr(settings, 'VISITOR_SCAN_INDEX_TTL', 300))
@@ -0,0 +1,162 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+# Bounded in-process buffer for TurnstileLog rows.
+# A background thread writes them with bulk_create every `batch_size` rows or
+# `flush_interval_ms`, whichever comes first. When the buffer is full the row is written
+# synchronously, and stop() (registered with atexit) drains whatever is left. Rows
+# submitted after stop() are written synchronously too.
+class TurnstileLogBuffer:
+    def __init__(self, max_size=10000, batch_size=500, flush_interval_ms=200):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'flushes': 0,
+            'rows_flushed': 0,
+            'last_flush_size': 0,
+            'max_flush_size': 0,
+            'last_lag_ms': 0.0,
+            'max_lag_ms': 0.0,
+            'sync_writes': 0,
+            'failed_rows': 0,
+        }
+
+    def submit(self, log):
+        if self._stop.is_set():
+            self._write_now(log)
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((time.monotonic(), log))
+        except queue.Full:
+            self._write_now(log)
+            return
+        if self._stop.is_set():
+            # stop() ran while the row was queued and may have drained before it arrived
+            self.drain()
+
+    def _write_now(self, log):
+        log.save()
+        with self._stats_lock:
+            self._stats['sync_writes'] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {**self._stats, 'pending': self._queue.qsize()}
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.drain()
+
+    # Write everything currently buffered from the calling thread
+    def drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='turnstile-log-flusher', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                close_old_connections()
+                try:
+                    self._flush(batch)
+                finally:
+                    close_old_connections()
+
+    def _take_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        from .models import TurnstileLog
+
+        logs = [log for _, log in batch]
+        failed = 0
+        try:
+            TurnstileLog.objects.bulk_create(logs)
+        except Exception:
+            # Isolate the bad rows instead of losing the whole batch
+            logger.exception("Bulk write of %d turnstile logs failed, retrying row by row", len(logs))
+            for log in logs:
+                try:
+                    log.save()
+                except Exception:
+                    failed += 1
+                    logger.exception("Dropping turnstile log for turnstile %s", log.turnstile_id)
+
+        lag_ms = (time.monotonic() - batch[0][0]) * 1000
+        with self._stats_lock:
+            self._stats['flushes'] += 1
+            self._stats['rows_flushed'] += len(logs) - failed
+            self._stats['failed_rows'] += failed
+            self._stats['last_flush_size'] = len(logs)
+            self._stats['max_flush_size'] = max(self._stats['max_flush_size'], len(logs))
+            self._stats['last_lag_ms'] = lag_ms
+            self._stats['max_lag_ms'] = max(self._stats['max_lag_ms'], lag_ms)
+        logger.debug("Flushed %d turnstile logs, lag %.1f ms", len(logs), lag_ms)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+# The configured buffer, or None when buffered ingestion is switched off
+def get_log_buffer():
+    global _buffer
+    config = getattr(settings, 'VISITOR_SCAN_LOG_BUFFER', {})
+    if not config.get('ENABLED', False):
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = TurnstileLogBuffer(
+                    max_size=config.get('MAX_SIZE', 10000),
+                    batch_size=config.get('BATCH_SIZE', 500),
+                    flush_interval_ms=config.get('FLUSH_INTERVAL_MS', 200),
+                )
+                atexit.register(_buffer.stop)
+    return _buffer
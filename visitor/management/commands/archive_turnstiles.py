@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from visitor.archive import archive_dir, archive_scan_logs, archive_turnstiles
+
+
+class Command(BaseCommand):
+    help = ("Move turnstile entries and logs older than the retention horizon into monthly NDJSON archives, "
+            "then the logs of denied scans, which have no entry.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'VISITOR_RETENTION_DAYS', 90),
+                            help="Keep this many days of history in the live tables.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Turnstile entries (or denied scan logs) moved per transaction.")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to sleep between batches to leave room for live traffic.")
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(days=options['days'])
+        total_turnstiles = total_logs = 0
+        for turnstiles, logs in archive_turnstiles(cutoff, batch_size=options['batch_size']):
+            total_turnstiles += turnstiles
+            total_logs += logs
+            self.stdout.write(f"Archived {turnstiles} entries and {logs} logs")
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        for logs in archive_scan_logs(cutoff, batch_size=options['batch_size']):
+            total_logs += logs
+            self.stdout.write(f"Archived {logs} denied scan logs")
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {total_turnstiles} turnstile entries and {total_logs} logs older than "
+            f"{cutoff:%Y-%m-%d} to {archive_dir()}"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from visitor.allowlist import build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Export the currently valid visit codes as a binary allowlist snapshot for gate controllers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="File to write the snapshot to.")
+
+    def handle(self, *args, **options):
+        version, snapshot = build_snapshot()
+        with open(options['output'], 'wb') as f:
+            f.write(snapshot)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote allowlist version {version} ({len(snapshot)} bytes) to {options['output']}"
+        ))
@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from visitor.exports import EXPORTS, OUTPUT_FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream turnstile logs or the visitor register to a CSV/NDJSON file, optionally gzipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--from', dest='start', help="First day to include (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='end', help="Last day to include (YYYY-MM-DD).")
+        parser.add_argument('--output-format', choices=sorted(OUTPUT_FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help="Gzip the output.")
+        parser.add_argument('--output', help="File to write to (defaults to stdout).")
+
+    def handle(self, *args, **options):
+        dates = {}
+        for key in ('start', 'end'):
+            value = options[key]
+            # parse_date returns None for a malformed value and raises for an impossible one (2024-02-30)
+            try:
+                dates[key] = parse_date(value) if value else None
+            except ValueError:
+                dates[key] = None
+            if value and dates[key] is None:
+                raise CommandError(f"Invalid date: {value}")
+
+        chunks = stream_export(options['kind'], dates['start'], dates['end'],
+                               output=options['output_format'], compress=options['gzip'])
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
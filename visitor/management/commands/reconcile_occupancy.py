@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from visitor.occupancy import reconcile
+
+
+class Command(BaseCommand):
+    help = "Rebuild the live occupancy counters from the open turnstile entries."
+
+    def handle(self, *args, **options):
+        total = reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Occupancy reconciled: {total} visitors inside"))
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+
+# Visitors created before this migration already have their badge on disk
+def mark_existing_ready(apps, schema_editor):
+    Visitor = apps.get_model('visitor', 'Visitor')
+    Visitor.objects.exclude(qr_code='').exclude(qr_code__isnull=True).update(qr_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitor', '0002_rename_token_visitor_purpose_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitor',
+            name='qr_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitor', '0003_visitor_qr_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedVisitCode',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('visit_code', models.CharField(max_length=8)),
+                ('visitor_id', models.IntegerField(blank=True, null=True)),
+                ('revoked_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='visitor',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
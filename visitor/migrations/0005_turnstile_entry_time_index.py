@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitor', '0004_revokedvisitcode_and_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='turnstile',
+            name='entry_time',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
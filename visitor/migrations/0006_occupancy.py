@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:48
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Seed the counters from the entries that are open today
+def seed_occupancy(apps, schema_editor):
+    Turnstile = apps.get_model('visitor', 'Turnstile')
+    Occupancy = apps.get_model('visitor', 'Occupancy')
+    counts = (Turnstile.objects.filter(exit_time__isnull=True)
+              .values('visitor__registered_by').annotate(inside=Count('id')))
+    Occupancy.objects.bulk_create(
+        Occupancy(host_key=row['visitor__registered_by'] or 0, inside=row['inside']) for row in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitor', '0005_turnstile_entry_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Occupancy',
+            fields=[
+                ('host_key', models.IntegerField(primary_key=True, serialize=False)),
+                ('inside', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+INDEX_NAME = 'visitor_search_ft'
+COLUMNS = ('visitor_name', 'visitor_email', 'visitor_mobile')
+
+
+# MySQL only: an ngram FULLTEXT index lets visitor search match substrings without a scan.
+# Other databases use the in-process index in visitor_management_system/search.py.
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    table = apps.get_model('visitor', 'Visitor')._meta.db_table
+    columns = ', '.join(schema_editor.quote_name(column) for column in COLUMNS)
+    schema_editor.execute(
+        f'CREATE FULLTEXT INDEX {schema_editor.quote_name(INDEX_NAME)} '
+        f'ON {schema_editor.quote_name(table)} ({columns}) WITH PARSER ngram'
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    table = apps.get_model('visitor', 'Visitor')._meta.db_table
+    schema_editor.execute(f'DROP INDEX {schema_editor.quote_name(INDEX_NAME)} ON {schema_editor.quote_name(table)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitor', '0006_occupancy'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
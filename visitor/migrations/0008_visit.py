@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Existing visitors get one Visit for the registration that created them
+def backfill_visits(apps, schema_editor):
+    Visitor = apps.get_model('visitor', 'Visitor')
+    Visit = apps.get_model('visitor', 'Visit')
+    rows = Visitor.objects.order_by('pk').values_list('pk', 'registered_by_id', 'purpose', 'visit_code', 'created_at')
+    batch = []
+    for visitor_id, host_id, purpose, visit_code, created_at in rows.iterator(chunk_size=2000):
+        batch.append(Visit(visitor_id=visitor_id, host_id=host_id, purpose=purpose,
+                           visit_code=visit_code or '', checked_in_at=created_at))
+        if len(batch) >= 2000:
+            Visit.objects.bulk_create(batch)
+            batch = []
+    Visit.objects.bulk_create(batch)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitor', '0007_visitor_search_fulltext'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Visit',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('purpose', models.CharField(max_length=255)),
+                ('visit_code', models.CharField(max_length=8)),
+                ('checked_in_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('host', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='hosted_visits', to=settings.AUTH_USER_MODEL)),
+                ('visitor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visits', to='visitor.visitor')),
+            ],
+        ),
+        migrations.RunPython(backfill_visits, migrations.RunPython.noop),
+    ]
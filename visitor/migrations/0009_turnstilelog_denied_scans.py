@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitor', '0008_visit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='turnstilelog',
+            name='turnstile',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='turnstile_logs', to='visitor.turnstile'),
+        ),
+    ]
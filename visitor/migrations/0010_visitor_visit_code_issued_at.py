@@ -0,0 +1,26 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+# Badges already handed out were signed with updated_at as the start of their window
+def backfill_issued_at(apps, schema_editor):
+    Visitor = apps.get_model('visitor', 'Visitor')
+    Visitor.objects.exclude(visit_code=None).update(visit_code_issued_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visitor', '0009_turnstilelog_denied_scans'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitor',
+            name='visit_code_issued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_issued_at, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,21 @@
-from django.db import models
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, transaction
 from django.utils.timezone import now
 from employee.models import User  # Importing User from the employee app
 import uuid
-import qrcode
-from io import BytesIO
-from django.core.files import File
+from django.core.files.base import ContentFile
+from .qr import render_qr_png
+from .tasks import enqueue_qr_render
+from .tokens import can_sign, make_visit_token
 
 # Visitor Model
 class Visitor(models.Model):
+    QR_PENDING = 'pending'
+    QR_READY = 'ready'
+    QR_FAILED = 'failed'
+    QR_STATUS_CHOICES = [(QR_PENDING, 'Pending'), (QR_READY, 'Ready'), (QR_FAILED, 'Failed')]
+
     visitor_id = models.AutoField(primary_key=True)
     visitor_name = models.CharField(max_length=100, null=False)
     visitor_email = models.EmailField(unique=True, null=False)
@@ -22,38 +30,102 @@ class Visitor(models.Model):
     employee_name = models.CharField(max_length=255, null=True, blank=True)
     purpose = models.CharField(max_length=255, null=False)
     visit_code = models.CharField(max_length=8, unique=True, null=True, blank=True)
+    visit_code_issued_at = models.DateTimeField(null=True, blank=True)
     qr_code = models.ImageField(upload_to='qr_codes/', null=True, blank=True)
+    qr_status = models.CharField(max_length=10, choices=QR_STATUS_CHOICES, default=QR_PENDING)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.visitor_name} ({self.visitor_email})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored code so a reissue can be recorded as a revocation
+        instance._loaded_visit_code = instance.__dict__.get('visit_code')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.visit_code:
             self.visit_code = str(uuid.uuid4())[:8]  # Generate a unique visit_code of size 8
+        loaded = getattr(self, '_loaded_visit_code', None)
+        if self._state.adding or self.visit_code_issued_at is None or (loaded and loaded != self.visit_code):
+            # A new code starts a new signed-badge validity window
+            self.visit_code_issued_at = now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'visit_code_issued_at'}
+
+        mode = self.qr_render_mode()
+        if mode == 'inline':
+            super().save(*args, **kwargs)
+            self.generate_qr_code()
+            return
+
+        # Single write here. 'background' renders the badge on the worker pool once the row
+        # is committed, 'on_demand' never stores one and serves it from /visitors/{id}/qr/
+        self.qr_status = self.QR_READY if mode == 'on_demand' else self.QR_PENDING
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'qr_status'}
         super().save(*args, **kwargs)
-        self.generate_qr_code()
+        if mode == 'background':
+            visitor_id, payload = self.visitor_id, self.qr_payload()
+            transaction.on_commit(lambda: enqueue_qr_render(visitor_id, payload), using=kwargs.get('using'))
+
+    @staticmethod
+    def qr_render_mode():
+        return getattr(settings, 'VISITOR_QR_RENDER_MODE', 'inline')
+
+    def qr_payload(self):
+        if getattr(settings, 'VISITOR_QR_PAYLOAD', 'legacy') == 'signed' and can_sign(self.visit_code):
+            # Window is anchored on when the code was issued, so edits to the row don't move it
+            issued = (self.visit_code_issued_at or self.created_at or now()).timestamp()
+            lifetime = getattr(settings, 'VISITOR_QR_TOKEN_LIFETIME', timedelta(days=1)).total_seconds()
+            return make_visit_token(self.visitor_id, self.visit_code, issued, issued + lifetime)
+        return f"ID: {self.visitor_id}, Name: {self.visitor_name}, Mobile: {self.visitor_mobile}, Visit Code: {self.visit_code}"
 
     def generate_qr_code(self):
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr_data = f"ID: {self.visitor_id}, Name: {self.visitor_name}, Mobile: {self.visitor_mobile}, Visit Code: {self.visit_code}"
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill='black', back_color='white')
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
+        png = render_qr_png(self.qr_payload())
         filename = f'qr_code_{self.visitor_id}.png'
-        self.qr_code.save(filename, File(buffer), save=False)
+        self.qr_code.save(filename, ContentFile(png), save=False)
+        self.qr_status = self.QR_READY
         super().save()
 
 
+# Visit Model
+# One row per check-in. The Visitor row holds the person and the code for their latest
+# visit; the history of visits (host, purpose, code issued) is kept here.
+class Visit(models.Model):
+    id = models.AutoField(primary_key=True)
+    visitor = models.ForeignKey(Visitor, on_delete=models.CASCADE, related_name='visits')
+    host = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='hosted_visits')
+    purpose = models.CharField(max_length=255)
+    visit_code = models.CharField(max_length=8)
+    checked_in_at = models.DateTimeField(default=now, db_index=True)
+
+    def __str__(self):
+        return f"Visit {self.id} by visitor {self.visitor_id} ({self.checked_in_at})"
+
+    # The visit for the visitor's current registration or check-in (unsaved)
+    @classmethod
+    def for_visitor(cls, visitor):
+        return cls(visitor=visitor, host_id=visitor.registered_by_id, purpose=visitor.purpose,
+                   visit_code=visitor.visit_code)
+
+
+# Revoked Visit Code Model
+# Codes that stopped being valid (visitor deleted or code reissued), for allowlist delta sync
+class RevokedVisitCode(models.Model):
+    id = models.AutoField(primary_key=True)
+    visit_code = models.CharField(max_length=8)
+    visitor_id = models.IntegerField(null=True, blank=True)
+    revoked_at = models.DateTimeField(default=now, db_index=True)
+
+    def __str__(self):
+        return f"{self.visit_code} revoked at {self.revoked_at}"
+
+
 # Turnstile Model
 class Turnstile(models.Model):
     id = models.AutoField(primary_key=True)
@@ -62,19 +134,28 @@ class Turnstile(models.Model):
         on_delete=models.CASCADE,
         related_name='turnstile_entries'
     )
-    entry_time = models.DateTimeField(default=now)
+    entry_time = models.DateTimeField(default=now, db_index=True)
     exit_time = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Turnstile Entry for {self.visitor.visitor_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember whether the entry was open so the occupancy counter sees exits
+        instance._loaded_exit_time = instance.__dict__.get('exit_time')
+        return instance
+
 
 # Turnstile Log Model
 class TurnstileLog(models.Model):
     id = models.AutoField(primary_key=True)
+    # Null for denied scans, which open no Turnstile entry
     turnstile = models.ForeignKey(
         Turnstile,
         on_delete=models.CASCADE,
+        null=True,
         related_name='turnstile_logs'
     )
     qr_code_scan = models.CharField(max_length=255, null=False)
@@ -82,4 +163,15 @@ class TurnstileLog(models.Model):
     scanned_at = models.DateTimeField(default=now)
 
     def __str__(self):
-        return f"Log ID {self.id} - {self.status} ({self.scanned_at})"
\ No newline at end of file
+        return f"Log ID {self.id} - {self.status} ({self.scanned_at})"
+
+
+# Occupancy Model
+# Visitors currently inside, kept per host employee (host_key 0 = visitors without a host)
+class Occupancy(models.Model):
+    host_key = models.IntegerField(primary_key=True)
+    inside = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Host {self.host_key}: {self.inside} inside"
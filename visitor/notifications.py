@@ -0,0 +1,194 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.timezone import localtime
+
+logger = logging.getLogger(__name__)
+
+
+# Tells host employees that their visitors have arrived, one digest email per host.
+# Scans only drop (host_id, visitor_id, entry_time) into a bounded queue; a background
+# thread groups arrivals per host for `window_seconds` after the first one and queues a
+# single digest in the email outbox. A host gets at most `max_per_hour` digests; arrivals
+# past the cap wait and go out in the next digest. A full queue drops the event rather
+# than slow the scan. Groups whose digest could not be queued are put back and retried.
+# Grouping is per process, so hosts may get one digest per worker.
+class ArrivalNotifier:
+    def __init__(self, window_seconds=30, max_per_hour=12, max_pending=10000, max_listed=20):
+        self.window = window_seconds
+        self.max_per_hour = max_per_hour
+        self.max_listed = max_listed
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}    # host_id -> [first arrival (monotonic), arrival count, {visitor_id: entry_time}]
+        self._sent = {}    # host_id -> monotonic times of the digests sent in the last hour
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Held by whoever touches _pending/_sent: the worker for a round, stop() for the final flush
+        self._work_lock = threading.Lock()
+        self._dropped = 0
+
+    def submit(self, host_id, visitor_id, entry_time):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((time.monotonic(), host_id, visitor_id, entry_time))
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped % 1000 == 1:
+                logger.warning("Arrival notification queue is full, %d arrivals dropped so far", self._dropped)
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # A worker still busy past the join timeout keeps the lock; its groups stay unsent
+        if not self._work_lock.acquire(timeout=timeout):
+            logger.warning("Arrival notifier still busy at shutdown, %d digests not sent", len(self._pending))
+            return
+        try:
+            # Send what is left without waiting out the window
+            self._collect(block=False)
+            self._send_or_restore(self._take_due(time.monotonic(), flush=True))
+        except Exception:
+            logger.exception("Sending arrival digests at shutdown failed, %d not sent", len(self._pending))
+        finally:
+            self._work_lock.release()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='arrival-notifier', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            failed = False
+            with self._work_lock:
+                self._collect(block=True)
+                due = self._take_due(time.monotonic())
+                if due:
+                    close_old_connections()
+                    try:
+                        self._send_or_restore(due)
+                    except Exception:
+                        failed = True
+                        logger.exception("Sending arrival digests failed, retrying in %s seconds", self.window)
+                    finally:
+                        close_old_connections()
+            if failed:
+                # The restored groups are due again at once; give the database a moment
+                self._stop.wait(self.window)
+
+    # Move queued arrivals into the per-host groups, waiting up to a second for the first one
+    def _collect(self, block):
+        try:
+            event = self._queue.get(timeout=1) if block else self._queue.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            queued_at, host_id, visitor_id, entry_time = event
+            group = self._pending.setdefault(host_id, [queued_at, 0, {}])
+            group[1] += 1
+            if len(group[2]) < self.max_listed:
+                group[2].setdefault(visitor_id, entry_time)
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    # Groups whose window has closed and whose host is under the hourly cap
+    def _take_due(self, now, flush=False):
+        due = {}
+        for host_id, group in list(self._pending.items()):
+            if not flush and now - group[0] < self.window:
+                continue
+            sent = self._sent.setdefault(host_id, deque())
+            while sent and now - sent[0] >= 3600:
+                sent.popleft()
+            if len(sent) >= self.max_per_hour:
+                continue
+            sent.append(now)
+            due[host_id] = group
+            del self._pending[host_id]
+        for host_id in [host_id for host_id, sent in self._sent.items() if not sent]:
+            del self._sent[host_id]
+        return due
+
+    # Send the due groups; on a failure the groups not yet queued go back to _pending
+    def _send_or_restore(self, due):
+        sent = set()
+        try:
+            self._send(due, sent)
+        except Exception:
+            self._restore({host_id: group for host_id, group in due.items() if host_id not in sent})
+            raise
+
+    # Merge groups back into _pending and give back the hourly slots _take_due reserved
+    def _restore(self, groups):
+        for host_id, (first, count, listed) in groups.items():
+            sent = self._sent.get(host_id)
+            if sent:
+                sent.pop()
+            group = self._pending.setdefault(host_id, [first, 0, {}])
+            group[0] = min(group[0], first)
+            group[1] += count
+            for visitor_id, entry_time in listed.items():
+                if len(group[2]) >= self.max_listed:
+                    break
+                group[2].setdefault(visitor_id, entry_time)
+
+    def _send(self, due, sent):
+        from employee.models import User
+        from employee.utils import Util
+        from .models import Visitor
+
+        if not due:
+            return
+        hosts = dict(User.objects.filter(pk__in=due, is_active=True).values_list('pk', 'email'))
+        visitor_ids = {visitor_id for _, _, listed in due.values() for visitor_id in listed}
+        names = dict(Visitor.objects.filter(pk__in=visitor_ids).values_list('pk', 'visitor_name'))
+
+        for host_id, (_, count, listed) in due.items():
+            if host_id not in hosts:
+                sent.add(host_id)
+                continue
+            lines = [f"- {names.get(visitor_id, f'Visitor {visitor_id}')} at {localtime(entry_time):%H:%M}"
+                     for visitor_id, entry_time in listed.items()]
+            if count > len(listed):
+                lines.append(f"- and {count - len(listed)} more arrivals")
+            Util.send_email({
+                'email_subject': "Your visitor has arrived" if count == 1 else f"{count} visitor arrivals",
+                'body': "Checked in at the gate:\n" + "\n".join(lines),
+                'to_email': hosts[host_id],
+            })
+            sent.add(host_id)
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+# The configured notifier, or None when arrival notifications are switched off
+def get_arrival_notifier():
+    global _notifier
+    config = getattr(settings, 'VISITOR_ARRIVAL_NOTIFICATIONS', {})
+    if not config.get('ENABLED', False):
+        return None
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                _notifier = ArrivalNotifier(
+                    window_seconds=config.get('WINDOW_SECONDS', 30),
+                    max_per_hour=config.get('MAX_PER_HOUR', 12),
+                    max_pending=config.get('MAX_PENDING', 10000),
+                    max_listed=config.get('MAX_LISTED', 20),
+                )
+                atexit.register(_notifier.stop)
+    return _notifier
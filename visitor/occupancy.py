@@ -0,0 +1,76 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils.timezone import now
+
+from employee.models import User
+from .models import Occupancy, Turnstile, Visitor
+
+NO_HOST = 0
+
+
+def host_key(host_id):
+    return host_id or NO_HOST
+
+
+_state = threading.local()
+
+
+# Turnstile signals leave the counters alone inside this block; the caller adjusts them in bulk
+@contextmanager
+def untracked():
+    _state.untracked = True
+    try:
+        yield
+    finally:
+        _state.untracked = False
+
+
+def tracking():
+    return not getattr(_state, 'untracked', False)
+
+
+# Add `delta` to the host's counter in a single UPDATE (creating the row on first use)
+def adjust(host_id, delta):
+    key = host_key(host_id)
+    if Occupancy.objects.filter(host_key=key).update(inside=F('inside') + delta, updated_at=now()):
+        return
+    try:
+        with transaction.atomic():
+            Occupancy.objects.create(host_key=key, inside=delta)
+    except IntegrityError:
+        Occupancy.objects.filter(host_key=key).update(inside=F('inside') + delta, updated_at=now())
+
+
+# Host of a turnstile entry; the scan path attaches it up front so no lookup is needed
+def host_of(turnstile):
+    if hasattr(turnstile, '_host_id'):
+        return turnstile._host_id
+    return Visitor.objects.filter(pk=turnstile.visitor_id).values_list('registered_by_id', flat=True).first()
+
+
+def snapshot():
+    rows = list(Occupancy.objects.filter(inside__gt=0).values_list('host_key', 'inside'))
+    names = dict(User.objects.filter(pk__in=[key for key, _ in rows if key != NO_HOST]).values_list('pk', 'name'))
+    return {
+        'total': sum(inside for _, inside in rows),
+        'hosts': [
+            {'host_id': key or None, 'host_name': names.get(key), 'inside': inside}
+            for key, inside in sorted(rows, key=lambda row: -row[1])
+        ],
+    }
+
+
+# Rebuild the counters from the open Turnstile entries, e.g. after a crash
+def reconcile():
+    counts = (Turnstile.objects.filter(exit_time__isnull=True)
+              .values('visitor__registered_by').annotate(inside=Count('id')))
+    with transaction.atomic():
+        list(Occupancy.objects.select_for_update())  # Hold concurrent adjustments until the rebuild commits
+        Occupancy.objects.all().delete()
+        Occupancy.objects.bulk_create(
+            Occupancy(host_key=host_key(row['visitor__registered_by']), inside=row['inside']) for row in counts
+        )
+    return Occupancy.objects.aggregate(total=Sum('inside'))['total'] or 0
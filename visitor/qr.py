@@ -0,0 +1,163 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from PIL import Image
+
+QR_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Bump when the renderer output changes so cached ETags stop matching
+RENDERER_VERSION = 1
+
+
+# Render a QR code for `data` and return the PNG bytes.
+# Kept as a plain module-level function so it can be shipped to a process pool.
+def render_qr_png(data, box_size=10, border=4, error_correction=qrcode.constants.ERROR_CORRECT_L):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=error_correction,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill='black', back_color='white')
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+# Module matrix for `data`, quiet zone included
+def qr_matrix(data, border=4, error_correction=qrcode.constants.ERROR_CORRECT_L):
+    qr = qrcode.QRCode(version=1, error_correction=error_correction, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+# Render `data` as PNG or SVG exactly `size` pixels square.
+# Modules are scaled by a whole number and the leftover pixels go into the quiet zone,
+# so the output can be printed or shown as-is without resampling.
+def render_qr(data, fmt='png', size=None, border=4):
+    matrix = qr_matrix(data, border=border)
+    modules = len(matrix)
+    if size is None:
+        size = modules * 10
+    if size < modules:
+        raise ValueError(f"size must be at least {modules}px for this code.")
+
+    box = size // modules
+    offset = (size - modules * box) // 2
+
+    if fmt == 'svg':
+        return _render_svg(matrix, size, box, offset)
+    if fmt == 'png':
+        return _render_png(matrix, size, box, offset)
+    raise ValueError(f"Unsupported QR format: {fmt!r}")
+
+
+def _render_png(matrix, size, box, offset):
+    modules = len(matrix)
+    img = Image.new('1', (modules, modules), 1)
+    img.putdata([0 if dark else 1 for row in matrix for dark in row])
+    img = img.resize((modules * box, modules * box), Image.NEAREST)
+
+    canvas = Image.new('1', (size, size), 1)
+    canvas.paste(img, (offset, offset))
+    buffer = BytesIO()
+    canvas.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def _render_svg(matrix, size, box, offset):
+    # One sub-path per horizontal run of dark modules, in pixel units
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                path.append(f"M{offset + start * box},{offset + y * box}h{(x - start) * box}v{box}h-{(x - start) * box}z")
+            else:
+                x += 1
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(path)}"/></svg>'
+    ).encode()
+
+
+# Strong ETag derived from everything that determines the image bytes,
+# so a 304 can be answered without rendering anything.
+def qr_etag(payload, fmt, size):
+    digest = hashlib.sha1(f"{RENDERER_VERSION}:{fmt}:{size}:{payload}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+# Size-bounded LRU of rendered images keyed by (visit_code, format, size)
+class QRImageCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, payload):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != payload:
+                # Visitor details changed since this image was rendered
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, payload, image):
+        if len(image) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (payload, image)
+            self.current_bytes += len(image)
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= len(entry[1])
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_image_cache = None
+_image_cache_lock = threading.Lock()
+
+
+def get_qr_cache():
+    global _image_cache
+    if _image_cache is None:
+        with _image_cache_lock:
+            if _image_cache is None:
+                _image_cache = QRImageCache(getattr(settings, 'VISITOR_QR_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    return _image_cache
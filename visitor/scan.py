@@ -0,0 +1,143 @@
+import re
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+
+from .index import visit_code_index
+from .logbuffer import get_log_buffer
+from .models import Turnstile, TurnstileLog, Visitor
+from .notifications import get_arrival_notifier
+from .tokens import InvalidVisitToken, looks_like_token, verify_visit_token
+
+# Legacy badges encode "ID: .., Name: .., Mobile: .., Visit Code: <code>"
+LEGACY_PAYLOAD_RE = re.compile(r'Visit Code:\s*([^\s,]+)')
+VISIT_CODE_RE = re.compile(r'^[0-9A-Za-z-]{1,8}$')
+
+DIRECTION_IN = 'in'
+DIRECTION_OUT = 'out'
+
+
+def parse_visit_code(raw):
+    match = LEGACY_PAYLOAD_RE.search(raw)
+    if match:
+        return match.group(1)
+    raw = raw.strip()
+    return raw if VISIT_CODE_RE.match(raw) else None
+
+
+class ScanResult:
+    def __init__(self, status, reason=None, visitor_id=None, turnstile=None, log=None):
+        self.status = status
+        self.reason = reason
+        self.visitor_id = visitor_id
+        self.turnstile = turnstile
+        self.log = log
+
+    @property
+    def admitted(self):
+        return self.status == 'success'
+
+    def as_dict(self):
+        return {
+            'status': self.status,
+            'reason': self.reason,
+            'visitor_id': self.visitor_id,
+            'turnstile_id': self.turnstile.id if self.turnstile else None,
+            'log_id': self.log.id if self.log else None,
+        }
+
+
+def denied(reason, visitor_id=None):
+    return ScanResult('denied', reason=reason, visitor_id=visitor_id)
+
+
+# Resolve a raw QR payload and record the passage.
+# Entry writes the Turnstile and TurnstileLog rows in one transaction, reusing the visitor's
+# open entry if there is one; exit closes the open entry and logs it the same way. A denied scan is logged with no
+# Turnstile. With VISITOR_SCAN_LOG_BUFFER enabled the log row is handed to the batching
+# buffer instead (log_id is then null). Entries are passed to the arrival notifier, which
+# never blocks the scan.
+def process_scan(raw, direction=DIRECTION_IN):
+    result = _admit(raw, direction)
+    if not result.admitted:
+        result.log = TurnstileLog(turnstile=None, qr_code_scan=raw[:255], status='denied')
+        log_buffer = get_log_buffer()
+        if log_buffer is None:
+            result.log.save()
+        else:
+            log_buffer.submit(result.log)
+    return result
+
+
+# Whether a scan may present a visit code without a token (see VISITOR_QR_ACCEPT_LEGACY)
+def legacy_codes_accepted():
+    return (getattr(settings, 'VISITOR_QR_PAYLOAD', 'legacy') != 'signed'
+            or getattr(settings, 'VISITOR_QR_ACCEPT_LEGACY', False))
+
+
+def _admit(raw, direction):
+    token = None
+    if looks_like_token(raw):
+        # Signed badges are checked from the signature alone before anything else is touched
+        try:
+            token = verify_visit_token(raw)
+        except InvalidVisitToken as exc:
+            return denied(str(exc))
+        visit_code = token.visit_code
+    elif not legacy_codes_accepted():
+        return denied('Signed badge required.')
+    else:
+        visit_code = parse_visit_code(raw)
+    if visit_code is None:
+        return denied('Unreadable QR code.')
+
+    entry = visit_code_index.lookup(visit_code)
+    if entry is None:
+        return denied('Unknown visit code.')
+    visitor_id, host_id = entry
+    if token is not None and token.visitor_id != visitor_id:
+        return denied('Visit code has been reissued.')
+    qr_code_scan = raw[:255]
+    log_buffer = get_log_buffer()
+
+    opened, reason = False, None
+    try:
+        with transaction.atomic():
+            if direction == DIRECTION_IN:
+                # Serializes entry scans of one visitor, so two can't both find no open entry
+                if Visitor.objects.select_for_update().filter(pk=visitor_id).values_list('pk').first() is None:
+                    visit_code_index.discard(visitor_id)
+                    return denied('Unknown visit code.')
+            turnstile = (Turnstile.objects.select_for_update()
+                         .filter(visitor_id=visitor_id, exit_time__isnull=True)
+                         .order_by('-entry_time').first())
+            if direction == DIRECTION_OUT:
+                if turnstile is None:
+                    return denied('No open entry for this visitor.', visitor_id)
+                turnstile._host_id = host_id
+                turnstile.exit_time = now()
+                turnstile.save(update_fields=['exit_time'])
+            elif turnstile is None:
+                turnstile = Turnstile(visitor_id=visitor_id)
+                turnstile._host_id = host_id
+                turnstile.save()
+                opened = True
+            else:
+                # Scanned in again without scanning out: the open entry stands, occupancy is unchanged
+                reason = 'Already inside.'
+            log = TurnstileLog(turnstile=turnstile, qr_code_scan=qr_code_scan, status='success')
+            if log_buffer is None:
+                log.save()
+    except IntegrityError:
+        # Visitor was deleted by another process after the index was loaded
+        visit_code_index.discard(visitor_id)
+        return denied('Unknown visit code.')
+
+    if log_buffer is not None:
+        log_buffer.submit(log)
+    if opened and host_id is not None:
+        notifier = get_arrival_notifier()
+        if notifier is not None:
+            notifier.submit(host_id, visitor_id, turnstile.entry_time)
+    return ScanResult('success', reason=reason, visitor_id=visitor_id, turnstile=turnstile, log=log)
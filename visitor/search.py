@@ -0,0 +1,9 @@
+from visitor_management_system.search import SearchEngine
+
+# Front-desk lookup of returning visitors by partial name, email or mobile
+visitor_search = SearchEngine(
+    'visitor.Visitor',
+    fields=('visitor_name', 'visitor_email', 'visitor_mobile'),
+    fulltext_index='visitor_search_ft',
+    updated_field='updated_at',
+)
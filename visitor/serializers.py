@@ -1,5 +1,11 @@
+import uuid
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.timezone import now
 from rest_framework import serializers
-from .models import Visitor, Turnstile, TurnstileLog
+from employee.models import User
+from .models import Visitor, Visit, Turnstile, TurnstileLog
+from .tasks import enqueue_qr_batch, render_qr_batch
 
 
 # Visitor Serializer
@@ -8,9 +14,190 @@ class VisitorSerializer(serializers.ModelSerializer):
         model = Visitor
         fields = [
             'visitor_id', 'visitor_name', 'visitor_email', 'visitor_mobile', 'registered_by', 
-            'employee_name', 'visit_code', 'qr_code', 'created_at', 'updated_at'
+            'employee_name', 'visit_code', 'qr_code', 'qr_status', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['visitor_id', 'visit_code', 'qr_code', 'created_at', 'updated_at']
+        read_only_fields = ['visitor_id', 'visit_code', 'qr_code', 'qr_status', 'created_at', 'updated_at']
+
+    # A registration is the visitor's first visit, as in the check-in and bulk paths
+    def create(self, validated_data):
+        with transaction.atomic():
+            visitor = super().create(validated_data)
+            Visit.for_visitor(visitor).save()
+        return visitor
+
+
+# Bulk pre-registration
+# Validates every row, keeps the valid ones and records per-row errors instead of failing the batch.
+# Uniqueness and host lookups are done once for the whole upload rather than per row.
+class VisitorBulkListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'error': 'Expected a list of visitors.'})
+        max_rows = self.child.context.get('max_rows')
+        if max_rows is not None and len(data) > max_rows:
+            raise serializers.ValidationError({'error': f'A single upload is limited to {max_rows} visitors.'})
+
+        self.row_errors = {}
+        self.valid_rows = []
+        for index, item in enumerate(data):
+            try:
+                self.valid_rows.append((index, self.child.run_validation(item)))
+            except serializers.ValidationError as exc:
+                self.row_errors[index] = exc.detail
+
+        self._check_duplicates()
+        self._check_hosts()
+        self.valid_rows = [(index, attrs) for index, attrs in self.valid_rows if index not in self.row_errors]
+        return [attrs for _, attrs in self.valid_rows]
+
+    def _check_duplicates(self):
+        rows = self.valid_rows
+        emails = {attrs['visitor_email'] for _, attrs in rows}
+        mobiles = {attrs['visitor_mobile'] for _, attrs in rows}
+        taken_emails, taken_mobiles = set(), set()
+        if rows:
+            existing = Visitor.objects.filter(
+                Q(visitor_email__in=emails) | Q(visitor_mobile__in=mobiles)
+            ).values_list('visitor_email', 'visitor_mobile')
+            for email, mobile in existing:
+                taken_emails.add(email.lower())
+                taken_mobiles.add(mobile)
+
+        seen_emails, seen_mobiles = set(), set()
+        for index, attrs in rows:
+            email, mobile = attrs['visitor_email'].lower(), attrs['visitor_mobile']
+            errors = {}
+            if email in taken_emails:
+                errors['visitor_email'] = ['visitor with this visitor email already exists.']
+            elif email in seen_emails:
+                errors['visitor_email'] = ['Duplicate visitor email in this upload.']
+            if mobile in taken_mobiles:
+                errors['visitor_mobile'] = ['visitor with this visitor mobile already exists.']
+            elif mobile in seen_mobiles:
+                errors['visitor_mobile'] = ['Duplicate visitor mobile in this upload.']
+            if errors:
+                self.row_errors[index] = errors
+            else:
+                seen_emails.add(email)
+                seen_mobiles.add(mobile)
+
+    def _check_hosts(self):
+        host_ids = {attrs['registered_by_id'] for _, attrs in self.valid_rows if attrs.get('registered_by_id')}
+        if not host_ids:
+            return
+        known = set(User.objects.filter(pk__in=host_ids).values_list('pk', flat=True))
+        for index, attrs in self.valid_rows:
+            host_id = attrs.get('registered_by_id')
+            if host_id and host_id not in known and index not in self.row_errors:
+                self.row_errors[index] = {'registered_by': [f'Invalid pk "{host_id}" - object does not exist.']}
+
+    def create(self, validated_data):
+        qr_status = Visitor.QR_READY if Visitor.qr_render_mode() == 'on_demand' else Visitor.QR_PENDING
+        visitors = [Visitor(**attrs, qr_status=qr_status) for attrs in validated_data]
+        self._assign_visit_codes(visitors)
+
+        with transaction.atomic():
+            Visitor.objects.bulk_create(visitors, batch_size=500)
+            if any(visitor.pk is None for visitor in visitors):
+                # Backends without RETURNING (MySQL) don't hand back primary keys
+                ids = dict(Visitor.objects.filter(
+                    visit_code__in=[visitor.visit_code for visitor in visitors]
+                ).values_list('visit_code', 'visitor_id'))
+                for visitor in visitors:
+                    visitor.visitor_id = ids[visitor.visit_code]
+            Visit.objects.bulk_create([Visit.for_visitor(visitor) for visitor in visitors], batch_size=500)
+
+        items = [(visitor.visitor_id, visitor.qr_payload()) for visitor in visitors]
+        mode = Visitor.qr_render_mode()
+        if mode == 'inline':
+            rendered = render_qr_batch(items)
+            for visitor in visitors:
+                visitor.qr_code = rendered[visitor.visitor_id].qr_code
+                visitor.qr_status = rendered[visitor.visitor_id].qr_status
+        elif mode == 'background':
+            transaction.on_commit(lambda: enqueue_qr_batch(items))
+        return visitors
+
+    # Same 8-character codes as Visitor.save(), checked against the table in one query
+    def _assign_visit_codes(self, visitors):
+        codes = set()
+        while len(codes) < len(visitors):
+            codes.update(str(uuid.uuid4())[:8] for _ in range(len(visitors) - len(codes)))
+            codes -= set(Visitor.objects.filter(visit_code__in=codes).values_list('visit_code', flat=True))
+        issued_at = now()
+        for visitor, code in zip(visitors, codes):
+            visitor.visit_code, visitor.visit_code_issued_at = code, issued_at
+
+
+class VisitorBulkSerializer(VisitorSerializer):
+    registered_by = serializers.IntegerField(source='registered_by_id', required=False, allow_null=True)
+
+    class Meta(VisitorSerializer.Meta):
+        list_serializer_class = VisitorBulkListSerializer
+        # Uniqueness is checked for the whole upload by VisitorBulkListSerializer
+        extra_kwargs = {
+            'visitor_email': {'validators': []},
+            'visitor_mobile': {'validators': []},
+        }
+
+# Raised by VisitorCheckInSerializer when the email and the mobile belong to different visitors
+class CheckInConflict(Exception):
+    def __init__(self, visitor_ids):
+        super().__init__("Email and mobile belong to different visitors.")
+        self.visitor_ids = visitor_ids
+
+
+# Visit Serializer
+class VisitSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Visit
+        fields = ['id', 'visitor', 'host', 'purpose', 'visit_code', 'checked_in_at']
+        read_only_fields = fields
+
+
+# Check-in for new and returning visitors
+# Matches an existing visitor on email or mobile instead of failing on the unique constraints,
+# refreshes their details, issues a new visit code and records the visit, all in one transaction.
+class VisitorCheckInSerializer(VisitorSerializer):
+    class Meta(VisitorSerializer.Meta):
+        fields = VisitorSerializer.Meta.fields + ['purpose']
+        # The match on email/mobile replaces the uniqueness check
+        extra_kwargs = {
+            'visitor_email': {'validators': []},
+            'visitor_mobile': {'validators': []},
+        }
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return self._check_in(validated_data)
+        except IntegrityError:
+            # A concurrent check-in inserted the same visitor (or drew the same code); the retry matches it
+            with transaction.atomic():
+                return self._check_in(validated_data)
+
+    def _check_in(self, validated_data):
+        matches = list(Visitor.objects.select_for_update().filter(
+            Q(visitor_email=validated_data['visitor_email']) | Q(visitor_mobile=validated_data['visitor_mobile'])
+        )[:2])
+        if len(matches) > 1:
+            raise CheckInConflict(sorted(visitor.visitor_id for visitor in matches))
+
+        self.created = not matches
+        visitor = matches[0] if matches else Visitor()
+        for field, value in validated_data.items():
+            setattr(visitor, field, value)
+        if matches:
+            # The previous code is revoked by the revoke_reissued_code signal
+            visitor.visit_code = str(uuid.uuid4())[:8]
+            visitor.save(update_fields=[*validated_data, 'visit_code', 'updated_at'])
+        else:
+            visitor.save()
+
+        self.visit = Visit.for_visitor(visitor)
+        self.visit.save()
+        return visitor
+
 
 # Turnstile Serializer
 class TurnstileSerializer(serializers.ModelSerializer):
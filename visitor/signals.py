@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import occupancy
+from .index import visit_code_index
+from .models import RevokedVisitCode, Turnstile, Visitor
+from .search import visitor_search
+
+
+# Keep the scan and search indexes in step with Visitor writes made in this process
+@receiver(post_save, sender=Visitor)
+def index_visitor(sender, instance, **kwargs):
+    visit_code_index.update(instance)
+    visitor_search.update(instance)
+
+
+@receiver(post_delete, sender=Visitor)
+def unindex_visitor(sender, instance, **kwargs):
+    visit_code_index.discard(instance.visitor_id)
+    visitor_search.discard(instance.visitor_id)
+
+
+# Record codes that are no longer valid so gate allowlists can drop them
+@receiver(post_save, sender=Visitor)
+def revoke_reissued_code(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_visit_code', None)
+    if previous and previous != instance.visit_code:
+        RevokedVisitCode.objects.create(visit_code=previous, visitor_id=instance.visitor_id)
+    instance._loaded_visit_code = instance.visit_code
+
+
+@receiver(post_delete, sender=Visitor)
+def revoke_deleted_code(sender, instance, **kwargs):
+    if instance.visit_code:
+        RevokedVisitCode.objects.create(visit_code=instance.visit_code, visitor_id=instance.visitor_id)
+
+
+# Scan indexes in other processes must stop admitting the revoked code
+@receiver(post_save, sender=RevokedVisitCode)
+def announce_revocation(sender, instance, created, **kwargs):
+    if created:
+        visit_code_index.revoked()
+
+
+# Keep the live occupancy counters in step with Turnstile entries and exits
+@receiver(post_save, sender=Turnstile)
+def count_turnstile_entry(sender, instance, created, **kwargs):
+    if not occupancy.tracking():
+        return
+    is_open = instance.exit_time is None
+    if created:
+        if is_open:
+            occupancy.adjust(occupancy.host_of(instance), 1)
+    elif (getattr(instance, '_loaded_exit_time', None) is None) != is_open:
+        occupancy.adjust(occupancy.host_of(instance), 1 if is_open else -1)
+    instance._loaded_exit_time = instance.exit_time
+
+
+@receiver(post_delete, sender=Turnstile)
+def uncount_turnstile_entry(sender, instance, **kwargs):
+    if occupancy.tracking() and instance.exit_time is None:
+        occupancy.adjust(occupancy.host_of(instance), -1)
@@ -0,0 +1,320 @@
+import math
+import random
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from employee.models import (
+    Department, Designation, Role, User, UserDepartment, UserDesignation, UserRole
+)
+from .models import Turnstile, TurnstileLog, Visit, Visitor
+
+FIRST_NAMES = (
+    'Aarav', 'Aditi', 'Amit', 'Ananya', 'Arjun', 'Deepa', 'Farah', 'Gaurav', 'Ishaan', 'Kavya', 'Meera', 'Neha',
+    'Nikhil', 'Priya', 'Rahul', 'Riya', 'Rohan', 'Sanjay', 'Sneha', 'Vikram', 'Anna', 'David', 'Elena', 'James',
+    'Maria', 'Omar', 'Sara', 'Wei', 'Yuki', 'Zoe',
+)
+LAST_NAMES = (
+    'Agarwal', 'Banerjee', 'Chopra', 'Das', 'Gupta', 'Iyer', 'Joshi', 'Kapoor', 'Khan', 'Kumar', 'Mehta', 'Nair',
+    'Patel', 'Rao', 'Reddy', 'Shah', 'Sharma', 'Singh', 'Verma', 'Garcia', 'Kim', 'Lopez', 'Miller', 'Smith',
+)
+DEPARTMENTS = (
+    'Engineering', 'Finance', 'Human Resources', 'Operations', 'Sales', 'Marketing', 'Legal', 'Facilities',
+    'IT Support', 'Procurement',
+)
+ROLES = ('Employee', 'Admin', 'HR', 'Reception', 'Security', 'Manager')
+# Most people hold the junior designations
+DESIGNATIONS = (
+    ('Intern', 8), ('Associate', 30), ('Senior Associate', 25), ('Lead', 15), ('Manager', 12),
+    ('Senior Manager', 6), ('Director', 3), ('Vice President', 1),
+)
+PURPOSES = ('Meeting', 'Interview', 'Delivery', 'Maintenance', 'Vendor visit', 'Client visit', 'Audit', 'Training')
+
+# Every synthetic user shares one hash, computed once with a fixed salt so reruns match
+PASSWORD = 'synthetic-password'
+PASSWORD_SALT = 'syntheticdata'
+
+# Odd, so i -> i * CODE_MULTIPLIER mod 2**32 never repeats: unique 8-hex-digit visit codes
+CODE_MULTIPLIER = 2654435761
+
+# Share of a weekday's traffic on Saturdays and Sundays
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.0, 1.0, 0.25, 0.1)
+
+
+# bulk_create() would stamp auto_now/auto_now_add fields with the current time;
+# switch them off so the generated timestamps are stored as given
+@contextmanager
+def explicit_timestamps(*models):
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+# Builds a reproducible data set for scale testing. Everything is drawn from one seeded
+# Random in a fixed order (plus one per day for registration times, which the turnstile
+# pass regenerates) and anchored on `end_date`, so the same arguments always produce the
+# same rows and primary keys (which start at 1, so the tables must be empty).
+# Rows go in with chunked bulk_create(): no save(), no signals, no QR rendering.
+class SyntheticDataGenerator:
+    TABLES = (Department, Role, Designation, User, UserRole, UserDepartment, UserDesignation,
+              Visitor, Visit, Turnstile, TurnstileLog)
+
+    def __init__(self, seed=1, users=2000, visitors=100000, turnstiles=300000, days=90, end_date=None,
+                 denied_ratio=0.03, chunk_size=5000, log=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.users = users
+        self.visitors = visitors
+        self.turnstiles = turnstiles
+        self.days = days
+        self.denied_ratio = denied_ratio
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+        end_date = end_date or datetime(2025, 1, 1).date()
+        self.end = timezone.make_aware(datetime.combine(end_date, time.min))
+        self.start = self.end - timedelta(days=days)
+        self.code_offset = self.rng.getrandbits(32)
+        self.user_names = []
+
+    def non_empty_tables(self):
+        return [model._meta.label for model in self.TABLES if model.objects.exists()]
+
+    def run(self):
+        counts = {}
+        with explicit_timestamps(User, Visitor):
+            counts.update(self._lookups())
+            counts.update(self._users())
+            counts.update(self._links())
+            counts.update(self._visitors())
+            counts.update(self._turnstiles())
+        self._refresh_derived_state()
+        return counts
+
+    # Write `rows` in chunks of chunk_size, one transaction per chunk. With `child_model`, rows
+    # are (instance, children) pairs and each chunk's parents are written before their children.
+    def _insert(self, model, rows, child_model=None):
+        totals = {model: 0, child_model: 0}
+        parents, children = [], []
+        for row in rows:
+            if child_model is None:
+                parents.append(row)
+            else:
+                parents.append(row[0])
+                children.extend(row[1])
+            if len(parents) >= self.chunk_size:
+                self._flush(totals, (model, parents), (child_model, children))
+                parents, children = [], []
+        self._flush(totals, (model, parents), (child_model, children))
+        for counted in (model, child_model):
+            if counted is not None:
+                self.log(f"{counted._meta.verbose_name_plural}: {totals[counted]}")
+        return totals[model] if child_model is None else (totals[model], totals[child_model])
+
+    @staticmethod
+    def _flush(totals, *chunks):
+        with transaction.atomic():
+            for model, chunk in chunks:
+                if chunk:
+                    model.objects.bulk_create(chunk, batch_size=len(chunk))
+                    totals[model] += len(chunk)
+
+    def _lookups(self):
+        return {
+            'departments': self._insert(Department, (Department(dept_id=i, department_name=name)
+                                                     for i, name in enumerate(DEPARTMENTS, 1))),
+            'roles': self._insert(Role, (Role(role_id=i, role_name=name) for i, name in enumerate(ROLES, 1))),
+            'designations': self._insert(Designation, (Designation(desgn_id=i, designation_name=name)
+                                                       for i, (name, _) in enumerate(DESIGNATIONS, 1))),
+        }
+
+    def _name(self):
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+
+    def _users(self):
+        password = make_password(PASSWORD, salt=PASSWORD_SALT)
+
+        def rows():
+            for i in range(1, self.users + 1):
+                name = self._name()
+                self.user_names.append(name)
+                joined = self.start - timedelta(days=self.rng.uniform(0, 730))
+                yield User(
+                    id=i, name=name, email=f'employee{i}@synthetic.example', mobile=f'9{i:09d}', password=password,
+                    is_active=self.rng.random() < 0.97, is_admin=i == 1, is_superuser=i == 1,
+                    is_staff=i == 1 or self.rng.random() < 0.01, created_at=joined, updated_at=joined,
+                )
+        return {'users': self._insert(User, rows())}
+
+    # Every user gets a department, a designation and the Employee role; one in ten also
+    # holds one of the other roles
+    def _links(self):
+        departments, roles, designations = [], [], []
+        designation_weights = [weight for _, weight in DESIGNATIONS]
+        for user_id in range(1, self.users + 1):
+            departments.append(UserDepartment(id=user_id, user_id=user_id,
+                                              department_id=self.rng.randint(1, len(DEPARTMENTS))))
+            designations.append(UserDesignation(id=user_id, user_id=user_id, designation_id=self.rng.choices(
+                range(1, len(DESIGNATIONS) + 1), weights=designation_weights)[0]))
+            roles.append(UserRole(id=len(roles) + 1, user_id=user_id, role_id=1))
+            if self.rng.random() < 0.1:
+                roles.append(UserRole(id=len(roles) + 1, user_id=user_id, role_id=self.rng.randint(2, len(ROLES))))
+        return {
+            'user_departments': self._insert(UserDepartment, departments),
+            'user_designations': self._insert(UserDesignation, designations),
+            'user_roles': self._insert(UserRole, roles),
+        }
+
+    # Arrival time on the day starting at `day_start`: a morning peak around 9:30, a smaller
+    # one after lunch and some traffic through the working day
+    def _arrival(self, day_start, rng=None):
+        rng = rng or self.rng
+        pick = rng.random()
+        if pick < 0.6:
+            hour = rng.gauss(9.5, 0.75)
+        elif pick < 0.85:
+            hour = rng.gauss(13.75, 1.0)
+        else:
+            hour = rng.uniform(8, 18)
+        return day_start + timedelta(hours=min(max(hour, 7.0), 20.5))
+
+    # Log-normal stay, median about 75 minutes, between 5 minutes and 10 hours
+    def _dwell(self):
+        return timedelta(minutes=min(max(self.rng.lognormvariate(math.log(75), 0.7), 5), 600))
+
+    def _day_start(self, day):
+        return self.start + timedelta(days=day)
+
+    def visit_code(self, visitor_id):
+        return f'{(visitor_id * CODE_MULTIPLIER + self.code_offset) % 2 ** 32:08x}'
+
+    # Visitors registered by the end of `day`; visitor ids are handed out in time order
+    def _registered_by(self, day):
+        if day < 0:
+            return 0
+        return min(self.visitors, -(-(day + 1) * self.visitors // self.days))
+
+    # Sorted registration times of the visitors registered on `day`, from a Random of their
+    # own so the turnstile pass can rebuild them without keeping every visitor's time
+    def _registrations(self, day):
+        rng = random.Random(f'{self.seed}:registrations:{day}')
+        day_start = self._day_start(day)
+        count = self._registered_by(day) - self._registered_by(day - 1)
+        return sorted(self._arrival(day_start, rng) for _ in range(count))
+
+    def _visitors(self):
+        qr_status = Visitor.QR_READY if Visitor.qr_render_mode() == 'on_demand' else Visitor.QR_PENDING
+        # A few hosts receive most visitors (Zipf-like)
+        host_weights = list(self._cumulative(1 / (rank + 1) ** 0.8 for rank in range(self.users)))
+
+        # Each visitor with the Visit for the registration that created them
+        def rows():
+            registrations = (created for day in range(self.days) for created in self._registrations(day))
+            for i, created in zip(range(1, self.visitors + 1), registrations):
+                host_id = self.rng.choices(range(1, self.users + 1), cum_weights=host_weights)[0] if self.users else None
+                purpose = self.rng.choice(PURPOSES)
+                code = self.visit_code(i)
+                visitor = Visitor(
+                    visitor_id=i, visitor_name=self._name(), visitor_email=f'visitor{i}@synthetic.example',
+                    visitor_mobile=f'7{i:09d}', registered_by_id=host_id,
+                    employee_name=self.user_names[host_id - 1] if host_id else None, purpose=purpose,
+                    visit_code=code, visit_code_issued_at=created, qr_status=qr_status, created_at=created,
+                    updated_at=created,
+                )
+                yield visitor, [Visit(id=i, visitor_id=i, host_id=host_id, purpose=purpose, visit_code=code,
+                                      checked_in_at=created)]
+
+        visitors, visits = self._insert(Visitor, rows(), child_model=Visit)
+        return {'visitors': visitors, 'visits': visits}
+
+    @staticmethod
+    def _cumulative(weights):
+        total = 0.0
+        for weight in weights:
+            total += weight
+            yield total
+
+    # Entries spread over the days by weekday weight (exact total, largest remainder first)
+    def _entries_per_day(self):
+        weights = [WEEKDAY_WEIGHTS[self._day_start(day).weekday()] for day in range(self.days)]
+        scale = self.turnstiles / sum(weights)
+        counts = [int(weight * scale) for weight in weights]
+        remainders = sorted(range(self.days), key=lambda day: (-(weights[day] * scale - counts[day]), day))
+        for day in remainders[:self.turnstiles - sum(counts)]:
+            counts[day] += 1
+        return counts
+
+    # A visitor registered before `registered` (the count registered by the entry time)
+    def _pick_visitor(self, day, registered):
+        # Most visitors come within a week of being registered, the rest are returning visitors
+        low = self._registered_by(day - 7) if self.rng.random() < 0.7 else 0
+        return self.rng.randint(min(low, registered - 1) + 1, registered)
+
+    # Turnstile entries in time order with their scans: an entry scan, an exit scan once the
+    # visitor has left by `end`, and denied scans (unknown or retried codes) at `denied_ratio`
+    # of all scans, each just before the entry it belongs to. Denied scans have no turnstile
+    # entry, as in process_scan()
+    def _turnstiles(self):
+        if not self.visitors:
+            return {'turnstiles': 0, 'turnstile_logs': 0}
+        scans_per_entry = 2
+        denied_per_entry = self.denied_ratio * scans_per_entry / (1 - self.denied_ratio)
+        retry = denied_per_entry / (1 + denied_per_entry)
+
+        def rows():
+            turnstile_id = log_id = 0
+            for day, count in enumerate(self._entries_per_day()):
+                if count == 0 or self._registered_by(day) == 0:
+                    continue
+                day_start = self._day_start(day)
+                earlier, registrations = self._registered_by(day - 1), self._registrations(day)
+                entry_times = [self._arrival(day_start) for _ in range(count)]
+                if not earlier:
+                    # Nobody is registered before the first registration of the first day
+                    first = registrations[0] + timedelta(minutes=1)
+                    entry_times = [max(entry_time, first) for entry_time in entry_times]
+                for entry_time in sorted(entry_times):
+                    turnstile_id += 1
+                    visitor_id = self._pick_visitor(day, earlier + bisect_right(registrations, entry_time))
+                    code = self.visit_code(visitor_id)
+                    exit_time = entry_time + self._dwell()
+                    if exit_time > self.end:
+                        exit_time = None
+                    scans = []
+                    while self.rng.random() < retry:
+                        scanned = self.rng.choice((code, f'{self.rng.getrandbits(32):08x}'))
+                        scans.append((scanned, 'denied', entry_time - timedelta(seconds=self.rng.uniform(2, 60))))
+                    scans.append((code, 'success', entry_time))
+                    if exit_time is not None:
+                        scans.append((code, 'success', exit_time))
+                    logs = []
+                    for scanned, status, scanned_at in scans:
+                        log_id += 1
+                        logs.append(TurnstileLog(id=log_id, turnstile_id=turnstile_id if status == 'success' else None,
+                                                 qr_code_scan=scanned, status=status, scanned_at=scanned_at))
+                    yield Turnstile(id=turnstile_id, visitor_id=visitor_id, entry_time=entry_time,
+                                    exit_time=exit_time), logs
+
+        turnstiles, logs = self._insert(Turnstile, rows(), child_model=TurnstileLog)
+        return {'turnstiles': turnstiles, 'turnstile_logs': logs}
+
+    # bulk_create() skips the signals that normally keep these in step
+    def _refresh_derived_state(self):
+        from employee.lookups import lookup_cache
+        from employee.permissions import bump_permission_version
+        from .occupancy import reconcile
+
+        for model in (Department, Role, Designation):
+            lookup_cache(model).invalidate()
+        bump_permission_version()
+        reconcile()
@@ -0,0 +1,159 @@
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+
+from .qr import render_qr_png
+
+logger = logging.getLogger(__name__)
+
+
+# Executor that runs the job immediately in the calling thread.
+# Used as the in-process stand-in for tests and local development.
+class LocalExecutor:
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+
+# Lazily build the pool configured by `setting` ('thread', 'process' or 'local')
+def get_executor(setting='VISITOR_QR_EXECUTOR', default='thread'):
+    executor = _executors.get(setting)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(setting)
+            if executor is None:
+                kind = getattr(settings, setting, default)
+                workers = getattr(settings, 'VISITOR_QR_WORKERS', 4)
+                if kind == 'process':
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                elif kind == 'thread':
+                    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='qr-render')
+                elif kind == 'local':
+                    executor = LocalExecutor()
+                else:
+                    raise ValueError(f"Unknown {setting}: {kind!r}")
+                _executors[setting] = executor
+    return executor
+
+
+def shutdown_executor(wait=True):
+    with _executor_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=wait)
+        _executors.clear()
+
+
+# Write the rendered PNG to storage and mark the visitor's badge as ready.
+# Goes through a queryset update so the row is written once and save() is not re-entered.
+def store_qr_code(visitor_id, png):
+    from .models import Visitor
+
+    field = Visitor._meta.get_field('qr_code')
+    name = field.generate_filename(None, f'qr_code_{visitor_id}.png')
+    name = field.storage.save(name, ContentFile(png))
+    Visitor.objects.filter(pk=visitor_id).update(qr_code=name, qr_status=Visitor.QR_READY)
+    return name
+
+
+def mark_qr_failed(visitor_id):
+    from .models import Visitor
+
+    Visitor.objects.filter(pk=visitor_id).update(qr_status=Visitor.QR_FAILED)
+
+
+# Render many badges in parallel on the bulk pool (a process pool by default),
+# then store the files and flip every row's status with one bulk update.
+# Returns the updated (unsaved) instances keyed by visitor_id.
+def render_qr_batch(items):
+    from .models import Visitor
+
+    executor = get_executor('VISITOR_QR_BULK_EXECUTOR', default='process')
+    futures = [(visitor_id, executor.submit(render_qr_png, payload)) for visitor_id, payload in items]
+
+    field = Visitor._meta.get_field('qr_code')
+    updates = []
+    for visitor_id, future in futures:
+        try:
+            png = future.result()
+            name = field.storage.save(field.generate_filename(None, f'qr_code_{visitor_id}.png'), ContentFile(png))
+            updates.append(Visitor(visitor_id=visitor_id, qr_code=name, qr_status=Visitor.QR_READY))
+        except Exception:
+            logger.exception("QR render failed for visitor %s", visitor_id)
+            updates.append(Visitor(visitor_id=visitor_id, qr_status=Visitor.QR_FAILED))
+    Visitor.objects.bulk_update(updates, ['qr_code', 'qr_status'], batch_size=500)
+    return {visitor.visitor_id: visitor for visitor in updates}
+
+
+def _render_and_store(visitor_id, payload):
+    try:
+        store_qr_code(visitor_id, render_qr_png(payload))
+    except Exception:
+        logger.exception("QR render failed for visitor %s", visitor_id)
+        mark_qr_failed(visitor_id)
+
+
+# Runs on a pool thread, so it manages its own database connection.
+def _render_and_store_in_worker(visitor_id, payload):
+    close_old_connections()
+    try:
+        _render_and_store(visitor_id, payload)
+    finally:
+        close_old_connections()
+
+
+# Called on the process pool's result thread once the PNG comes back.
+def _store_rendered(visitor_id, future):
+    close_old_connections()
+    try:
+        store_qr_code(visitor_id, future.result())
+    except Exception:
+        logger.exception("QR render failed for visitor %s", visitor_id)
+        mark_qr_failed(visitor_id)
+    finally:
+        close_old_connections()
+
+
+# Queue a badge render for the visitor. Returns immediately unless the local executor is used.
+def enqueue_qr_render(visitor_id, payload):
+    executor = get_executor()
+    if isinstance(executor, LocalExecutor):
+        _render_and_store(visitor_id, payload)
+    elif isinstance(executor, ProcessPoolExecutor):
+        future = executor.submit(render_qr_png, payload)
+        future.add_done_callback(lambda f: _store_rendered(visitor_id, f))
+    else:
+        executor.submit(_render_and_store_in_worker, visitor_id, payload)
+
+
+def _render_batch_in_worker(items):
+    close_old_connections()
+    try:
+        render_qr_batch(items)
+    except Exception:
+        logger.exception("QR batch render failed")
+    finally:
+        close_old_connections()
+
+
+# Queue a batch render; the fan-out to the bulk pool happens off the request thread
+def enqueue_qr_batch(items):
+    executor = get_executor()
+    if isinstance(executor, LocalExecutor):
+        render_qr_batch(items)
+    else:
+        executor.submit(_render_batch_in_worker, items)
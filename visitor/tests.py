@@ -1,3 +1,612 @@
-from django.test import TestCase
+import base64
+import json
+import tempfile
+import time
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import localdate, now
+
+from employee.models import OutboxEmail, User
+from visitor_management_system.testing import QueryBudgetTestCase, VMSTestCase
+from . import tokens
+from .models import RevokedVisitCode, Turnstile, TurnstileLog, Visit, Visitor
+from . import occupancy
+from .allowlist import build_delta, current_version, parse_snapshot
+from .archive import archive_scan_logs, archive_turnstiles, iter_archive, iter_scan_logs
+from .logbuffer import TurnstileLogBuffer
+from .notifications import ArrivalNotifier
+from .scan import process_scan
+from .synthetic import SyntheticDataGenerator
+
+
+# Every budgeted visitor endpoint, once, from cold caches (see QueryBudgetTestCase)
+class VisitorQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('Asha Rao', 'asha@example.com', '9000000001', 'password')
+        self.authenticate(self.user)
+        self.visitor = Visitor.objects.create(
+            visitor_name='Priya Sharma', visitor_email='priya@example.com', visitor_mobile='9100000001',
+            registered_by=self.user, purpose='Meeting'
+        )
+
+    def visitor_data(self, n):
+        return {'visitor_name': f'Visitor {n}', 'visitor_email': f'visitor{n}@example.com',
+                'visitor_mobile': f'9200000{n:03d}', 'registered_by': self.user.pk, 'purpose': 'Meeting'}
+
+    def test_visitors(self):
+        pk = self.visitor.pk
+        Visit.objects.create(visitor=self.visitor, host=self.user, purpose='Meeting', visit_code=self.visitor.visit_code)
+        self.call('get', '/visit/visitors/')
+        self.call('get', f'/visit/visitors/{pk}/')
+        self.call('get', f'/visit/visitors/{pk}/qr/')
+        self.call('get', f'/visit/visitors/{pk}/qr/?output=svg&size=200')
+        self.call('post', '/visit/visitors/', self.visitor_data(1), expected=201)
+        self.call('put', f'/visit/visitors/{pk}/', {**self.visitor_data(2), 'visitor_email': 'priya@example.com'})
+        self.call('patch', f'/visit/visitors/{pk}/', {'visitor_mobile': '9100000009', 'registered_by': self.user.pk})
+        self.call('get', '/visit/visitors/search/?q=priya')
+        self.call('get', f'/visit/visitors/{pk}/visits/')
+
+    def test_bulk(self):
+        self.call('post', '/visit/visitors/bulk/', {'visitors': [self.visitor_data(n) for n in range(3)]}, expected=201)
+        # A bigger upload with a rejected row costs the same queries
+        rows = [self.visitor_data(n) for n in range(10, 60)] + [self.visitor_data(10)]
+        self.call('post', '/visit/visitors/bulk/', {'visitors': rows}, expected=201)
+
+    def test_turnstiles(self):
+        turnstile = Turnstile.objects.create(visitor=self.visitor)
+        self.call('get', '/visit/turnstiles/')
+        self.call('get', f'/visit/turnstiles/{turnstile.pk}/')
+        opened = self.call('post', '/visit/turnstiles/', {'visitor': self.visitor.pk}, expected=201).json()
+        self.call('put', f'/visit/turnstiles/{turnstile.pk}/', {'visitor': self.visitor.pk,
+                                                          'exit_time': '2026-01-01T10:00:00Z'})
+        self.call('patch', f"/visit/turnstiles/{opened['id']}/", {'exit_time': '2026-01-01T11:00:00Z'})
+
+    def test_turnstile_logs(self):
+        turnstile = Turnstile.objects.create(visitor=self.visitor)
+        log = TurnstileLog.objects.create(turnstile=turnstile, qr_code_scan=self.visitor.visit_code, status='success')
+        self.call('get', '/visit/turnstile-logs/')
+        self.call('get', f'/visit/turnstile-logs/{log.pk}/')
+        self.call('post', '/visit/turnstile-logs/', {'turnstile': turnstile.pk, 'qr_code_scan': 'x', 'status': 'denied'},
+                  expected=201)
+        self.call('put', f'/visit/turnstile-logs/{log.pk}/', {'turnstile': turnstile.pk, 'qr_code_scan': 'y',
+                                                         'status': 'success'})
+        self.call('patch', f'/visit/turnstile-logs/{log.pk}/', {'turnstile': turnstile.pk, 'status': 'denied'})
+
+    def test_checkin(self):
+        self.call('post', '/visit/checkin/', self.visitor_data(1), expected=201)
+        self.call('post', '/visit/checkin/', self.visitor_data(1))
+
+    def test_scan_and_occupancy(self):
+        payload = self.visitor.qr_payload()
+        self.call('post', '/visit/scan/', {'qr_code_scan': payload, 'direction': 'in'})
+        self.call('post', '/visit/scan/', {'qr_code_scan': payload, 'direction': 'in'})
+        self.call('post', '/visit/scan/', {'qr_code_scan': payload, 'direction': 'out'})
+        self.call('post', '/visit/scan/', {'qr_code_scan': 'Visit Code: 00000000'}, expected=403)
+        self.call('get', '/visit/occupancy/')
+
+    def test_scan_log_buffer(self):
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        self.call('get', '/visit/scan/log-buffer/')
+
+    def test_allowlist(self):
+        response = self.call('get', '/visit/allowlist/')
+        self.call('get', '/visit/allowlist/', HTTP_IF_NONE_MATCH=response['ETag'], expected=304)
+        since = response['X-Allowlist-Version']
+        Visitor.objects.create(visitor_name='Ravi Kumar', visitor_email='ravi@example.com',
+                               visitor_mobile='9100000002', registered_by=self.user, purpose='Delivery')
+        self.call('get', f'/visit/allowlist/delta/?since={since}')
+
+    def test_archive_and_exports(self):
+        self.call('get', f'/visit/archive/turnstiles/?visitor={self.visitor.pk}&from=2026-01-01&to=2026-01-31')
+        for kind in ('turnstile-logs', 'visitors'):
+            response = self.call('get', f'/visit/exports/{kind}/?from=2026-01-01&output=ndjson')
+            b''.join(response.streaming_content)
+
+
+@override_settings(VISITOR_QR_PAYLOAD='signed')
+class SignedScanTests(VMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.visitor = Visitor.objects.create(
+            visitor_name='Priya Sharma', visitor_email='priya@example.com', visitor_mobile='9100000001',
+            purpose='Meeting'
+        )
+
+    def token(self, not_before, not_after, version=tokens.TOKEN_VERSION):
+        body = tokens._BODY.pack(version, self.visitor.pk, int(self.visitor.visit_code, 16), not_before, not_after)
+        return base64.b32encode(body + tokens._mac(body)).decode('ascii').rstrip('=')
+
+    def assertDenied(self, raw, reason):
+        result = process_scan(raw)
+        self.assertEqual((result.status, result.reason), ('denied', reason))
+        self.assertFalse(Turnstile.objects.exists())
+
+    def test_valid_token_is_admitted(self):
+        result = process_scan(self.visitor.qr_payload())
+        self.assertEqual((result.status, result.visitor_id), ('success', self.visitor.pk))
+
+    def test_forged_token(self):
+        body = tokens._BODY.pack(tokens.TOKEN_VERSION, self.visitor.pk, int(self.visitor.visit_code, 16),
+                                 0, int(time.time()) + 3600)
+        self.assertDenied(base64.b32encode(body + b'\0' * tokens.MAC_SIZE).decode('ascii').rstrip('='),
+                          'Bad signature.')
+
+    def test_expired_token(self):
+        now = int(time.time())
+        self.assertDenied(self.token(now - 7200, now - 3600), 'Token expired.')
+
+    def test_wrong_version(self):
+        self.assertDenied(self.token(0, int(time.time()) + 3600, version=tokens.TOKEN_VERSION + 1),
+                          'Unsupported token version.')
+
+    # The code inside an expired token is readable; presented on its own it must not get through
+    def test_bare_and_legacy_codes(self):
+        self.assertDenied(self.visitor.visit_code, 'Signed badge required.')
+        self.assertDenied(f'ID: {self.visitor.pk}, Visit Code: {self.visitor.visit_code}', 'Signed badge required.')
+
+    # The window starts when the code is issued: edits leave it alone, a reissued code moves it
+    def test_window_anchored_on_issue_time(self):
+        first = tokens.verify_visit_token(self.visitor.qr_payload())
+        self.assertEqual(first.not_before, int(self.visitor.visit_code_issued_at.timestamp()))
+        self.assertEqual(first.not_after - first.not_before, 86400)
+
+        Visitor.objects.filter(pk=self.visitor.pk).update(visit_code_issued_at=now() - timedelta(hours=2))
+        visitor = Visitor.objects.get(pk=self.visitor.pk)
+        issued_at = visitor.visit_code_issued_at
+        visitor.visitor_name = 'Priya S.'
+        visitor.save()
+        self.assertEqual(tokens.verify_visit_token(visitor.qr_payload()).not_before, int(issued_at.timestamp()))
+
+        visitor.visit_code = 'abcdef12'
+        visitor.save()
+        reissued = tokens.verify_visit_token(visitor.qr_payload())
+        self.assertGreater(reissued.not_before, int(issued_at.timestamp()))
+        self.assertEqual(reissued.visit_code, 'abcdef12')
+
+    @override_settings(VISITOR_QR_ACCEPT_LEGACY=True)
+    def test_legacy_codes_during_transition(self):
+        self.assertTrue(process_scan(self.visitor.visit_code).admitted)
+
+
+class OccupancyTests(VMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.host = User.objects.create_user('Asha Rao', 'asha@example.com', '9000000001', 'password')
+        self.visitor = Visitor.objects.create(
+            visitor_name='Priya Sharma', visitor_email='priya@example.com', visitor_mobile='9100000001',
+            registered_by=self.host, purpose='Meeting'
+        )
+
+    def inside(self):
+        snapshot = occupancy.snapshot()
+        return snapshot['total'], [(host['host_id'], host['inside']) for host in snapshot['hosts']]
+
+    def test_repeated_entry_scans_count_once(self):
+        for _ in range(3):
+            self.assertTrue(process_scan(self.visitor.visit_code).admitted)
+        self.assertEqual(self.inside(), (1, [(self.host.pk, 1)]))
+        self.assertEqual(Turnstile.objects.filter(exit_time__isnull=True).count(), 1)
+        self.assertEqual(TurnstileLog.objects.filter(status='success').count(), 3)
+
+        self.assertTrue(process_scan(self.visitor.visit_code, 'out').admitted)
+        self.assertEqual(self.inside(), (0, []))
+        self.assertFalse(process_scan(self.visitor.visit_code, 'out').admitted)
+        self.assertEqual(self.inside(), (0, []))
+
+    def test_reconcile_matches_counters(self):
+        process_scan(self.visitor.visit_code)
+        Turnstile.objects.create(visitor=self.visitor, exit_time=now())
+        self.assertEqual(occupancy.reconcile(), 1)
+        self.assertEqual(self.inside(), (1, [(self.host.pk, 1)]))
+
+
+class ArchiveTests(VMSTestCase):
+    def setUp(self):
+        super().setUp()
+        archive = self.settings(VISITOR_ARCHIVE_DIR=tempfile.mkdtemp(prefix='vms-test-archive-'))
+        archive.enable()
+        self.addCleanup(archive.disable)
+        self.host = User.objects.create_user('Asha Rao', 'asha@example.com', '9000000001', 'password')
+        self.visitor = Visitor.objects.create(
+            visitor_name='Priya Sharma', visitor_email='priya@example.com', visitor_mobile='9100000001',
+            registered_by=self.host, purpose='Meeting'
+        )
+        self.old = now() - timedelta(days=200)
+
+    def old_entry(self, closed=True):
+        turnstile = Turnstile.objects.create(visitor=self.visitor, entry_time=self.old,
+                                             exit_time=self.old + timedelta(hours=1) if closed else None)
+        TurnstileLog.objects.create(turnstile=turnstile, qr_code_scan='scan', status='success', scanned_at=self.old)
+        return turnstile
+
+    def test_round_trip(self):
+        closed, still_open = self.old_entry(), self.old_entry(closed=False)
+        recent = Turnstile.objects.create(visitor=self.visitor)
+        TurnstileLog.objects.create(qr_code_scan='old denied', status='denied', scanned_at=self.old)
+        recent_denied = TurnstileLog.objects.create(qr_code_scan='new denied', status='denied')
+        self.assertEqual(occupancy.snapshot()['total'], 2)
+
+        cutoff = now() - timedelta(days=90)
+        self.assertEqual(list(archive_turnstiles(cutoff)), [(2, 2)])
+        self.assertEqual(list(archive_scan_logs(cutoff)), [1])
+
+        records = list(iter_archive(self.visitor.pk))
+        self.assertEqual([record['id'] for record in records], [closed.pk, still_open.pk])
+        self.assertEqual([log['qr_code_scan'] for log in records[0]['logs']], ['scan'])
+        self.assertEqual([record['qr_code_scan'] for record in iter_scan_logs()], ['old denied'])
+        self.assertEqual(list(iter_archive(self.visitor.pk, start=self.old.date() + timedelta(days=1))), [])
+
+        self.assertEqual(list(Turnstile.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertEqual(list(TurnstileLog.objects.values_list('pk', flat=True)), [recent_denied.pk])
+        # The archived open entry no longer counts as inside
+        self.assertEqual(occupancy.snapshot()['total'], 1)
+
+    def test_batch_queries_do_not_grow_with_open_entries(self):
+        counts = []
+        for size in (1, 5):
+            for _ in range(size):
+                self.old_entry(closed=False)
+            with CaptureQueriesContext(connection) as queries:
+                list(archive_turnstiles(now() - timedelta(days=90)))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(occupancy.snapshot()['total'], 0)
+
+
+class BulkRegistrationTests(VMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.host = User.objects.create_user('Asha Rao', 'asha@example.com', '9000000001', 'password')
+        self.authenticate(self.host)
+        Visitor.objects.create(visitor_name='Priya Sharma', visitor_email='priya@example.com',
+                               visitor_mobile='9100000001', purpose='Meeting')
+
+    def row(self, n, **overrides):
+        return {'visitor_name': f'Visitor {n}', 'visitor_email': f'visitor{n}@example.com',
+                'visitor_mobile': f'920000000{n}', 'registered_by': self.host.pk, 'purpose': 'Meeting', **overrides}
+
+    def post(self, data, **extra):
+        return self.client.post('/visit/visitors/bulk/', data, content_type='application/json', **extra)
+
+    def test_per_row_report(self):
+        response = self.post({'visitors': [
+            self.row(1),
+            self.row(2, visitor_email='VISITOR1@example.com'),
+            self.row(3, visitor_mobile='9100000001'),
+            self.row(4, registered_by=999999),
+            self.row(5, visitor_email='not-an-email'),
+            self.row(6),
+        ]})
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (2, 4))
+        self.assertEqual([result['status'] for result in body['results']],
+                         ['created', 'error', 'error', 'error', 'error', 'created'])
+        errors = {result['row']: result['errors'] for result in body['results'] if result['status'] == 'error'}
+        self.assertEqual(errors[1], {'visitor_email': ['Duplicate visitor email in this upload.']})
+        self.assertEqual(errors[2], {'visitor_mobile': ['visitor with this visitor mobile already exists.']})
+        self.assertIn('registered_by', errors[3])
+        self.assertIn('visitor_email', errors[4])
+
+        created = Visitor.objects.filter(visitor_email__in=['visitor1@example.com', 'visitor6@example.com'])
+        self.assertEqual(len(created), 2)
+        for visitor, result in zip(created.order_by('visitor_id'), (body['results'][0], body['results'][5])):
+            self.assertEqual((visitor.visitor_id, visitor.visit_code), (result['visitor_id'], result['visit_code']))
+            self.assertIsNotNone(visitor.visit_code_issued_at)
+
+    def test_csv_upload(self):
+        csv = ('visitor_name,visitor_email,visitor_mobile,purpose\n'
+               'Visitor 1,visitor1@example.com,9200000001,Meeting\n'
+               'Visitor 2,,9200000002,Meeting\n')
+        response = self.client.post('/visit/visitors/bulk/', csv, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['created', 'error'])
+
+    def test_nothing_valid(self):
+        response = self.post({'visitors': [self.row(1, visitor_mobile='9100000001')]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+        self.assertFalse(Visitor.objects.filter(visitor_email='visitor1@example.com').exists())
+
+    @override_settings(VISITOR_BULK_MAX_ROWS=2)
+    def test_row_limit(self):
+        response = self.post({'visitors': [self.row(n) for n in range(3)]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Visitor.objects.count(), 1)
+
+
+@override_settings(VISITOR_ALLOWLIST_OVERLAP=timedelta(0))
+class AllowlistTests(VMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate(User.objects.create_user('Asha Rao', 'asha@example.com', '9000000001', 'password'))
+        self.visitors = [
+            Visitor.objects.create(visitor_name=f'Visitor {n}', visitor_email=f'visitor{n}@example.com',
+                                   visitor_mobile=f'920000000{n}', purpose='Meeting')
+            for n in range(3)
+        ]
+        # Older than anything written by the test itself
+        Visitor.objects.update(updated_at=now() - timedelta(hours=1))
+
+    def test_snapshot(self):
+        response = self.client.get('/visit/allowlist/')
+        self.assertEqual(response.status_code, 200)
+        version, codes = parse_snapshot(response.content)
+        self.assertEqual(codes, sorted(visitor.visit_code for visitor in self.visitors))
+        self.assertEqual((version, response['ETag']), (current_version(), f'"{version}"'))
+
+        self.assertEqual(self.client.get('/visit/allowlist/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.visitors[0].delete()
+        self.assertEqual(self.client.get('/visit/allowlist/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_delta(self):
+        since = current_version() + 1    # Rows written exactly at the version are read back again
+        reissued, deleted = self.visitors[0], self.visitors[1]
+        old_code, deleted_code = reissued.visit_code, deleted.visit_code
+        reissued.visit_code = 'abcdef12'
+        reissued.save()
+        deleted.delete()
+
+        delta = build_delta(since)
+        self.assertEqual(delta['added'], ['abcdef12'])
+        self.assertEqual(delta['revoked'], sorted([old_code, deleted_code]))
+        self.assertEqual(delta['version'], current_version())
+
+    def test_delta_needs_a_version(self):
+        self.assertEqual(self.client.get('/visit/allowlist/delta/?since=yesterday').status_code, 400)
+
+
+# Driven from the test thread: the flusher thread is not started, so stop() and drain() do the writing
+class LogBufferTests(VMSTestCase):
+    def buffer(self, **kwargs):
+        buffer = TurnstileLogBuffer(**kwargs)
+        buffer._ensure_started = lambda: None
+        return buffer
+
+    def submit(self, buffer, count, start=0):
+        for n in range(start, start + count):
+            buffer.submit(TurnstileLog(qr_code_scan=f'scan {n}', status='denied'))
+
+    def test_stop_drains_in_batches(self):
+        buffer = self.buffer(batch_size=2)
+        self.submit(buffer, 5)
+        self.assertFalse(TurnstileLog.objects.exists())
+        self.assertEqual(buffer.stats()['pending'], 5)
+
+        buffer.stop()
+        self.assertEqual(sorted(TurnstileLog.objects.values_list('qr_code_scan', flat=True)),
+                         [f'scan {n}' for n in range(5)])
+        stats = buffer.stats()
+        self.assertEqual((stats['flushes'], stats['rows_flushed'], stats['max_flush_size'], stats['pending']),
+                         (3, 5, 2, 0))
+
+    def test_full_buffer_writes_synchronously(self):
+        buffer = self.buffer(max_size=2)
+        self.submit(buffer, 3)
+        self.assertEqual(TurnstileLog.objects.count(), 1)
+        self.assertEqual(buffer.stats()['sync_writes'], 1)
+        buffer.drain()
+        self.assertEqual(TurnstileLog.objects.count(), 3)
+
+    # Rows submitted after stop() (late requests during shutdown) are not left in the queue
+    def test_submit_after_stop(self):
+        buffer = self.buffer()
+        buffer.stop()
+        self.submit(buffer, 2)
+        self.assertEqual(TurnstileLog.objects.count(), 2)
+        self.assertEqual(buffer.stats()['sync_writes'], 2)
+        self.assertEqual(buffer.stats()['pending'], 0)
+
+    @override_settings(VISITOR_SCAN_LOG_BUFFER={'ENABLED': True})
+    def test_scan_hands_logs_to_the_buffer(self):
+        from . import logbuffer
+
+        buffer = self.buffer()
+        self.addCleanup(setattr, logbuffer, '_buffer', logbuffer._buffer)
+        logbuffer._buffer = buffer
+        visitor = Visitor.objects.create(visitor_name='Priya Sharma', visitor_email='priya@example.com',
+                                         visitor_mobile='9100000001', purpose='Meeting')
+        result = process_scan(visitor.visit_code)
+        self.assertTrue(result.admitted)
+        self.assertIsNone(result.as_dict()['log_id'])
+        self.assertFalse(TurnstileLog.objects.exists())
+        buffer.stop()
+        self.assertEqual(list(TurnstileLog.objects.values_list('turnstile_id', 'status')),
+                         [(result.turnstile.pk, 'success')])
+
+
+# Driven from the test thread like the log buffer: rounds are run by hand with a chosen clock
+class ArrivalNotifierTests(VMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.asha = User.objects.create_user('Asha Rao', 'asha@example.com', '9000000001', 'password')
+        self.ben = User.objects.create_user('Ben Mathew', 'ben@example.com', '9000000002', 'password')
+        self.visitors = [
+            Visitor.objects.create(visitor_name=f'Visitor {n}', visitor_email=f'visitor{n}@example.com',
+                                   visitor_mobile=f'920000000{n}', purpose='Meeting')
+            for n in range(4)
+        ]
+
+    def notifier(self, **kwargs):
+        notifier = ArrivalNotifier(**kwargs)
+        notifier._ensure_started = lambda: None
+        return notifier
+
+    def arrive(self, notifier, host, *visitors):
+        for visitor in visitors:
+            notifier.submit(host.pk, visitor.pk, now())
+        notifier._collect(block=False)
+
+    def digests(self):
+        return {tuple(email.to): (email.subject, email.body) for email in OutboxEmail.objects.all()}
+
+    def test_arrivals_are_coalesced_per_host(self):
+        notifier = self.notifier(window_seconds=30, max_listed=2)
+        self.arrive(notifier, self.asha, *self.visitors[:3])
+        self.arrive(notifier, self.ben, self.visitors[3])
+        start = time.monotonic()
+        self.assertEqual(notifier._take_due(start), {})
+
+        notifier._send_or_restore(notifier._take_due(start + 31))
+        digests = self.digests()
+        self.assertEqual(len(digests), 2)
+        subject, body = digests[('asha@example.com',)]
+        self.assertEqual(subject, '3 visitor arrivals')
+        self.assertIn('- Visitor 0 at', body)
+        self.assertIn('- Visitor 1 at', body)
+        self.assertNotIn('Visitor 2', body)
+        self.assertIn('- and 1 more arrivals', body)
+        self.assertEqual(digests[('ben@example.com',)][0], 'Your visitor has arrived')
+
+    def test_hourly_cap_holds_arrivals_for_the_next_digest(self):
+        notifier = self.notifier(window_seconds=30, max_per_hour=1)
+        start = time.monotonic()
+        self.arrive(notifier, self.asha, self.visitors[0])
+        notifier._send_or_restore(notifier._take_due(start + 31))
+        self.arrive(notifier, self.asha, self.visitors[1])
+        self.arrive(notifier, self.asha, self.visitors[2])
+        self.assertEqual(notifier._take_due(start + 120), {})
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+        notifier._send_or_restore(notifier._take_due(start + 3600 + 32))
+        self.assertEqual(list(OutboxEmail.objects.order_by('id').values_list('subject', flat=True)),
+                         ['Your visitor has arrived', '2 visitor arrivals'])
+
+    # A digest that could not be queued goes back to _pending with its hourly slot, and is not lost
+    def test_failed_digest_is_put_back(self):
+        from employee.utils import Util
+
+        notifier = self.notifier(window_seconds=30, max_per_hour=1)
+        self.arrive(notifier, self.asha, *self.visitors[:2])
+        self.arrive(notifier, self.ben, self.visitors[2])
+        due = notifier._take_due(time.monotonic() + 31)
+        sends = []
+
+        def send_email(data):
+            if sends:
+                raise ConnectionError('Database went away')
+            sends.append(data['to_email'])
+
+        with patch.object(Util, 'send_email', side_effect=send_email):
+            with self.assertRaises(ConnectionError):
+                notifier._send_or_restore(due)
+        unsent = self.ben if sends == ['asha@example.com'] else self.asha
+        self.assertEqual(list(notifier._pending), [unsent.pk])
+
+        # Later arrivals join the restored group, and the cap no longer counts the failed digest
+        self.arrive(notifier, unsent, self.visitors[3])
+        notifier.stop()
+        self.assertEqual(OutboxEmail.objects.get().to, [unsent.email])
+        self.assertFalse(notifier._pending)
+
+
+class ExportRecordsCommandTests(VMSTestCase):
+    def test_bad_dates_are_command_errors(self):
+        for value in ('2024-02-30', 'yesterday'):
+            with self.subTest(value=value), self.assertRaisesMessage(CommandError, f'Invalid date: {value}'):
+                call_command('export_records', 'turnstile-logs', '--from', value)
+
+    def test_date_range(self):
+        TurnstileLog.objects.create(qr_code_scan='scan 1', status='denied')
+        output = tempfile.NamedTemporaryFile(suffix='.ndjson')
+        self.addCleanup(output.close)
+        today = localdate().isoformat()
+        call_command('export_records', 'turnstile-logs', '--from', today, '--to', today,
+                     '--output-format', 'ndjson', '--output', output.name)
+        with open(output.name, 'rb') as exported:
+            rows = [json.loads(line) for line in exported]
+        self.assertEqual([row['qr_code_scan'] for row in rows], ['scan 1'])
+
+
+class SyntheticDataTests(VMSTestCase):
+    def generate(self):
+        generator = SyntheticDataGenerator(seed=7, users=5, visitors=20, turnstiles=60, days=5,
+                                           denied_ratio=0.2, chunk_size=7)
+        self.assertEqual(generator.non_empty_tables(), [])
+        counts = generator.run()
+        rows = {model._meta.label: list(model.objects.order_by('pk').values())
+                for model in SyntheticDataGenerator.TABLES}
+        return counts, rows
+
+    def test_same_seed_same_rows(self):
+        counts, rows = self.generate()
+        self.assertEqual((counts['visitors'], counts['turnstiles']), (20, 60))
+        denied = [log for log in rows['visitor.TurnstileLog'] if log['status'] == 'denied']
+        self.assertTrue(denied)
+        self.assertEqual({log['turnstile_id'] for log in denied}, {None})
+        self.assertNotIn(None, {log['turnstile_id'] for log in rows['visitor.TurnstileLog']
+                                if log['status'] == 'success'})
+
+        for model in reversed(SyntheticDataGenerator.TABLES):
+            model.objects.all().delete()
+        self.assertEqual(self.generate(), (counts, rows))
+
+    def test_bad_end_date(self):
+        with self.assertRaisesMessage(CommandError, '--end-date must be a date'):
+            call_command('generate_synthetic_data', '--end-date', '2024-02-30')
+
+
+class CheckInTests(VMSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.host = User.objects.create_user('Asha Rao', 'asha@example.com', '9000000001', 'password')
+        self.authenticate(self.host)
+
+    def data(self, n, **overrides):
+        return {'visitor_name': f'Visitor {n}', 'visitor_email': f'visitor{n}@example.com',
+                'visitor_mobile': f'920000000{n}', 'registered_by': self.host.pk, 'purpose': 'Meeting', **overrides}
+
+    def check_in(self, data):
+        return self.client.post('/visit/checkin/', data, content_type='application/json')
+
+    def visit_codes(self, visitor_id):
+        response = self.client.get(f'/visit/visitors/{visitor_id}/visits/')
+        self.assertEqual(response.status_code, 200)
+        return [visit['visit_code'] for visit in response.json()['results']]
+
+    def test_every_registration_records_the_first_visit(self):
+        created = self.client.post('/visit/visitors/', self.data(1), content_type='application/json').json()
+        self.assertEqual(self.visit_codes(created['visitor_id']), [created['visit_code']])
+
+        response = self.client.post('/visit/visitors/bulk/', {'visitors': [self.data(2), self.data(3)]},
+                                    content_type='application/json')
+        for result in response.json()['results']:
+            self.assertEqual(self.visit_codes(result['visitor_id']), [result['visit_code']])
+        self.assertEqual(set(Visit.objects.values_list('host_id', flat=True)), {self.host.pk})
+
+    def test_returning_visitor_is_checked_in_again(self):
+        first = self.check_in(self.data(1))
+        self.assertEqual(first.status_code, 201)
+        visitor = first.json()['visitor']
+
+        # Matched on the mobile alone; the details are refreshed and a new code is issued
+        again = self.check_in(self.data(1, visitor_name='Visitor One', visitor_email='one@example.com',
+                                        purpose='Interview'))
+        self.assertEqual(again.status_code, 200)
+        body = again.json()
+        self.assertFalse(body['created'])
+        self.assertEqual(body['visitor']['visitor_id'], visitor['visitor_id'])
+        self.assertNotEqual(body['visitor']['visit_code'], visitor['visit_code'])
+        self.assertEqual(Visitor.objects.get().visitor_email, 'one@example.com')
+        self.assertTrue(RevokedVisitCode.objects.filter(visit_code=visitor['visit_code']).exists())
+
+        self.assertEqual(self.visit_codes(visitor['visitor_id']),
+                         [body['visitor']['visit_code'], visitor['visit_code']])
+        self.assertEqual(list(Visit.objects.order_by('pk').values_list('purpose', flat=True)),
+                         ['Meeting', 'Interview'])
+
+    def test_email_and_mobile_of_different_visitors(self):
+        one = self.check_in(self.data(1)).json()['visitor']['visitor_id']
+        two = self.check_in(self.data(2)).json()['visitor']['visitor_id']
+        response = self.check_in(self.data(3, visitor_email='visitor1@example.com', visitor_mobile='9200000002'))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['visitor_ids'], [one, two])
+        self.assertEqual(Visit.objects.count(), 2)
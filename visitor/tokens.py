@@ -0,0 +1,83 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import re
+import struct
+import time
+
+from django.conf import settings
+
+# Compact signed badge payload:
+#   version (1 byte) | visitor_id (4) | visit_code (4, hex-decoded) | not_before (4) | not_after (4) | HMAC-SHA256[:8]
+# Base32 without padding gives 40 characters from the QR alphanumeric set, which fits a version 2-L code.
+TOKEN_VERSION = 1
+_BODY = struct.Struct('>BIIII')
+MAC_SIZE = 8
+TOKEN_RE = re.compile(r'^[A-Z2-7]{40}$')
+
+
+class InvalidVisitToken(Exception):
+    pass
+
+
+class VisitToken:
+    __slots__ = ('visitor_id', 'visit_code', 'not_before', 'not_after')
+
+    def __init__(self, visitor_id, visit_code, not_before, not_after):
+        self.visitor_id = visitor_id
+        self.visit_code = visit_code
+        self.not_before = not_before
+        self.not_after = not_after
+
+
+_signing_key = None
+
+
+def _key():
+    global _signing_key
+    if _signing_key is None:
+        key = getattr(settings, 'VISITOR_QR_SIGNING_KEY', None) or settings.SECRET_KEY
+        _signing_key = hashlib.sha256(b'visitor.tokens:' + key.encode()).digest()
+    return _signing_key
+
+
+def _mac(body):
+    return hmac.new(_key(), body, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def can_sign(visit_code):
+    return bool(visit_code) and len(visit_code) == 8 and all(c in '0123456789abcdefABCDEF' for c in visit_code)
+
+
+def make_visit_token(visitor_id, visit_code, not_before, not_after):
+    body = _BODY.pack(TOKEN_VERSION, visitor_id, int(visit_code, 16), int(not_before), int(not_after))
+    return base64.b32encode(body + _mac(body)).decode('ascii').rstrip('=')
+
+
+def looks_like_token(raw):
+    return TOKEN_RE.match(raw) is not None
+
+
+# Check signature and validity window; no database access.
+def verify_visit_token(token, at=None):
+    try:
+        data = base64.b32decode(token)
+    except (binascii.Error, ValueError):
+        raise InvalidVisitToken('Malformed token.')
+    if len(data) != _BODY.size + MAC_SIZE:
+        raise InvalidVisitToken('Malformed token.')
+
+    body, mac = data[:_BODY.size], data[_BODY.size:]
+    if not hmac.compare_digest(mac, _mac(body)):
+        raise InvalidVisitToken('Bad signature.')
+    version, visitor_id, code, not_before, not_after = _BODY.unpack(body)
+    if version != TOKEN_VERSION:
+        raise InvalidVisitToken('Unsupported token version.')
+
+    at = time.time() if at is None else at
+    if at < not_before:
+        raise InvalidVisitToken('Token not yet valid.')
+    if at > not_after:
+        raise InvalidVisitToken('Token expired.')
+    return VisitToken(visitor_id, f'{code:08x}', not_before, not_after)
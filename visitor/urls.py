@@ -1,6 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import VisitorViewSet, TurnstileViewSet, TurnstileLogViewSet
+from .views import (
+    VisitorViewSet, TurnstileViewSet, TurnstileLogViewSet, CheckInView,
+    ScanView, ScanLogBufferView, OccupancyView,
+    AllowlistView, AllowlistDeltaView, TurnstileArchiveView, ExportView
+)
 
 # Create a router and register viewsets
 router = DefaultRouter()
@@ -10,5 +14,13 @@ router.register(r'turnstile-logs', TurnstileLogViewSet, basename='turnstilelog')
 
 # URL patterns
 urlpatterns = [
+    path('checkin/', CheckInView.as_view(), name='checkin'),
+    path('scan/', ScanView.as_view(), name='scan'),
+    path('scan/log-buffer/', ScanLogBufferView.as_view(), name='scan-log-buffer'),
+    path('occupancy/', OccupancyView.as_view(), name='occupancy'),
+    path('allowlist/', AllowlistView.as_view(), name='allowlist'),
+    path('allowlist/delta/', AllowlistDeltaView.as_view(), name='allowlist-delta'),
+    path('archive/turnstiles/', TurnstileArchiveView.as_view(), name='turnstile-archive'),
+    path('exports/<str:kind>/', ExportView.as_view(), name='export'),
     path('', include(router.urls)),
 ]
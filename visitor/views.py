@@ -1,13 +1,38 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from .models import Visitor, Turnstile, TurnstileLog
-from .serializers import VisitorSerializer, TurnstileSerializer, TurnstileLogSerializer
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+from visitor_management_system.search import parse_search_params
+from .models import Visitor, Visit, Turnstile, TurnstileLog
+from .allowlist import build_delta, build_snapshot, current_version
+from .archive import iter_archive
+from .exports import EXPORTS, OUTPUT_FORMATS, stream_export
+from .logbuffer import get_log_buffer
+from .occupancy import snapshot as occupancy_snapshot
+from .parsers import CSVParser
+from .qr import QR_FORMATS, get_qr_cache, qr_etag, render_qr
+from .scan import DIRECTION_IN, DIRECTION_OUT, process_scan
+from .search import visitor_search
+from .serializers import (
+    CheckInConflict, VisitorSerializer, VisitorBulkSerializer, VisitorCheckInSerializer, VisitSerializer,
+    TurnstileSerializer, TurnstileLogSerializer
+)
 
 
 # Visitor ViewSet
 class VisitorViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    # Query budgets per action, checked by QueryBudgetMiddleware (authentication included).
+    # bulk: 11 for up to 500 rows, 3 more (visitor insert, visit insert, QR update) per further
+    # 500 up to VISITOR_BULK_MAX_ROWS, and 1 on MySQL to read back the primary keys
+    query_budget = {'list': 6, 'retrieve': 6, 'qr': 6, 'create': 11, 'update': 11, 'partial_update': 11, 'bulk': 39,
+                    'search': 7, 'visits': 6}
     queryset = Visitor.objects.all()
     serializer_class = VisitorSerializer
 
@@ -18,16 +43,259 @@ class VisitorViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    # Pre-register many visitors from a JSON list or a CSV upload, with a per-row report
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, CSVParser])
+    def bulk(self, request):
+        data = request.data
+        if isinstance(data, dict):
+            data = data.get('visitors')
+        serializer = VisitorBulkSerializer(
+            data=data, many=True,
+            context={**self.get_serializer_context(), 'max_rows': getattr(settings, 'VISITOR_BULK_MAX_ROWS', 5000)}
+        )
+        serializer.is_valid(raise_exception=True)
+        visitors = serializer.save()
+
+        results = [
+            {'row': index, 'status': 'error', 'errors': errors}
+            for index, errors in serializer.row_errors.items()
+        ]
+        for (index, _), visitor in zip(serializer.valid_rows, visitors):
+            results.append({
+                'row': index, 'status': 'created', 'visitor_id': visitor.visitor_id,
+                'visit_code': visitor.visit_code, 'qr_status': visitor.qr_status,
+            })
+        results.sort(key=lambda result: result['row'])
+
+        return Response(
+            {'created': len(visitors), 'failed': len(serializer.row_errors), 'results': results},
+            status=status.HTTP_201_CREATED if visitors else status.HTTP_400_BAD_REQUEST
+        )
+
+    # Ranked lookup by partial name, email or mobile: /visitors/search/?q=<text>&limit=<n>
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        query, limit = parse_search_params(request)
+        ids = visitor_search.search(query, limit)
+        visitors = Visitor.objects.in_bulk(ids)
+        ranked = [visitors[visitor_id] for visitor_id in ids if visitor_id in visitors]
+        serializer = self.get_serializer(ranked, many=True)
+        return Response({'count': len(ranked), 'results': serializer.data}, status=status.HTTP_200_OK)
+
+    # Visit history of one visitor, newest first: /visitors/{id}/visits/
+    @action(detail=True, methods=['get'], url_path='visits')
+    def visits(self, request, pk=None):
+        page = self.paginate_queryset(Visit.objects.filter(visitor_id=pk))
+        serializer = VisitSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    # Render the visitor's badge on demand: /visitors/{id}/qr/?output=png|svg&size=<px>
+    @action(detail=True, methods=['get'], url_path='qr')
+    def qr(self, request, pk=None):
+        fmt = request.query_params.get('output', 'png').lower()
+        if fmt not in QR_FORMATS:
+            return Response({"error": f"output must be one of: {', '.join(QR_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        size = request.query_params.get('size')
+        if size is not None:
+            max_size = getattr(settings, 'VISITOR_QR_MAX_SIZE', 2048)
+            if not size.isdigit() or not 0 < int(size) <= max_size:
+                return Response({"error": f"size must be a whole number of pixels up to {max_size}."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            size = int(size)
+
+        visitor = self.get_object()
+        payload = visitor.qr_payload()
+        etag = qr_etag(payload, fmt, size)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or etag in etags or f'W/{etag}' in etags:
+                return HttpResponseNotModified(headers=headers)
+
+        cache = get_qr_cache()
+        key = (visitor.visit_code, fmt, size)
+        image = cache.get(key, payload)
+        if image is None:
+            try:
+                image = render_qr(payload, fmt=fmt, size=size)
+            except ValueError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            cache.put(key, payload, image)
+        return HttpResponse(image, content_type=QR_FORMATS[fmt], headers=headers)
+
 # Turnstile ViewSet
 class TurnstileViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    query_budget = {'list': 6, 'retrieve': 6, 'create': 9, 'update': 10, 'partial_update': 10}
     queryset = Turnstile.objects.all()
     serializer_class = TurnstileSerializer
 
 # TurnstileLog ViewSet
 class TurnstileLogViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    query_budget = {'list': 6, 'retrieve': 6, 'create': 7, 'update': 8, 'partial_update': 8}
     queryset = TurnstileLog.objects.all()
     serializer_class = TurnstileLogSerializer
 
 
+### Check-in ###
+# Registers a first-time visitor or checks a returning one in again (matched on email or mobile)
+# with a fresh visit code; 201 for a new visitor, 200 for a returning one
+class CheckInView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 11
+
+    def post(self, request, *args, **kwargs):
+        serializer = VisitorCheckInSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.save()
+        except CheckInConflict as exc:
+            return Response({"error": str(exc), "visitor_ids": exc.visitor_ids}, status=status.HTTP_409_CONFLICT)
+        return Response(
+            {'created': serializer.created, 'visitor': serializer.data, 'visit': VisitSerializer(serializer.visit).data},
+            status=status.HTTP_201_CREATED if serializer.created else status.HTTP_200_OK
+        )
+
+
+### Turnstile Scan ###
+# One call per gate scan: resolves the QR payload and writes Turnstile + TurnstileLog together
+class ScanView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 17
+
+    def post(self, request, *args, **kwargs):
+        raw = request.data.get('qr_code_scan')
+        direction = request.data.get('direction', DIRECTION_IN)
+        if not isinstance(raw, str) or not raw:
+            return Response({"error": "qr_code_scan is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if direction not in (DIRECTION_IN, DIRECTION_OUT):
+            return Response({"error": "direction must be 'in' or 'out'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = process_scan(raw, direction)
+        return Response(result.as_dict(),
+                        status=status.HTTP_200_OK if result.admitted else status.HTTP_403_FORBIDDEN)
+
+
+# Flush sizes and lag of the buffered scan log writer, for tuning
+class ScanLogBufferView(APIView):
+    permission_classes = [IsAdminUser]
+    query_budget = 5
+
+    def get(self, request, *args, **kwargs):
+        log_buffer = get_log_buffer()
+        if log_buffer is None:
+            return Response({"enabled": False}, status=status.HTTP_200_OK)
+        return Response({"enabled": True, **log_buffer.stats()}, status=status.HTTP_200_OK)
+
+
+### Occupancy ###
+# Visitors inside right now, overall and per host employee, from the maintained counters
+class OccupancyView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 6
+
+    def get(self, request, *args, **kwargs):
+        return Response(occupancy_snapshot(), status=status.HTTP_200_OK)
+
+
+### Gate Allowlist ###
+# Full binary snapshot of valid visit codes; the version doubles as the ETag
+class AllowlistView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 8
+
+    def get(self, request, *args, **kwargs):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etag = f'"{current_version()}"'
+            if etag in parse_etags(if_none_match):
+                return HttpResponseNotModified(headers={'ETag': etag})
+
+        version, snapshot = build_snapshot()
+        return HttpResponse(snapshot, content_type='application/octet-stream',
+                            headers={'ETag': f'"{version}"', 'X-Allowlist-Version': str(version)})
+
+
+# Codes added or revoked since a snapshot version: /allowlist/delta/?since=<version>
+class AllowlistDeltaView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 9
+
+    def get(self, request, *args, **kwargs):
+        since = request.query_params.get('since', '')
+        if not since.isdigit():
+            return Response({"error": "since must be an allowlist version."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(build_delta(int(since)), status=status.HTTP_200_OK)
+
+
+# ?from= and ?to= as dates (None when absent); ValueError when either is not a real YYYY-MM-DD date
+def parse_date_range(params):
+    dates = []
+    for name in ('from', 'to'):
+        value = params.get(name)
+        # parse_date returns None for a malformed value and raises for an impossible one (2024-02-30)
+        parsed = parse_date(value) if value else None
+        if value and parsed is None:
+            raise ValueError(f"Invalid {name} date: {value}")
+        dates.append(parsed)
+    return dates
+
+
+### Turnstile Archive ###
+# Archived entries by visitor and/or date range: /archive/turnstiles/?visitor=&from=YYYY-MM-DD&to=YYYY-MM-DD
+class TurnstileArchiveView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 5
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        visitor = params.get('visitor')
+        if visitor is not None and not visitor.isdigit():
+            return Response({"error": "visitor must be a visitor id."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = parse_date_range(params)
+        except ValueError:
+            return Response({"error": "from and to must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = params.get('limit', '1000')
+        if not limit.isdigit():
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        records = []
+        for record in iter_archive(int(visitor) if visitor else None, start, end):
+            if len(records) == int(limit):
+                break
+            records.append(record)
+        return Response(records, status=status.HTTP_200_OK)
+
+
+### Exports ###
+# Streamed export: /exports/<turnstile-logs|visitors>/?from=YYYY-MM-DD&to=YYYY-MM-DD&output=csv|ndjson&gzip=1
+class ExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = 5
+
+    def get(self, request, kind, *args, **kwargs):
+        if kind not in EXPORTS:
+            return Response({"error": f"Unknown export: {kind}."}, status=status.HTTP_404_NOT_FOUND)
+        params = request.query_params
+        output = params.get('output', 'csv')
+        if output not in OUTPUT_FORMATS:
+            return Response({"error": f"output must be one of: {', '.join(OUTPUT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = parse_date_range(params)
+        except ValueError:
+            return Response({"error": "from and to must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+        compress = params.get('gzip') in ('1', 'true')
+
+        filename = f"{kind}-{start or 'all'}-{end or 'now'}.{output}" + ('.gz' if compress else '')
+        response = StreamingHttpResponse(
+            stream_export(kind, start, end, output=output, compress=compress),
+            content_type='application/gzip' if compress else OUTPUT_FORMATS[output],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
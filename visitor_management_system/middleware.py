@@ -0,0 +1,171 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST_RE = re.compile(r'\bIN \([^)]*\)', re.IGNORECASE)
+# Transaction control, issued by atomic() only when it nests inside another transaction
+_SAVEPOINT_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# Collapse literals so the same statement with different values counts as one pattern
+def normalize_sql(sql):
+    sql = _STRING_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _NUMBER_RE.sub('?', sql)
+
+
+# Tables of DatabaseCache backends in settings.CACHES
+def cache_tables():
+    return tuple(config['LOCATION'] for config in getattr(settings, 'CACHES', {}).values()
+                 if config.get('BACKEND', '').endswith('.DatabaseCache'))
+
+
+# Queries against a DatabaseCache table count toward the budget like any other and are also
+# reported on their own (cache_count), since a Redis cache would take them off the database.
+# Savepoint statements are not counted: whether atomic() issues them depends on the caller's
+# transaction (tests)
+class QueryRecorder:
+    def __init__(self, cache_tables=()):
+        self.count = 0
+        self.cache_count = 0
+        self.duration = 0.0
+        self.patterns = Counter()
+        self.cache_tables = cache_tables
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            if not sql.startswith(_SAVEPOINT_PREFIXES):
+                self.count += 1
+                self.patterns[normalize_sql(sql)] += 1
+                if any(table in sql for table in self.cache_tables):
+                    self.cache_count += 1
+
+    def repeated(self, threshold):
+        return [(sql, count) for sql, count in self.patterns.most_common() if count >= threshold]
+
+
+# Per-request query accounting.
+# Records query count, total DB time and repeated statement patterns, warns about likely N+1
+# loops and checks the count against the `query_budget` declared on the view class, either an
+# int or a dict keyed by viewset action / HTTP method. With DEBUG the numbers are returned in
+# X-Query-* headers; with QUERY_BUDGET['STRICT'] going over budget raises QueryBudgetExceeded,
+# which makes the test client fail the test. Runs in both modes, so under ASGI the async views
+# are awaited on the event loop instead of behind a sync middleware thread.
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        # Read per request so override_settings() in tests takes effect
+        config = getattr(settings, 'QUERY_BUDGET', {})
+        if not config.get('ENABLED', True):
+            return self.get_response(request)
+
+        recorder = request._query_recorder = QueryRecorder(cache_tables())
+        install_recorder()
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.check(request, response, config, recorder)
+
+    async def __acall__(self, request):
+        config = getattr(settings, 'QUERY_BUDGET', {})
+        if not config.get('ENABLED', True):
+            return await self.get_response(request)
+
+        recorder = request._query_recorder = QueryRecorder(cache_tables())
+        # Queries run on the request's sync_to_async thread, whose connections are not this
+        # thread's; the context variable travels there with every call
+        await sync_to_async(install_recorder)()
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.check(request, response, config, recorder)
+
+    def check(self, request, response, config, recorder):
+        repeated = recorder.repeated(config.get('N_PLUS_ONE_THRESHOLD', 5))
+        for sql, count in repeated:
+            logger.warning("Possible N+1 on %s %s: %d x %s", request.method, request.path, count, sql)
+
+        budget = request._query_budget = view_budget(request)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Cache-Count'] = str(recorder.cache_count)
+            response['X-Query-Time-Ms'] = f'{recorder.duration * 1000:.2f}'
+            response['X-Query-Repeated'] = str(repeated[0][1] if repeated else 0)
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+
+        if budget is not None and recorder.count > budget:
+            message = f"{request.method} {request.path} ran {recorder.count} queries, budget is {budget}"
+            if config.get('STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+_recorder = ContextVar('query_recorder', default=None)
+
+
+# Execute wrapper that hands each query to the recorder of the request being served, if any
+def _record(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+# Put _record on this thread's connections once. It goes first in the list, out of the way
+# of connection.execute_wrapper() blocks, which pop the last wrapper on exit.
+def install_recorder():
+    for connection in connections.all():
+        if _record not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, _record)
+
+
+# Budget of the view the request was routed to. Looked up from the resolver match after the
+# response rather than in process_view, which Django would run through sync_to_async under ASGI.
+def view_budget(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view_func = match.func
+    # DRF views expose `cls`, plain Django class-based views `view_class`
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        # Viewset routes carry their {method: action} map, extra @action routes included
+        method = request.method.lower()
+        action = (getattr(view_func, 'actions', None) or {}).get(method)
+        budget = budget.get(action, budget.get(method))
+    return budget
@@ -0,0 +1,12 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+# Keyset pagination used by every list endpoint.
+# Pages are fetched with "WHERE pk < <cursor> ORDER BY pk DESC LIMIT n", so a deep page costs
+# the same as the first one and rows inserted meanwhile never shift the pages.
+# Page size is PAGE_SIZE by default and can be chosen per request with ?page_size=.
+class KeysetPagination(CursorPagination):
+    ordering = '-pk'
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
@@ -0,0 +1,305 @@
+import heapq
+import logging
+import re
+import threading
+import time
+from array import array
+from itertools import compress, islice, repeat
+from operator import contains
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r'[^\W_]+')
+_EMPTY = array('i')
+
+
+def normalize(text):
+    return ' '.join((text or '').casefold().split())
+
+
+# Keys a value is indexed under: every trigram, plus the first one and two characters
+# of each word ('^j', '^jo') so one- and two-character queries work as prefixes
+def index_keys(value):
+    keys = {value[i:i + 3] for i in range(len(value) - 2)}
+    for word in _WORD.findall(value):
+        keys.add('^' + word[:1])
+        keys.add('^' + word[:2])
+    return keys
+
+
+# In-process substring index: key -> array of doc ids, plus each doc's normalized field values
+# joined by SEPARATOR for verifying and ranking candidates. Updates append postings and
+# removals only drop the doc, so postings go stale; they are rebuilt once stale entries pile up.
+class TrigramIndex:
+    # normalize() treats it as whitespace, so it never occurs inside a value or a query
+    SEPARATOR = '\x1f'
+
+    def __init__(self):
+        self._docs = {}
+        self._postings = {}
+        self._stale = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def load(self, rows):
+        docs = {doc_id: self._join(values) for doc_id, *values in rows}
+        postings = self._build(docs)
+        with self._lock:
+            self._docs, self._postings, self._stale = docs, postings, 0
+
+    def add(self, doc_id, values):
+        text = self._join(values)
+        with self._lock:
+            previous = self._docs.get(doc_id)
+            if previous == text:
+                return
+            self._docs[doc_id] = text
+            known = self._keys(previous) if previous is not None else set()
+            for key in self._keys(text) - known:
+                self._postings.setdefault(key, array('i')).append(doc_id)
+            self._stale += len(known)
+            self._maybe_compact()
+
+    def remove(self, doc_id):
+        with self._lock:
+            previous = self._docs.pop(doc_id, None)
+            if previous is not None:
+                self._stale += len(self._keys(previous))
+                self._maybe_compact()
+
+    # Ranked doc ids for `query` (see _scorer); newer docs win ties. Only the newest `scan_limit`
+    # matching docs are ranked, which bounds the work for very common terms.
+    def search(self, query, limit=20, scan_limit=1000):
+        query = normalize(query)
+        if not query:
+            return []
+        docs, postings = self._docs, self._postings
+
+        if len(query) < 3:
+            lists = [postings.get('^' + query, _EMPTY)]
+        else:
+            lists = sorted((postings.get(query[i:i + 3], _EMPTY) for i in range(len(query) - 2)), key=len)
+
+        if len(lists[0]) <= 16 * scan_limit:
+            candidates = set(lists[0])
+            # Intersect while it pays off; anything left over is settled by the substring check
+            for posting in lists[1:]:
+                if len(candidates) <= scan_limit or len(posting) > 4 * len(candidates):
+                    break
+                candidates.intersection_update(posting)
+            ordered = sorted(candidates, reverse=True)
+        else:
+            # Postings are appended in id order, so walking one backwards visits the newest
+            # docs first; a common term stops after scan_limit hits or the walk budget
+            ordered = list(islice(reversed(lists[0]), 32 * scan_limit))
+
+        # Substring check done with C-level iterators, it runs over every candidate
+        texts = map(docs.get, ordered, repeat(''))
+        matching = compress(ordered, map(contains, texts, repeat(query)))
+        score_of = _scorer(query)
+        scored, seen = [], set()
+        for doc_id in matching:
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            scored.append((score_of(docs[doc_id].split(self.SEPARATOR)), doc_id))
+            if len(scored) >= scan_limit:
+                break
+        return [doc_id for _, doc_id in heapq.nlargest(limit, scored)]
+
+    def _maybe_compact(self):
+        if self._stale > max(10000, len(self._docs) * 4):
+            self._postings, self._stale = self._build(self._docs), 0
+
+    @classmethod
+    def _join(cls, values):
+        return cls.SEPARATOR.join(normalize(value) for value in values)
+
+    @classmethod
+    def _keys(cls, text):
+        return set().union(*map(index_keys, text.split(cls.SEPARATOR)))
+
+    @classmethod
+    def _build(cls, docs):
+        postings = {}
+        for doc_id, text in docs.items():
+            for key in cls._keys(text):
+                postings.setdefault(key, array('i')).append(doc_id)
+        return postings
+
+
+# Exact field 400, field prefix 300, word prefix 200, substring 100; +50 when the match is
+# a whole word and -1 per field position, so name hits beat email hits
+def _scorer(query):
+    word_prefix = re.compile(r'(?<![^\W_])' + re.escape(query)).search
+    whole_word = re.compile(r'(?<![^\W_])' + re.escape(query) + r'(?![^\W_])').search
+
+    def score(values):
+        best = 0
+        for position, value in enumerate(values):
+            if query not in value:
+                continue
+            if value == query:
+                score = 400
+            elif value.startswith(query):
+                score = 300
+            elif word_prefix(value):
+                score = 200
+            else:
+                score = 100
+            if score < 400 and whole_word(value):
+                score += 50
+            best = max(best, score - position)
+        return best
+    return score
+
+
+# Ranked search over some text fields of a model. On MySQL it uses a FULLTEXT index built
+# with the ngram parser (see the migrations that create `fulltext_index`); elsewhere it keeps
+# a TrigramIndex in memory. That index is built in a background thread on first use (searches
+# fall back to an icontains scan meanwhile), kept current by the model's save/delete signals
+# in this process, picks up other processes' writes through `updated_field` every
+# SEARCH_REFRESH_INTERVAL seconds and is rebuilt every SEARCH_INDEX_TTL seconds.
+class SearchEngine:
+    def __init__(self, model, fields, fulltext_index=None, filters=None, updated_field=None):
+        self.model_label = model
+        self.fields = tuple(fields)
+        self.fulltext_index = fulltext_index
+        self.filters = filters or {}
+        self.updated_field = updated_field
+        self.index = TrigramIndex()
+        self._loaded_at = None
+        self._loading = False
+        self._synced_at = None
+        self._sync_from = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def backend(self):
+        backend = getattr(settings, 'SEARCH_BACKEND', 'auto')
+        if backend == 'auto':
+            vendor = connections[router.db_for_read(self.model)].vendor
+            return 'database' if vendor == 'mysql' and self.fulltext_index else 'memory'
+        return backend
+
+    # Primary keys of the best matches, best first
+    def search(self, query, limit=20):
+        if self.backend() == 'database':
+            return self._search_database(query, limit)
+        if not self._ensure_fresh():
+            return self._search_scan(query, limit)
+        return self.index.search(query, limit, scan_limit=getattr(settings, 'SEARCH_SCAN_LIMIT', 1000))
+
+    def _search_database(self, query, limit):
+        # A quoted phrase in boolean mode only matches rows holding every ngram of it in order
+        phrase = '"%s"' % normalize(query).replace('"', ' ')
+        columns = ', '.join(self.model._meta.get_field(field).column for field in self.fields)
+        rank = RawSQL(f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)', (phrase,))
+        queryset = (self.model.objects.filter(**self.filters).annotate(search_rank=rank)
+                    .filter(search_rank__gt=0).order_by('-search_rank', '-pk'))
+        return list(queryset.values_list('pk', flat=True)[:limit])
+
+    def _search_scan(self, query, limit):
+        condition = Q()
+        for field in self.fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        queryset = self.model.objects.filter(**self.filters).filter(condition).order_by('-pk')
+        return list(queryset.values_list('pk', flat=True)[:limit])
+
+    # Signal hooks; no-ops until the in-memory index has been loaded
+    def update(self, instance):
+        if self._loaded_at is None:
+            return
+        if all(getattr(instance, field) == value for field, value in self.filters.items()):
+            self.index.add(instance.pk, [getattr(instance, field) for field in self.fields])
+        else:
+            self.index.remove(instance.pk)
+
+    def discard(self, pk):
+        if self._loaded_at is not None:
+            self.index.remove(pk)
+
+    def _rows(self, queryset):
+        queryset = queryset.filter(**self.filters).order_by('pk')
+        return queryset.values_list('pk', *self.fields).iterator(chunk_size=5000)
+
+    # Starts a (re)build when due and runs the incremental sync. False until the first build is done.
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        ttl = getattr(settings, 'SEARCH_INDEX_TTL', 3600)
+        interval = getattr(settings, 'SEARCH_REFRESH_INTERVAL', 30)
+        with self._lock:
+            rebuild = not self._loading and (self._loaded_at is None or now - self._loaded_at > ttl)
+            if rebuild:
+                self._loading = True
+            sync = (not rebuild and not self._loading and self._loaded_at is not None
+                    and self.updated_field is not None and now - self._synced_at > interval)
+            if sync:
+                self._synced_at = now
+
+        if rebuild:
+            if getattr(settings, 'SEARCH_LOAD_IN_BACKGROUND', True):
+                threading.Thread(target=self._reload_in_worker, name='search-index', daemon=True).start()
+            else:
+                self._reload()
+        elif sync:
+            self._sync()
+        return self._loaded_at is not None
+
+    def _reload(self):
+        try:
+            started = timezone.now()
+            self.index.load(self._rows(self.model.objects.all()))
+            with self._lock:
+                self._loaded_at = self._synced_at = time.monotonic()
+                self._sync_from = started
+        finally:
+            self._loading = False
+
+    def _reload_in_worker(self):
+        close_old_connections()
+        try:
+            self._reload()
+        except Exception:
+            logger.exception("Building the %s search index failed", self.model_label)
+        finally:
+            close_old_connections()
+
+    # Re-index rows changed since the last sync, with some overlap for in-flight transactions.
+    # Rows that stopped matching `filters` are dropped; deletes wait for the next rebuild.
+    def _sync(self):
+        started = timezone.now()
+        changed = self.model.objects.filter(**{f'{self.updated_field}__gte': self._sync_from - timedelta(seconds=5)})
+        for pk, *values in self._rows(changed):
+            self.index.add(pk, values)
+        if self.filters:
+            for pk in changed.exclude(**self.filters).values_list('pk', flat=True):
+                self.index.remove(pk)
+        self._sync_from = started
+
+
+# ?q= and ?limit= for search endpoints
+def parse_search_params(request):
+    query = normalize(request.query_params.get('q'))
+    min_length = getattr(settings, 'SEARCH_MIN_QUERY_LENGTH', 2)
+    if len(query) < min_length:
+        raise ValidationError({"error": f"q must be at least {min_length} characters."})
+    limit = request.query_params.get('limit', '20')
+    max_limit = getattr(settings, 'SEARCH_MAX_RESULTS', 50)
+    if not limit.isdigit() or not 0 < int(limit) <= max_limit:
+        raise ValidationError({"error": f"limit must be between 1 and {max_limit}."})
+    return query, int(limit)
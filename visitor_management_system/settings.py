@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'visitor_management_system.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +59,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request query accounting, see visitor_management_system/middleware.py.
+# Views declare `query_budget`; STRICT raises when a request goes over it (turn on in tests).
+# Budgets cover a request with cold caches on the default DatabaseCache, whose reads and
+# writes are database queries too; a warm request makes far fewer.
+QUERY_BUDGET = {
+    'ENABLED': True,
+    'STRICT': False,
+    'N_PLUS_ONE_THRESHOLD': 5,    # Same statement this many times in one request is flagged
+}
+
 ROOT_URLCONF = 'visitor_management_system.urls'
 
 TEMPLATES = [
@@ -97,6 +108,26 @@ DATABASES = {
 }
 
 
+# Cache shared by every worker process. Version counters (permissions, lookup tables), the
+# auth state cache and resolved permission sets rely on all workers seeing the same values,
+# so this must not be a per-process backend such as LocMemCache.
+# Redis when REDIS_URL is set (needs the `redis` package), otherwise a database table that
+# the employee migrations create.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'vms_cache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -153,10 +184,13 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'employee.authentication.ClaimsJWTAuthentication',
     ),
-    'DEFAULT_RENDERER_CLASSES': ('rest_framework.renderers.JSONRenderer',)
+    'DEFAULT_RENDERER_CLASSES': ('rest_framework.renderers.JSONRenderer',),
+    'DEFAULT_PAGINATION_CLASS': 'visitor_management_system.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
+API_MAX_PAGE_SIZE = 500    # Upper bound for ?page_size= on list endpoints
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=20),
@@ -173,7 +207,7 @@ SIMPLE_JWT = {
 
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
-    "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
+    "TOKEN_USER_CLASS": "employee.authentication.ClaimsUser",
 
     "JTI_CLAIM": "jti",
 
@@ -185,8 +219,122 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# Seconds a user's is_active/password state is trusted before ClaimsJWTAuthentication re-reads it
+EMPLOYEE_AUTH_STATE_TTL = 60
+# Seconds a process reuses its own copy of that state; a deactivation or password change made
+# in another process applies here within this time
+EMPLOYEE_AUTH_STATE_LOCAL_TTL = 5
+
+# Password hashing for login, registration and password changes runs on a bounded pool;
+# once WORKERS + MAX_PENDING hashes are in flight those endpoints answer 503 right away
+EMPLOYEE_HASHING_POOL = {
+    'WORKERS': 4,
+    'MAX_PENDING': 32,
+}
+
+# Role-based permissions: role_name -> permissions granted to users holding that role (UserRole).
+# Entries are 'app_label.codename', 'app_label.*' or '*'. Admins/superusers always pass.
+# None turns role checks off; RolePermission then lets every authenticated user through.
+# e.g. {'HR': ['employee.*'], 'Reception': ['visitor.add_visitor', 'visitor.change_visitor']}
+ROLE_PERMISSIONS = None
+EMPLOYEE_PERMISSION_VERSION_TTL = 5    # Seconds a process trusts its copy of the permission version
+EMPLOYEE_PERMISSION_CACHE_TTL = 3600    # Lifetime of a resolved permission set in the shared cache
+EMPLOYEE_PERMISSION_LOCAL_TTL = 30    # Seconds a process reuses its own copy of a resolved permission set
+
+# Seconds a process trusts its copy of a lookup table's version (Department, Role, Designation)
+# before checking the shared cache; writes made in the same process are seen immediately
+EMPLOYEE_LOOKUP_VERSION_TTL = 5
+
+# Largest payload accepted by the /emp/user-roles|user-departments|user-designations/bulk/ endpoints
+EMPLOYEE_BULK_MAX_LINKS = 5000
+
+# asgi.py sets VMS_SERVER_INTERFACE=asgi so the ASGI app serves the async auth views
+EMPLOYEE_ASYNC_AUTH_VIEWS = os.getenv('VMS_SERVER_INTERFACE') == 'asgi'
+
+# Emails are queued in the OutboxEmail table and sent off the request thread, one backend
+# connection per batch, retried with exponential backoff up to MAX_ATTEMPTS.
+# WORKER: 'thread' (sender thread in each web process), 'command' (only `manage.py run_outbox`
+# sends) or 'local' (sent in the calling thread when the transaction commits, for tests)
+EMPLOYEE_EMAIL_OUTBOX = {
+    'WORKER': 'thread',
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 30,    # Doubled after every failed attempt
+    'MAX_BACKOFF_SECONDS': 3600,
+    'LEASE_SECONDS': 300,    # A claimed message is retried after this if its worker never reports back
+    'POLL_INTERVAL': 5,    # Seconds between checks for retries and other processes' messages
+}
+
 PASSWORD_RESET_TIMEOUT=1800    # 1800 sec = 30 Min
 
+# Visitor QR badge rendering
+# 'inline' renders the badge inside Visitor.save(), 'background' queues it on a worker pool,
+# 'on_demand' stores no file and renders it from /visit/visitors/{id}/qr/
+VISITOR_QR_RENDER_MODE = 'inline'
+VISITOR_QR_EXECUTOR = 'thread'    # 'thread', 'process' or 'local' (in-process, for tests)
+VISITOR_QR_BULK_EXECUTOR = 'process'    # Pool used to render badges for bulk uploads
+VISITOR_QR_WORKERS = 4
+VISITOR_QR_CACHE_MAX_BYTES = 16 * 1024 * 1024    # In-memory LRU for on-demand renders
+VISITOR_QR_MAX_SIZE = 2048    # Largest image (px) the QR endpoint will render
+VISITOR_BULK_MAX_ROWS = 5000    # Largest upload accepted by /visit/visitors/bulk/
+
+# Badge payload: 'legacy' encodes the readable visitor details, 'signed' a compact HMAC token
+# (visitor_id, visit_code, validity window) that /visit/scan/ verifies without the database
+VISITOR_QR_PAYLOAD = 'legacy'
+VISITOR_QR_TOKEN_LIFETIME = timedelta(days=1)
+VISITOR_QR_SIGNING_KEY = None    # Defaults to a key derived from SECRET_KEY
+# With 'signed', /visit/scan/ denies anything but a valid token: the visit code inside a token
+# is readable, so a bare or legacy code would get around the validity window. Turn this on only
+# while badges printed before the switch are still in use.
+VISITOR_QR_ACCEPT_LEGACY = False
+
+# Visitor and host search (/visit/visitors/search/, /emp/hosts/search/).
+# 'auto' uses the MySQL ngram FULLTEXT indexes on MySQL and an in-process trigram index
+# elsewhere; 'database' or 'memory' force one. The in-process index holds every row's
+# searchable text (roughly 700 MB per million visitors), so prefer MySQL at that scale.
+SEARCH_BACKEND = 'auto'
+SEARCH_INDEX_TTL = 3600    # Seconds between full rebuilds of the in-process index
+SEARCH_REFRESH_INTERVAL = 30    # Seconds between syncs of rows other processes changed
+SEARCH_LOAD_IN_BACKGROUND = True    # Build in a thread; searches scan the table meanwhile
+SEARCH_SCAN_LIMIT = 1000    # Newest matches ranked per query by the in-process index
+SEARCH_MIN_QUERY_LENGTH = 2
+SEARCH_MAX_RESULTS = 50
+
+# In-process visit_code index used by /visit/scan/. Revoked codes (reissued or deleted) are
+# dropped in every process once it sees the shared revocation version move; the full reload
+# after VISITOR_SCAN_INDEX_TTL seconds runs in a background thread.
+VISITOR_SCAN_INDEX_TTL = 300
+VISITOR_SCAN_INDEX_VERSION_TTL = 1    # Seconds a process trusts its copy of the revocation version
+VISITOR_SCAN_INDEX_LOAD_IN_BACKGROUND = True
+
+# Buffered TurnstileLog ingestion for /visit/scan/: rows are written with bulk_create every
+# BATCH_SIZE rows or FLUSH_INTERVAL_MS; a full buffer falls back to a direct write
+VISITOR_SCAN_LOG_BUFFER = {
+    'ENABLED': False,
+    'MAX_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL_MS': 200,
+}
+
+# Arrival emails to the host employee (Visitor.registered_by) on entry scans. Arrivals are
+# grouped per host for WINDOW_SECONDS and sent as one digest through the email outbox, at most
+# MAX_PER_HOUR digests per host; MAX_PENDING bounds the in-process queue (extra arrivals are dropped)
+VISITOR_ARRIVAL_NOTIFICATIONS = {
+    'ENABLED': True,
+    'WINDOW_SECONDS': 30,
+    'MAX_PER_HOUR': 12,
+    'MAX_PENDING': 10000,
+    'MAX_LISTED': 20,    # Visitors named in one digest; the rest are counted
+}
+
+# Turnstile history retention: older entries are moved to monthly NDJSON archives by
+# `manage.py archive_turnstiles`
+VISITOR_RETENTION_DAYS = 90
+VISITOR_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+# Allowlist delta sync re-reads this much history before the client's version
+VISITOR_ALLOWLIST_OVERLAP = timedelta(seconds=5)
+
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -0,0 +1,66 @@
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from visitor_management_system.search import TrigramIndex
+
+# Every side job runs inline or not at all, so the only queries a request makes are its own
+TEST_SETTINGS = {
+    'QUERY_BUDGET': {'ENABLED': True, 'STRICT': True, 'N_PLUS_ONE_THRESHOLD': 5},
+    'EMPLOYEE_EMAIL_OUTBOX': {'WORKER': 'command'},
+    'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+    'VISITOR_ARRIVAL_NOTIFICATIONS': {'ENABLED': False},
+    'VISITOR_SCAN_LOG_BUFFER': {'ENABLED': False},
+    'VISITOR_QR_EXECUTOR': 'local',
+    'VISITOR_QR_BULK_EXECUTOR': 'local',
+    'VISITOR_SCAN_INDEX_LOAD_IN_BACKGROUND': False,
+    'SEARCH_LOAD_IN_BACKGROUND': False,
+}
+
+
+# Drop what earlier tests left in the shared cache and the per-process caches, whose rows
+# were rolled back with the test transaction
+def reset_caches():
+    from employee import authentication, lookups, permissions
+    from employee.search import host_search
+    from visitor.index import visit_code_index
+    from visitor.qr import get_qr_cache
+    from visitor.search import visitor_search
+
+    cache.clear()
+    lookups._caches.clear()
+    for module in (authentication, permissions):
+        with module._local_lock:
+            module._local.clear()
+    visit_code_index.clear()
+    for clock in (permissions._clock, visit_code_index._clock):
+        clock.forget()
+    get_qr_cache().clear()
+    for engine in (host_search, visitor_search):
+        engine.index, engine._loaded_at = TrigramIndex(), None
+
+
+# Settings and caches isolated from the environment and from earlier tests
+@override_settings(**TEST_SETTINGS, MEDIA_ROOT=tempfile.mkdtemp(prefix='vms-test-media-'),
+                   VISITOR_ARCHIVE_DIR=tempfile.mkdtemp(prefix='vms-test-archive-'))
+class VMSTestCase(TestCase):
+    def setUp(self):
+        reset_caches()
+
+    def authenticate(self, user):
+        from employee.views import get_tokens_for_user
+
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {get_tokens_for_user(user)['access']}"
+
+
+# Requests fail with QueryBudgetExceeded when they go over the view's query_budget.
+# Every request starts from cold caches, so the counts are the worst case a budget must cover.
+class QueryBudgetTestCase(VMSTestCase):
+    # Send a JSON request with on_commit callbacks (cache version bumps) run as in production
+    def call(self, method, path, data=None, expected=200, **extra):
+        reset_caches()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(path, data, content_type='application/json', **extra)
+        self.assertEqual(response.status_code, expected, getattr(response, 'content', b'')[:500])
+        return response